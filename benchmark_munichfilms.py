@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Simple timing benchmarks for munich_films.py, using the saved web page
+# (artechok_originalton.html)
+
+"""Benchmarks for munich_films.py"""
+
+from __future__ import print_function
+
+import sys, os, optparse, timeit, gc, tracemalloc, time, json, platform, subprocess, threading
+import random, py_compile
+from http.server import HTTPServer, BaseHTTPRequestHandler
+try:
+	import resource
+except ImportError:
+	# not available on Windows
+	resource = None
+
+from bs4 import BeautifulSoup
+import munich_films
+
+
+testTextVersion = "artechok_originalton.html"
+
+
+def ReportTiming( label, func, nRepeats, nLoops ):
+	"""Runs func nLoops times per repeat, for nRepeats repeats, and prints the
+	best time per call (in milliseconds, or microseconds for very fast calls).
+	Returns the best time in seconds.
+	"""
+	times = timeit.repeat(func, repeat=nRepeats, number=nLoops)
+	bestTime = min(times) / nLoops
+	if bestTime < 1.0e-3:
+		print("   %-40s %10.3f us" % (label, 1.0e6*bestTime))
+	else:
+		print("   %-40s %10.3f ms" % (label, 1000*bestTime))
+	return bestTime
+
+
+def ScalePage( inputText, factor ):
+	"""Returns a copy of the web page text with the rows of the film-listings
+	table repeated factor times (i.e., a page with factor times as many films).
+	"""
+	tableStart = inputText.find('<table class="linien prog film">')
+	rowsStart = inputText.find('<tr', tableStart)
+	rowsEnd = inputText.find('</table>', rowsStart)
+	rows = inputText[rowsStart:rowsEnd]
+	return inputText[:rowsStart] + rows*factor + inputText[rowsEnd:]
+
+
+# SYNTHETIC PAGES
+# Showtime strings (as they appear in the HTML) following the patterns in the
+# "EXAMPLES OF THEATER TIME LISTINGS" list in munich_films.py
+SYNTHETIC_SHOWTIMES = [
+	"tgl.&nbsp;17:15",
+	"tgl. 20:50&nbsp;(Mi.&nbsp;21:15); Di.&nbsp;auch&nbsp;12:30",
+	"tgl.&nbsp;15:00, 17:45, 20:30&nbsp;(au\u00dfer&nbsp;Mo.)",
+	"tgl.&nbsp;au\u00dfer&nbsp;Mi.&nbsp;17:20; So.&nbsp;auch&nbsp;12:10; Mi.&nbsp;17:00",
+	"tgl.&nbsp;16:20, 20:50&nbsp;(au\u00dfer&nbsp;Mo./Mi.); Fr./Sa.&nbsp;auch&nbsp;23:00",
+	"tgl.&nbsp;19:00&nbsp;(So.&nbsp;19:30)",
+	"Mo.&nbsp;20:00",
+	"Sa./So.&nbsp;20:00",
+	"Fr.-So.&nbsp;14:30",
+	"Fr./Mo./Mi.&nbsp;21:00",
+	"So.&nbsp;11:00",
+	"So.&nbsp;11:00 (mit Pause)",
+	"Do.&nbsp;19:30; So.&nbsp;16:00",
+]
+SYNTHETIC_THEATERS = ["Arena Filmtheater", "Atelier", "Kino Solln", "Werkstattkino",
+	"Arri", "Eldorado", "Mathäser", "Museum Lichtspiele", "Filmmuseum München",
+	"City Kinos", "Theatiner Film", "Rio Filmpalast", "Neues Rottmann", "Cinema"]
+# language tags (None = German-language film)
+SYNTHETIC_LANGUAGES = ["OF", "OmU", "OmeU", None]
+
+PAGE_HEADER = """<!DOCTYPE html>
+<html lang="de">
+<head><meta charset="utf-8"><title>artechock film - Kino M\u00fcnchen - Filme im Originalton</title></head>
+<body>
+<div class="abschnitt">
+	<h2>Filme im Originalton in M\u00fcnchen: Do.&nbsp;28.04.2016 &ndash; Mi.&nbsp;04.05.2016</h2>
+</div>
+<div class="abschnitt">
+	<div class="c_tab">
+	  <table class="linien prog film">
+"""
+PAGE_FOOTER = """	  </table>
+	</div>
+</div>
+</body>
+</html>
+"""
+
+def GenerateListingsPage( nFilms, maxTheaters=4, seed=0 ):
+	"""Returns the text of a synthetic web page in the artechock.de format, with
+	nFilms films, each shown in 1 to maxTheaters theaters (i.e., a "start" row
+	plus up to maxTheaters - 1 "follow" rows), using showtime strings from
+	SYNTHETIC_SHOWTIMES. The same seed always produces the same page.
+	"""
+	rng = random.Random(seed)
+	rows = [PAGE_HEADER]
+	for i in range(nFilms):
+		title = "Synthetic Film %d" % (i + 1)
+		lang = rng.choice(SYNTHETIC_LANGUAGES)
+		if lang is not None:
+			title += "</span> (%s) " % lang
+		else:
+			title += "</span> "
+		nTheaters = rng.randint(1, maxTheaters)
+		theaters = rng.sample(SYNTHETIC_THEATERS, nTheaters)
+		for j, theater in enumerate(theaters):
+			showtimes = rng.choice(SYNTHETIC_SHOWTIMES)
+			if j == 0:
+				rows.append('\t    <tr class="start">\n')
+				rows.append('\t      <td class="left b"><a href="../text/filminfo/s/sy/synth%d.htm">'
+							'<strong><span class="link">%s</strong></a></td>\n' % (i, title))
+			else:
+				rows.append('\t    <tr class="follow">\n')
+				if j == 1:
+					rows.append('\t      <td class="empty" rowspan="%d">&nbsp;</td>\n' % (nTheaters - 1))
+			rows.append('\t      <td class="mid b"><a href="kino%d.htm"><span class="link">%s</span>'
+						'</a></td>\n' % (j, theater))
+			if rng.random() < 0.1:
+				# occasional showtimes cell with link to a review
+				rows.append('\t      <td class="right b"><a href="../text/kritik/s/synth%d.htm" '
+							'target="_blank">%s <br>(<span class="link">artechock-Kritik</span>) '
+							'</a></td>\n' % (i, showtimes))
+			else:
+				rows.append('\t      <td class="right"> %s </td>\n' % showtimes)
+			rows.append('\t    </tr>\n')
+	rows.append(PAGE_FOOTER)
+	return "".join(rows)
+
+
+def BenchmarkScaling( sizes, nRepeats=3, singlePass=True ):
+	"""Times ParseFilmListings (or the older prettify/split/re-parse version of
+	GetFilmSoupDict, if singlePass = False) on synthetic pages with each of the
+	numbers of films in sizes, printing the time per film. Returns a list of
+	(nFilms, best time in seconds) tuples.
+	"""
+	if singlePass:
+		print("ParseFilmListings on synthetic pages:")
+	else:
+		print("GetFilmSoupDict (prettify/split/re-parse) on synthetic pages:")
+	results = []
+	for nFilms in sizes:
+		pageText = GenerateListingsPage(nFilms)
+		if singlePass:
+			func = lambda: munich_films.ParseFilmListings(pageText, True)
+		else:
+			soup = BeautifulSoup(pageText, munich_films.parserName)
+			func = lambda: munich_films.GetFilmSoupDict(soup, True, singlePass=False)
+		t = ReportTiming("%d films" % nFilms, func, max(1, nRepeats), 1)
+		print("      %.1f us per film" % (1.0e6*t/nFilms))
+		if len(results) > 0:
+			# parsing should scale linearly: n times as many films should take
+			# roughly n times as long (with generous slack for timing noise)
+			n0, t0 = results[0]
+			ratio = (t/nFilms) / (t0/n0)
+			print("      %.2f times the time per film for %d films%s" % (ratio, n0,
+						"  ** NOT LINEAR **" if ratio > 2 else ""))
+		results.append((nFilms, t))
+	return results
+
+
+def BenchmarkFilmSoupDict( inputText, nRepeats=5, nLoops=5 ):
+	"""Compares the single-pass GetFilmSoupDict with the older prettify/split/
+	re-parse approach (including the MakeFilmTextDict step, since the two
+	approaches hand different kinds of objects to it).
+	"""
+	soup = BeautifulSoup(inputText, munich_films.parserName)
+
+	def SinglePass():
+		filmDict, filmTitles = munich_films.GetFilmSoupDict(soup, True, singlePass=True)
+		munich_films.MakeFilmTextDict(filmDict, filmTitles)
+
+	def Reparse():
+		filmDict, filmTitles = munich_films.GetFilmSoupDict(soup, True, singlePass=False)
+		munich_films.MakeFilmTextDict(filmDict, filmTitles)
+
+	print("GetFilmSoupDict + MakeFilmTextDict:")
+	tSingle = ReportTiming("single pass", SinglePass, nRepeats, nLoops)
+	tReparse = ReportTiming("prettify/split/re-parse", Reparse, nRepeats, nLoops)
+	print("   speedup = %.1f" % (tReparse / tSingle))
+
+
+def BenchmarkParsers( inputText, nRepeats=5, nLoops=5 ):
+	"""Times the full parse (MakeSoup + GetFilmSoupDict + MakeFilmTextDict) for
+	each installed HTML parser backend.
+	"""
+	def FullParse():
+		soup = munich_films.MakeSoup(inputText)
+		filmDict, filmTitles = munich_films.GetFilmSoupDict(soup, True)
+		munich_films.MakeFilmTextDict(filmDict, filmTitles)
+
+	print("HTML parser backends (parse + GetFilmSoupDict + MakeFilmTextDict):")
+	originalParser = munich_films.parserName
+	for name in munich_films.GetAvailableParsers():
+		munich_films.SetParser(name)
+		ReportTiming(name, FullParse, nRepeats, nLoops)
+	munich_films.SetParser(originalParser)
+
+
+def BenchmarkDayIndex( inputText, nRepeats=5, nLoops=5 ):
+	"""Compares answering "what's on each day of the week" with the day index
+	(MakeDayIndex + GetListingsForDay) against repeated calls to
+	GetTimesForOneDay. The showtime-parsing cache is cleared before each
+	run, so both approaches start from scratch.
+	"""
+	soup = munich_films.MakeSoup(inputText)
+	filmDict, filmTitles = munich_films.GetFilmSoupDict(soup, True)
+	filmTextDict = munich_films.MakeFilmTextDict(filmDict, filmTitles)
+
+	def RepeatedQueries():
+		munich_films.ParseShowtimes.cache_clear()
+		for day in munich_films.DAY_NAMES:
+			for title in filmTitles:
+				munich_films.GetTimesForOneDay(filmTextDict[title], day)
+
+	def DayIndex():
+		munich_films.ParseShowtimes.cache_clear()
+		dayIndex = munich_films.MakeDayIndex(filmTextDict, filmTitles)
+		for day in munich_films.DAY_NAMES:
+			munich_films.GetListingsForDay(dayIndex, day)
+
+	print("Day-by-day listings (all 7 days):")
+	tRepeated = ReportTiming("repeated GetTimesForOneDay", RepeatedQueries, nRepeats, nLoops)
+	tIndex = ReportTiming("MakeDayIndex + GetListingsForDay", DayIndex, nRepeats, nLoops)
+	print("   speedup = %.1f" % (tRepeated / tIndex))
+	
+	dayIndex = munich_films.MakeDayIndex(filmTextDict, filmTitles)
+	ReportTiming("single query (prebuilt index)",
+				lambda: munich_films.GetListingsForDay(dayIndex, "Sun"), nRepeats, 1000)
+
+
+def StringTimeWindowQuery( filmTitles, filmTextDict, days, after, before ):
+	"""String-based version of ScreeningArrays.Query (for comparison): loops over
+	the films, calling GetTimesForOneDay for each day, and checks the times.
+	"""
+	minTime = munich_films.ShowtimeToMinutes(after)
+	maxTime = munich_films.ShowtimeToMinutes(before)
+	results = []
+	for day in sorted(days, key=munich_films.GetDayIndex):
+		dayResults = []
+		for title in filmTitles:
+			for line in munich_films.GetTimesForOneDay(filmTextDict[title], day):
+				theater, times = munich_films.SplitTheaterTimes(line)
+				for showtime in times.split(","):
+					minutes = munich_films.ShowtimeToMinutes(showtime.strip())
+					if minTime <= minutes < maxTime:
+						dayResults.append((minutes, title, theater, day, showtime.strip()))
+		dayResults.sort(key=lambda r: r[0])
+		results.extend(r[1:] for r in dayResults)
+	return results
+
+def BenchmarkQueries( sizes=(100, 1000, 10000), nRepeats=5 ):
+	"""Compares the string-based time-window query with ScreeningArrays.Query
+	("all screenings between 19:00 and 21:00 on weekends") on synthetic pages.
+	"""
+	print("Weekend 19:00-21:00 query:")
+	for nFilms in sizes:
+		filmTitles, filmTextDict, dates = munich_films.ParseFilmListings(
+												GenerateListingsPage(nFilms), True)
+		print("   %d films:" % nFilms)
+		tString = ReportTiming("string-based (GetTimesForOneDay)",
+						lambda: StringTimeWindowQuery(filmTitles, filmTextDict, ["Sat", "Sun"],
+													"19:00", "21:00"), nRepeats, 1)
+		ReportTiming("MakeScreeningArrays (one-time)",
+						lambda: munich_films.MakeScreeningArrays(filmTitles, filmTextDict), nRepeats, 1)
+		arrays = munich_films.MakeScreeningArrays(filmTitles, filmTextDict)
+		tVector = ReportTiming("ScreeningArrays.Query",
+						lambda: arrays.Query(["Sat", "Sun"], "19:00", "21:00"), nRepeats, 1)
+		ReportTiming("ScreeningArrays.CountScreenings",
+						lambda: arrays.CountScreenings(arrays.Select(after="19:00", before="21:00")),
+						nRepeats, 1)
+		print("      speedup = %.1f" % (tString / tVector))
+
+
+def ChainedReplaceTranslate( showtimes ):
+	"""The original translation of a showtimes string (for comparison): one
+	str.replace pass per German word or day name.
+	"""
+	showtimes = showtimes.replace("tgl.", "daily")
+	showtimes = showtimes.replace(u"au\u00dfer", "except")
+	showtimes = showtimes.replace("auch", "also")
+	for tag in munich_films.TAGEN:
+		showtimes = showtimes.replace(tag, munich_films.DAYS_TO_ENGLISH[tag])
+	return showtimes
+
+def BenchmarkTranslation( inputText, nRepeats=5, nLoops=20 ):
+	"""Compares chained str.replace calls with the single-pass translators
+	(uncached, and memoized as used by TranslateTimesSimple) on the showtimes
+	strings of the saved web page (mostly distinct) and of a synthetic page
+	(heavily repeated).
+	"""
+	def GetShowtimes( pageText ):
+		soup = munich_films.MakeSoup(pageText)
+		filmDict, titles = munich_films.GetFilmSoupDict(soup, True)
+		return [showtimes.splitlines()[0].strip() for title in titles
+				for (theater, showtimes) in munich_films.GetTheatersAndTimes(filmDict[title])]
+
+	print("Translating showtimes:")
+	for label, pageText in [("saved web page", inputText),
+							("synthetic page (1000 films)", GenerateListingsPage(1000))]:
+		showtimesList = GetShowtimes(pageText)
+		print("   %s: %d strings (%d distinct)" % (label, len(showtimesList), len(set(showtimesList))))
+		tChained = ReportTiming("chained str.replace",
+						lambda: [ChainedReplaceTranslate(s) for s in showtimesList], nRepeats, nLoops)
+		for locale in munich_films.LOCALES:
+			translate = munich_films.GetTranslator(locale)
+			ReportTiming("single pass, %s (uncached)" % locale,
+						lambda: [translate.__wrapped__(s) for s in showtimesList], nRepeats, nLoops)
+		translate = munich_films.GetTranslator("en")
+		tCold = ReportTiming("single pass, en (memoized, cold)",
+						lambda: (translate.cache_clear(), [translate(s) for s in showtimesList]),
+						nRepeats, nLoops)
+		tWarm = ReportTiming("single pass, en (memoized, warm)",
+						lambda: [translate(s) for s in showtimesList], nRepeats, nLoops)
+		print("      speedup vs. chained = %.1f (cold), %.1f (warm)" % (tChained / tCold,
+																	tChained / tWarm))
+
+
+def BenchmarkJobs( inputText, maxJobs, scaleFactor=10, nRepeats=3 ):
+	"""Times ParseFilmListings on a page scaled up by scaleFactor, using 1 to
+	maxJobs worker processes.
+	"""
+	bigText = ScalePage(inputText, scaleFactor)
+	print("ParseFilmListings with worker processes (page scaled %dx):" % scaleFactor)
+	t1 = None
+	for jobs in range(1, maxJobs + 1):
+		t = ReportTiming("jobs = %d" % jobs,
+						lambda: munich_films.ParseFilmListings(bigText, True, jobs=jobs),
+						nRepeats, 1)
+		if t1 is None:
+			t1 = t
+		else:
+			print("      speedup = %.2f" % (t1 / t))
+
+
+def MeasureRetainedMemory( func ):
+	"""Calls func and returns (memory still allocated by the return value,
+	peak memory during the call), in bytes, as measured by tracemalloc. func
+	is called once beforehand, so that one-time allocations (module-level
+	caches, etc.) aren't counted.
+	"""
+	func()
+	gc.collect()
+	tracemalloc.start()
+	start = tracemalloc.get_traced_memory()[0]
+	result = func()
+	gc.collect()
+	current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del result
+	return current - start, peak - start
+
+
+def BenchmarkMemory( inputText ):
+	"""Compares the memory retained by the soup-valued dict from GetFilmSoupDict
+	(which keeps the whole parsed page alive) with that retained by a list of
+	Film records from GetFilms.
+	"""
+	def SoupDict():
+		soup = munich_films.MakeSoup(inputText)
+		return munich_films.GetFilmSoupDict(soup, True)
+
+	def SoupDictAndTextDict():
+		filmDict, filmTitles = SoupDict()
+		return filmDict, munich_films.MakeFilmTextDict(filmDict, filmTitles)
+
+	def Films():
+		soup = munich_films.MakeSoup(inputText)
+		return munich_films.GetFilms(soup, True)
+
+	print("Memory retained after parsing (peak during parsing):")
+	for label, func in [("GetFilmSoupDict", SoupDict),
+						("GetFilmSoupDict + MakeFilmTextDict", SoupDictAndTextDict),
+						("GetFilms", Films)]:
+		retained, peak = MeasureRetainedMemory(func)
+		print("   %-40s %8.1f KB  (%8.1f KB)" % (label, retained/1024.0, peak/1024.0))
+
+
+# STAGE-BY-STAGE BENCHMARK SUITE
+
+class PageHandler(BaseHTTPRequestHandler):
+	"""Local stand-in for artechock.de: serves pageBytes for any path."""
+	pageBytes = b""
+
+	def do_GET(self):
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		self.send_header("Content-Length", str(len(self.pageBytes)))
+		self.end_headers()
+		self.wfile.write(self.pageBytes)
+
+	def log_message(self, format, *args):
+		pass
+
+
+def GetMaxRSS( ):
+	"""Returns the peak resident set size of this process so far, in KB (or
+	None, if the resource module isn't available).
+	"""
+	if resource is None:
+		return None
+	maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == "darwin":
+		# macOS reports bytes, Linux reports KB
+		maxRSS = maxRSS // 1024
+	return maxRSS
+
+
+def RunStage( func, nRepeats ):
+	"""Runs one pipeline stage: nRepeats timed calls (keeping the best time),
+	then one call under tracemalloc. Returns (result of the last call, dict of
+	measurements): "time" = best wall time (s), "allocated" = memory still
+	allocated after the call (bytes), "peakAllocated" = peak memory allocated
+	during the call (bytes), "peakRSSIncrease" = increase in the process's peak
+	resident set size during the first call (KB; None if unavailable).
+	"""
+	bestTime = None
+	rssBefore = GetMaxRSS()
+	for i in range(nRepeats):
+		t0 = time.perf_counter()
+		result = func()
+		elapsed = time.perf_counter() - t0
+		if i == 0:
+			rssAfter = GetMaxRSS()
+		if bestTime is None or elapsed < bestTime:
+			bestTime = elapsed
+		del result
+	gc.collect()
+	tracemalloc.start()
+	result = func()
+	current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	stats = {"time": bestTime, "allocated": current, "peakAllocated": peak,
+			"peakRSSIncrease": None if rssBefore is None else rssAfter - rssBefore}
+	return result, stats
+
+
+def RunPipelineStages( inputText, url, outputFname, nRepeats ):
+	"""Runs the stages of the GetAndProcessFilmListings pipeline one at a time
+	(each using the previous stage's output) and returns a list of (stage
+	name, measurements) pairs; see RunStage.
+	"""
+	stages = []
+	pageText, stats = RunStage(lambda: munich_films.FetchPageText(url), nRepeats)
+	stages.append(("fetch", stats))
+	soup, stats = RunStage(lambda: munich_films.MakeSoup(pageText), nRepeats)
+	stages.append(("parse", stats))
+	(filmDict, filmTitles), stats = RunStage(lambda: munich_films.GetFilmSoupDict(soup, True),
+											nRepeats)
+	stages.append(("GetFilmSoupDict", stats))
+	filmTextDict, stats = RunStage(lambda: munich_films.MakeFilmTextDict(filmDict, filmTitles),
+									nRepeats)
+	stages.append(("MakeFilmTextDict", stats))
+	scheduleDates, stats = RunStage(lambda: munich_films.GetScheduleDates(soup), nRepeats)
+	stages.append(("GetScheduleDates", stats))
+
+	def WriteOutput():
+		with open(outputFname, 'w') as outf:
+			for title in filmTitles:
+				munich_films.WriteFilmEntry(outf, title, filmTextDict[title])
+	result, stats = RunStage(WriteOutput, nRepeats)
+	stages.append(("write", stats))
+	os.remove(outputFname)
+	return stages
+
+
+def GetGitCommit( ):
+	"""Returns the current git commit hash (or None, if it can't be determined).
+	"""
+	try:
+		output = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+										cwd=os.path.dirname(os.path.abspath(__file__)))
+	except (OSError, subprocess.CalledProcessError):
+		return None
+	return output.decode("ascii").strip()
+
+
+# modules which importing munich_films should *not* load (see MeasureImportTime)
+HEAVY_MODULES = ["requests", "bs4", "urllib3", "concurrent.futures.process"]
+
+def MeasureImportTime( moduleName="munich_films", nRepeats=5 ):
+	"""Imports moduleName in a fresh interpreter (python -X importtime) nRepeats
+	times. Returns a tuple of (best cumulative import time in seconds, dict of
+	modules imported by moduleName --> their cumulative import times in seconds,
+	from the fastest run).
+	"""
+	scriptDir = os.path.dirname(os.path.abspath(__file__))
+	# make sure we're not timing the compilation of the module
+	py_compile.compile(os.path.join(scriptDir, moduleName + ".py"))
+	bestTime = None
+	bestModules = None
+	for i in range(nRepeats):
+		proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + moduleName],
+							stderr=subprocess.PIPE, cwd=scriptDir, check=True)
+		# lines are "import time: self [us] | cumulative | imported package", with
+		# each package listed after the packages it imports (indented by 2 spaces
+		# per level), so the ones imported by moduleName are those listed since
+		# the previous top-level package (e.g., site)
+		modules = {}
+		for line in proc.stderr.decode("utf-8", "replace").splitlines():
+			pieces = line.split("|")
+			if not line.startswith("import time:") or len(pieces) != 3:
+				continue
+			try:
+				cumulative = int(pieces[1]) / 1.0e6
+			except ValueError:
+				# header line
+				continue
+			name = pieces[2].rstrip()
+			if name.startswith("  "):
+				modules[name.strip()] = cumulative
+			elif name.strip() == moduleName:
+				break
+			else:
+				modules = {}
+		if bestTime is None or cumulative < bestTime:
+			bestTime = cumulative
+			bestModules = modules
+	return bestTime, bestModules
+
+def BenchmarkStartup( nRepeats=5 ):
+	"""Prints the time needed to import munich_films (in a fresh interpreter),
+	the slowest of the modules it pulls in, and any "heavy" modules which should
+	only be loaded when needed. Returns the import time in seconds.
+	"""
+	importTime, modules = MeasureImportTime(nRepeats=nRepeats)
+	print("Startup (python -X importtime -c \"import munich_films\"):")
+	print("   %-40s %10.3f ms" % ("import munich_films", 1000*importTime))
+	for name in sorted(modules, key=modules.get, reverse=True)[:5]:
+		print("      %-37s %10.3f ms" % (name, 1000*modules[name]))
+	heavy = [name for name in HEAVY_MODULES if name in modules]
+	if heavy:
+		print("   WARNING: heavy modules loaded at import: %s" % ", ".join(heavy))
+	return importTime
+
+
+def BenchmarkSuite( inputText, scales, nRepeats=3 ):
+	"""Runs the pipeline stages on the saved web page scaled up by each of the
+	factors in scales (see ScalePage), printing a table of results. Returns
+	a dict of results, suitable for saving as JSON.
+	"""
+	server = HTTPServer(("127.0.0.1", 0), PageHandler)
+	thread = threading.Thread(target=server.serve_forever)
+	thread.daemon = True
+	thread.start()
+	url = "http://127.0.0.1:%d/film/muenchen/oton.htm" % server.server_address[1]
+
+	results = {"info": {"commit": GetGitCommit(), "python": platform.python_version(),
+						"parser": munich_films.parserName, "date": time.strftime("%Y-%m-%d %H:%M:%S")},
+				"scales": {}}
+	results["startup"] = {"importTime": BenchmarkStartup(max(nRepeats, 5))}
+	print()
+	try:
+		for scale in scales:
+			pageText = ScalePage(inputText, scale)
+			PageHandler.pageBytes = pageText.encode("utf-8")
+			# fewer repeats for the larger pages
+			stages = RunPipelineStages(pageText, url, "bench_output.txt",
+										max(1, nRepeats // scale))
+			print("Page scaled %dx (%d bytes):" % (scale, len(PageHandler.pageBytes)))
+			print("   %-20s %12s %14s %14s %14s" % ("stage", "time (ms)", "alloc (KB)",
+					"peak alloc (KB)", "peak RSS +(KB)"))
+			for name, stats in stages:
+				rss = "-" if stats["peakRSSIncrease"] is None else "%d" % stats["peakRSSIncrease"]
+				print("   %-20s %12.3f %14.1f %14.1f %14s" % (name, 1000*stats["time"],
+						stats["allocated"]/1024.0, stats["peakAllocated"]/1024.0, rss))
+			results["scales"][str(scale)] = dict(stages)
+	finally:
+		server.shutdown()
+		server.server_close()
+	return results
+
+
+def CompareResults( oldResults, newResults, threshold=1.2 ):
+	"""Prints a comparison of stage timings between two sets of suite results
+	(e.g., from different commits), flagging stages which have become slower
+	by more than the given factor.
+	"""
+	print("Comparison with %s (%s):" % (oldResults["info"].get("commit"),
+										oldResults["info"].get("date")))
+	if "startup" in oldResults and "startup" in newResults:
+		oldTime = oldResults["startup"]["importTime"]
+		newTime = newResults["startup"]["importTime"]
+		ratio = newTime / max(oldTime, 1.0e-9)
+		flag = "   <-- SLOWER" if ratio > threshold else ""
+		print("   %-26s %10.3f ms --> %10.3f ms  (x %.2f)%s" % ("import munich_films",
+				1000*oldTime, 1000*newTime, ratio, flag))
+	for scale, newStages in newResults["scales"].items():
+		oldStages = oldResults["scales"].get(scale)
+		if oldStages is None:
+			continue
+		print("   page scaled %sx:" % scale)
+		for name, stats in newStages.items():
+			if name not in oldStages:
+				continue
+			ratio = stats["time"] / max(oldStages[name]["time"], 1.0e-9)
+			flag = "   <-- SLOWER" if ratio > threshold else ""
+			print("      %-20s %10.3f ms --> %10.3f ms  (x %.2f)%s" % (name,
+					1000*oldStages[name]["time"], 1000*stats["time"], ratio, flag))
+
+
+def main(argv=None):
+
+	usageString = "%prog [options]\n"
+	parser = optparse.OptionParser(usage=usageString, version="%prog ")
+
+	parser.add_option("--input", type="str", dest="inputFilename",
+					  default=testTextVersion, help="saved HTML file to use [default = %default]")
+	parser.add_option("--repeats", type="int", dest="nRepeats",
+					  default=5, help="number of timing repeats [default = %default]")
+	parser.add_option("--jobs", type="int", dest="maxJobs", default=min(os.cpu_count() or 1, 8),
+					  help="maximum number of worker processes for scaling test [default = %default]")
+	parser.add_option("--suite", action="store_true", dest="suite", default=False,
+					  help="run stage-by-stage benchmark suite (instead of the individual benchmarks)")
+	parser.add_option("--scales", type="str", dest="scales", default="1,10,100",
+					  help="comma-separated page scale factors for --suite [default = %default]")
+	parser.add_option("--json-output", type="str", dest="jsonOutput", default=None,
+					  help="save --suite results in this JSON file")
+	parser.add_option("--compare", type="str", dest="compareFile", default=None,
+					  help="compare --suite results with those saved in this JSON file")
+	parser.add_option("--queries", action="store_true", dest="queries", default=False,
+					  help="compare string-based and vectorized (NumPy) schedule queries on synthetic pages of --sizes films")
+	parser.add_option("--startup", action="store_true", dest="startup", default=False,
+					  help="time importing munich_films (instead of the individual benchmarks)")
+	parser.add_option("--scaling", action="store_true", dest="scaling", default=False,
+					  help="time parsing of synthetic pages (instead of the individual benchmarks)")
+	parser.add_option("--sizes", type="str", dest="sizes", default="100,1000,10000",
+					  help="comma-separated numbers of films for --scaling and --queries [default = %default]")
+	parser.add_option("--generate", type="int", dest="generateFilms", default=None,
+					  help="save a synthetic page with this many films (see --generate-output)")
+	parser.add_option("--generate-output", type="str", dest="generateOutput",
+					  default="synthetic_listings.html",
+					  help="output file for --generate [default = %default]")
+
+	(options, args) = parser.parse_args(argv)
+
+	if options.generateFilms is not None:
+		with open(options.generateOutput, 'w') as outf:
+			outf.write(GenerateListingsPage(options.generateFilms))
+		print("Saved synthetic page in \"{0}\".".format(options.generateOutput))
+		return
+	if options.queries:
+		BenchmarkQueries([int(x) for x in options.sizes.split(",")], options.nRepeats)
+		return
+	if options.startup:
+		BenchmarkStartup(max(options.nRepeats, 5))
+		return
+	if options.scaling:
+		sizes = [int(x) for x in options.sizes.split(",")]
+		BenchmarkScaling(sizes, options.nRepeats)
+		print()
+		BenchmarkScaling(sizes, options.nRepeats, singlePass=False)
+		return
+
+	with open(options.inputFilename) as f:
+		inputText = f.read()
+
+	if options.suite:
+		scales = [int(x) for x in options.scales.split(",")]
+		results = BenchmarkSuite(inputText, scales, options.nRepeats)
+		if options.jsonOutput is not None:
+			with open(options.jsonOutput, 'w') as outf:
+				json.dump(results, outf, indent=1)
+			print("Saved results in \"{0}\".".format(options.jsonOutput))
+		if options.compareFile is not None:
+			with open(options.compareFile) as f:
+				oldResults = json.load(f)
+			print()
+			CompareResults(oldResults, results)
+		return
+
+	BenchmarkFilmSoupDict(inputText, nRepeats=options.nRepeats)
+	print()
+	BenchmarkParsers(inputText, nRepeats=options.nRepeats)
+	print()
+	BenchmarkDayIndex(inputText, nRepeats=options.nRepeats)
+	print()
+	BenchmarkTranslation(inputText, nRepeats=options.nRepeats)
+	print()
+	BenchmarkMemory(inputText)
+	print()
+	BenchmarkJobs(inputText, options.maxJobs, nRepeats=options.nRepeats)
+
+
+if __name__ == '__main__':
+
+	main(sys.argv)
@@ -7,14 +7,17 @@
 #    Python 3.x
 #    requests 2.x ("pip install requests")
 #    BeautifulSoup 4.x ("pip install beautifulsoup4")
+#    Optional (faster HTML parsing): selectolax, lxml
+#    Optional (Parquet export): pyarrow
+#    Optional (vectorized queries): NumPy
 
 # TODO
 #
 # [ ] Create simpler film-time listings
 #
-# [ ] Generate day-by-dat listings
+# [X] Generate day-by-day listings
 #
-# [ ] Merge 3D and non-3D versions of same film?
+# [X] Merge 3D and non-3D versions of same film? [--merge-variants]
 #
 # [X] Add current date (default) output filename from artechock.de site?
 #
@@ -27,31 +30,214 @@
 
 from __future__ import print_function
 
-import sys, optparse, copy, time, re
-from collections import OrderedDict
+import sys, os, optparse, copy, time, re, functools, hashlib, json, zlib, codecs, random, io
+import importlib.util, threading, datetime, unicodedata
+from collections import OrderedDict, deque
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
 
-import requests
-from bs4 import BeautifulSoup
+# requests, BeautifulSoup, and concurrent.futures are imported where they're
+# needed (e.g., MakeSoup, HTTPGet), so that scripts which only use the
+# showtime-parsing functions -- or which read parsed results from the cache --
+# don't pay for loading them
 
-# possibly we can use lxml in the future, but BeautifulSoup can't seem to find it...
+# HTML parser backends, in order of preference (fastest first). "selectolax"
+# uses the selectolax/lexbor engine via SelectolaxSoup; the others are
+# BeautifulSoup tree builders. "html.parser" (Python standard library) is
+# always available.
+PARSER_PREFERENCE = ["selectolax", "lxml", "html.parser", "html5lib"]
+PARSER_MODULES = {"selectolax": "selectolax", "lxml": "lxml", "html5lib": "html5lib",
+					"html.parser": "html.parser"}
+
+# set by SetParser(); use MakeSoup() to parse HTML text with it
 parserName = "html.parser"
-# try:
-# 	import lxml
-# 	parserName = "lxml"
-# except ImportError:
-# 	parserName = "html.parser"
+
+
+# INSTRUMENTATION
+# Timers for the pipeline stages (fetch, parse, split, extract, translate, schedule,
+# write) and counters for the numbers of things processed; these do nothing unless
+# EnableProfiling has been called (e.g., via the --profile option). Counters mean
+# the same thing in every code path: "films" and "theaters" count the films which
+# pass the language filter and their theater rows, and "showtimeCacheMisses" the
+# showtime strings actually parsed (ParseShowtimes calls not answered by its cache).
+profilingEnabled = False
+tracingEnabled = False
+stageTimes = OrderedDict()   # stage name --> [total time in seconds, number of calls]
+profileCounters = OrderedDict()   # counter name --> count
+traceEvents = []   # Chrome-trace "complete" events, if tracingEnabled
+
+def EnableProfiling( enable=True, trace=False ):
+	"""Turns the stage timers and counters on (or off), and clears any previous
+	measurements. If trace = True, each timed call is also recorded as a Chrome
+	trace event (see WriteChromeTrace).
+	"""
+	global profilingEnabled, tracingEnabled
+	profilingEnabled = enable
+	tracingEnabled = enable and trace
+	stageTimes.clear()
+	profileCounters.clear()
+	del traceEvents[:]
+	fetchMetrics.Reset()
+
+def CountEvent( name, n=1 ):
+	"""Adds n to the profiling counter called name (if profiling is enabled).
+	"""
+	if profilingEnabled:
+		profileCounters[name] = profileCounters.get(name, 0) + n
+
+def RecordStageTime( name, t0, t1 ):
+	"""Adds a timed call (from perf_counter time t0 to t1) to the stage called name.
+	"""
+	entry = stageTimes.get(name)
+	if entry is None:
+		entry = stageTimes[name] = [0.0, 0]
+	entry[0] += t1 - t0
+	entry[1] += 1
+	if tracingEnabled:
+		traceEvents.append({"name": name, "cat": "munich_films", "ph": "X",
+							"ts": 1.0e6*t0, "dur": 1.0e6*(t1 - t0), "pid": os.getpid(),
+							"tid": threading.get_ident()})
+
+class ProfileStage(object):
+	"""Context manager which times the enclosed code as part of the stage called
+	name (if profiling is enabled):
+		with ProfileStage("write"):
+			...
+	"""
+	__slots__ = ("name", "t0")
+
+	def __init__( self, name ):
+		self.name = name
+		self.t0 = None
+
+	def __enter__( self ):
+		if profilingEnabled:
+			self.t0 = time.perf_counter()
+		return self
+
+	def __exit__( self, excType, excValue, tb ):
+		if self.t0 is not None:
+			RecordStageTime(self.name, self.t0, time.perf_counter())
+			self.t0 = None
+
+def ProfiledStage( name ):
+	"""Decorator which times each call of the decorated function as part of the
+	stage called name (if profiling is enabled).
+	"""
+	def Decorator( func ):
+		@functools.wraps(func)
+		def Wrapper( *args, **kwargs ):
+			if not profilingEnabled:
+				return func(*args, **kwargs)
+			t0 = time.perf_counter()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				RecordStageTime(name, t0, time.perf_counter())
+		return Wrapper
+	return Decorator
+
+def GetProfileData( totalTime=None ):
+	"""Returns the current stage timings and counters as a dict (suitable for
+	saving as JSON): {"stages": {name: {"time": seconds, "calls": n}, ...},
+	"counters": {name: count, ...}, "totalTime": totalTime}.
+	"""
+	stages = OrderedDict((name, {"time": t, "calls": n}) for name, (t, n) in stageTimes.items())
+	return {"stages": stages, "counters": OrderedDict(profileCounters), "totalTime": totalTime,
+			"fetch": fetchMetrics.GetSummary()}
+
+def GetProfileReport( totalTime=None ):
+	"""Returns a printable summary of the current stage timings and counters
+	(including rates per second, if the total elapsed time is specified).
+	"""
+	lines = ["Profile (wall time by stage; nested stages are included in their parents' times):"]
+	for name, (t, n) in stageTimes.items():
+		line = "   %-12s %10.2f ms  %7d call%s" % (name, 1000*t, n, "" if n == 1 else "s")
+		if totalTime:
+			line += "  (%5.1f%%)" % (100*t/totalTime)
+		lines.append(line)
+	if totalTime is not None:
+		lines.append("   %-12s %10.2f ms" % ("total", 1000*totalTime))
+	lines.append("Counters:")
+	for name, count in profileCounters.items():
+		line = "   %-16s %10d" % (name, count)
+		if totalTime:
+			line += "  (%.1f/s)" % (count/totalTime)
+		lines.append(line)
+	fetchSummary = fetchMetrics.GetSummary()
+	if fetchSummary["requests"] > 0 or fetchSummary["rejected"] > 0:
+		line = "Fetch: %d request%s, %d retr%s, %d rejected by circuit breaker, %d cached fallback%s" % (
+				fetchSummary["requests"], "" if fetchSummary["requests"] == 1 else "s",
+				fetchSummary["retries"], "y" if fetchSummary["retries"] == 1 else "ies",
+				fetchSummary["rejected"], fetchSummary["staleFallbacks"],
+				"" if fetchSummary["staleFallbacks"] == 1 else "s")
+		lines.append(line)
+		for kind, count in fetchSummary["errors"].items():
+			lines.append("   %-16s %10d" % (kind, count))
+		if "latency" in fetchSummary:
+			lines.append("   latency: mean %.1f ms, median %.1f ms, 95th pct. %.1f ms, max %.1f ms" % tuple(
+					1000*fetchSummary["latency"][x] for x in ["mean", "p50", "p95", "max"]))
+	return "\n".join(lines)
+
+def WriteChromeTrace( outputFname ):
+	"""Saves the recorded trace events (see EnableProfiling) in Chrome's trace
+	event format (viewable in chrome://tracing or Perfetto).
+	"""
+	with open(outputFname, 'w') as outf:
+		json.dump({"traceEvents": traceEvents, "displayTimeUnit": "ms"}, outf)
 
 
 artechockURL = "http://www.artechock.de/film/muenchen/oton.htm"
 
+# artechock.de pages which can be specified by name with the --target option
+ARTECHOCK_TARGETS = OrderedDict([
+	("muenchen-ov", artechockURL),
+	("muenchen", "http://www.artechock.de/film/muenchen/film.htm"),
+	])
+
+# settings for retrieving web pages (see HTTPGet and FetchAndParseTargets)
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5   # seconds; doubled after each failed attempt (with jitter)
+MAX_BACKOFF = 10.0   # seconds
+DEFAULT_TIMEOUT = (5.0, 30.0)   # seconds: (connect, read)
+# after BREAKER_FAILURE_THRESHOLD consecutive failed requests to a host, no
+# requests are sent to it for BREAKER_RESET_TIME seconds (see CircuitBreaker)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIME = 60.0   # seconds
+FETCH_METRICS_WINDOW = 1000   # number of recent request latencies kept
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_MAX_PER_HOST = 2
+
+# on-disk cache of fetched web pages (see FetchPageText)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "munich_films")
+DEFAULT_CACHE_TTL = 3600   # seconds
+
+# parsed results are cached in the "parsed" subdirectory of the cache directory
+# (see ParseFilmListings); increment PARSER_VERSION whenever a change to the
+# parsing code changes its output (or the format of the cached results), so
+# that old cached results are ignored
+PARSER_VERSION = 3
+DEFAULT_PARSED_CACHE_SIZE = 20*1024*1024   # bytes
+
 testTextVersion = "/Users/erwin/Desktop/artechock_originalton.html"
 
 GERMAN_DAILY = "tgl."
 GERMAN_EXCEPT = u'außer'
 DAYS_TO_ENGLISH = {"So.": "Sun", "Mo.": "M", "Di.": "Tu", "Mi.": "W", "Do.": "Th",
 					"Fr.": "F", "Sa.": "Sat"}
+# two-letter weekday codes, as in iCalendar (RFC 5545)
+DAYS_TO_ISO = {"So.": "SU", "Mo.": "MO", "Di.": "TU", "Mi.": "WE", "Do.": "TH",
+				"Fr.": "FR", "Sa.": "SA"}
+
+TAGEN = ["So.", "Mo.", "Di.", "Mi.", "Do.", "Fr.", "Sa."]
 
-TAGEN = ["So.", "Mo.", "Di.", "Mi.", "Do.", "Sa."]
+# Target languages for showtimes: German word or day name --> replacement
+WORDS_TO_ENGLISH = {GERMAN_DAILY: "daily", GERMAN_EXCEPT: "except", "auch": "also"}
+LOCALES = OrderedDict([("en", dict(WORDS_TO_ENGLISH, **DAYS_TO_ENGLISH)),
+						("de", {}),   # passthrough
+						("iso", dict(WORDS_TO_ENGLISH, **DAYS_TO_ISO))])
+DEFAULT_LOCALE = "en"
+TRANSLATION_CACHE_SIZE = 4096   # per locale
 
 
 # EXAMPLES OF THEATER TIME LISTINGS:
@@ -74,6 +260,87 @@ TAGEN = ["So.", "Mo.", "Di.", "Mi.", "Do.", "Sa."]
 # day specifications: single | single/single | single/single/single | single-single
 
 
+def ParserIsAvailable( name ):
+	"""Returns True if the HTML parser backend specified by name can be used.
+	"""
+	if name not in PARSER_MODULES:
+		return False
+	return importlib.util.find_spec(PARSER_MODULES[name]) is not None
+
+def GetAvailableParsers( ):
+	"""Returns a list of the installed HTML parser backends, fastest first.
+	"""
+	return [name for name in PARSER_PREFERENCE if ParserIsAvailable(name)]
+
+def SetParser( name="auto" ):
+	"""Sets the HTML parser backend used by MakeSoup. name = "auto" selects
+	the fastest installed backend; otherwise, name should be one of the
+	entries in PARSER_PREFERENCE. Returns the name of the selected backend.
+	"""
+	global parserName
+	if name == "auto":
+		name = GetAvailableParsers()[0]
+	elif not ParserIsAvailable(name):
+		msg = "HTML parser \"{0}\" is not available".format(name)
+		msg += " (available parsers: {0})".format(", ".join(GetAvailableParsers()))
+		raise ValueError(msg)
+	parserName = name
+	return parserName
+
+
+class SelectolaxSoup(object):
+	"""Minimal wrapper around a selectolax (lexbor) node, supporting the subset
+	of the BeautifulSoup API used in this module: find_all, find, select, get,
+	and getText.
+	"""
+	def __init__( self, node ):
+		self.node = node
+
+	def find_all( self, name, attrs=None ):
+		selector = name
+		if attrs is not None and "class" in attrs:
+			selector += "".join("." + c for c in attrs["class"].split())
+		return [SelectolaxSoup(n) for n in self.node.css(selector)]
+
+	def find( self, name, attrs=None ):
+		matches = self.find_all(name, attrs)
+		if len(matches) > 0:
+			return matches[0]
+		return None
+
+	def select( self, selector ):
+		return [SelectolaxSoup(n) for n in self.node.css(selector)]
+
+	def get( self, key, default=None ):
+		value = self.node.attributes.get(key)
+		if value is None:
+			return default
+		if key == "class":
+			# BeautifulSoup treats class as a multi-valued attribute
+			return value.split()
+		return value
+
+	def getText( self, separator="", strip=False ):
+		if not strip:
+			return self.node.text(deep=True, separator=separator)
+		texts = [n.text(deep=False).strip() for n in self.node.traverse(include_text=True)
+					if n.tag == "-text"]
+		return separator.join([t for t in texts if len(t) > 0])
+
+
+@ProfiledStage("parse")
+def MakeSoup( inputText ):
+	"""Parses a string containing HTML, using the current parser backend
+	(see SetParser), and returns a BeautifulSoup object (or a SelectolaxSoup
+	object, for the "selectolax" backend).
+	"""
+	if parserName == "selectolax":
+		from selectolax.lexbor import LexborHTMLParser
+		return SelectolaxSoup(LexborHTMLParser(inputText).root)
+	from bs4 import BeautifulSoup
+	return BeautifulSoup(inputText, parserName)
+
+
 def IsShowtime( string ):
 	"""Determines whether string has the format xx:xx, where xx = pair
 	of digits.
@@ -85,15 +352,70 @@ def IsShowtime( string ):
 		return False
 
 
+# SHOWTIME TRANSLATION
+# Each locale's table is compiled into a single alternation regex (longest
+# words first), so a showtimes string is translated in one pass, and
+# replacement text is never translated again. Translations are memoized,
+# since the same showtimes strings recur across films and pages.
+
+translators = {}   # (locale, daysOnly) --> translation function
+showtimeLocale = DEFAULT_LOCALE
+
+def GetTranslator( locale=DEFAULT_LOCALE, daysOnly=False ):
+	"""Returns a function which translates the German words and day names (or
+	only the day names, if daysOnly = True) in a showtimes string into the
+	given locale (one of the keys of LOCALES).
+	"""
+	translator = translators.get((locale, daysOnly))
+	if translator is None:
+		table = LOCALES[locale]
+		if daysOnly:
+			table = {word: table[word] for word in TAGEN if word in table}
+		if len(table) == 0:
+			def Translate( string ):
+				return string
+		else:
+			pattern = re.compile("|".join(re.escape(word)
+									for word in sorted(table, key=len, reverse=True)))
+			lookup = table.__getitem__
+			def Translate( string ):
+				return pattern.sub(lambda m: lookup(m.group()), string)
+		translator = translators[(locale, daysOnly)] = \
+				functools.lru_cache(maxsize=TRANSLATION_CACHE_SIZE)(Translate)
+	return translator
+
+translateShowtimes = GetTranslator(DEFAULT_LOCALE)
+
+def SetLocale( locale=DEFAULT_LOCALE ):
+	"""Sets the target language for showtimes (see TranslateTimesSimple): "en"
+	(English, the default), "de" (unchanged German), or "iso" (two-letter
+	weekday codes). Returns the locale.
+	"""
+	global showtimeLocale, translateShowtimes
+	if locale not in LOCALES:
+		raise ValueError("Unknown locale \"{0}\" (available locales: {1})".format(locale,
+						", ".join(LOCALES)))
+	showtimeLocale = locale
+	translateShowtimes = GetTranslator(locale)
+	return showtimeLocale
+
+def InitWorker( parser, locale ):
+	"""Selects the HTML parser backend and showtimes locale in a worker process
+	(which doesn't necessarily inherit the current settings).
+	"""
+	SetParser(parser)
+	SetLocale(locale)
+
+
 # KEEP
-def TranslateDays( string ):
-	for Tag in TAGEN:
-		string = string.replace(Tag, DAYS_TO_ENGLISH[Tag])
-	return string
+def TranslateDays( string, locale=DEFAULT_LOCALE ):
+	return GetTranslator(locale, daysOnly=True)(string)
 
+@ProfiledStage("translate")
 def TranslateTimesSimple( theaterTime ):
 	"""Given a tuple of(theaterName, movie showtimes) in German, returns 
-	a string with the movie showtimes in English.
+	a string with the movie showtimes in English (or the locale selected
+	with SetLocale).
 	"""
 	showtimes = theaterTime[1]
 	# strip off extra stuff (some lines have extra spaces and \n)
@@ -104,12 +426,7 @@ def TranslateTimesSimple( theaterTime ):
 	# strip off excess spaces at beginning or end
 	showtimesClean = showtimesClean.rstrip()
 	showtimesClean = showtimesClean.lstrip()
-	# translate to English
-	showtimesClean = showtimesClean.replace("tgl.", "daily")
-	showtimesClean = showtimesClean.replace(u"außer", "except")
-	showtimesClean = showtimesClean.replace("auch", "also")
-	showtimesClean = TranslateDays(showtimesClean)
-	return showtimesClean
+	return translateShowtimes(showtimesClean)
 	
 	
 # KEEP
@@ -131,7 +448,7 @@ def GetTheater( soup ):
 	# safest thing is to look for "link" class within "mid b" column
 	midCol = soup.find("td", {"class": "mid b"})
 	link = midCol.find("span", {"class": "link"})
-	return link.getText()
+	return link.getText("\n", strip=True)
 	
 def GetShowTimes( soup ):
 	"""Given a BeautifulSoup object corresponding to a table row containing
@@ -140,38 +457,43 @@ def GetShowTimes( soup ):
 	Used in GetTheatersAndTimes.
 	"""
 	timesBlob = soup.find_all("td", {"class": "right"})[0]
+	# one line per text fragment (same layout as the old prettify()-based
+	# approach, so the first line is always the actual showtimes)
+	showTimes = timesBlob.getText("\n", strip=True)
 	# get rid of Unicode non-breaking spaces
-	showTimes = timesBlob.getText()
 	showTimes = showTimes.replace(u'\xa0', u' ')
 	return showTimes
 	
+@ProfiledStage("extract")
 def GetTheatersAndTimes( singleFilmSoup ):
 	"""Given a BeautifulSoup object corresponding to the set of table rows
 	for a given film, extract the theater names and corresponding showtimes.
+	singleFilmSoup can also be a list of the film's table rows (start row
+	first, then any follow rows), as produced by GetFilmRows.
 	
 	Returns a list of tuples:
 		[(theater1, showtimes1), (theater2, showtimes2), ...]
 	
 	Sample output:
-		[('Museum Lichtspiele',
-		  'So. 10:30\n    \n     (\n     \n      artechock-Kritik\n     \n     )')]
-	"""
-	# all films have at least a "start" table row ('class="start"')
-	startStuff = singleFilmSoup.find_all("tr", {"class": "start"})[0]
-	theaterName = GetTheater(startStuff)
-	showTimes = GetShowTimes(startStuff)
-	theatersAndTimes = [(theaterName.strip(), showTimes.strip())]
-	
-	# some films (those showing at more than one theater!) have extra
-	# table rows with 'class="follow"', one for each extra theater
-	otherStuff = singleFilmSoup.find_all("tr", {"class": "follow"})
-	if len(otherStuff) > 0:
-		# more theaters!
-		for nextSoup in otherStuff:
-			theaterName = GetTheater(nextSoup)
-			showTimes = GetShowTimes(nextSoup)
-			theatersAndTimes.append((theaterName.strip(), showTimes.strip()))
+		[('Museum Lichtspiele', 'So. 10:30\n(\nartechock-Kritik\n)')]
+	"""
+	if isinstance(singleFilmSoup, list):
+		filmRows = singleFilmSoup
+	else:
+		# all films have at least a "start" table row ('class="start"');
+		# some films (those showing at more than one theater!) have extra
+		# table rows with 'class="follow"', one for each extra theater
+		startStuff = singleFilmSoup.find_all("tr", {"class": "start"})[0]
+		otherStuff = singleFilmSoup.find_all("tr", {"class": "follow"})
+		filmRows = [startStuff] + otherStuff
 
+	theatersAndTimes = []
+	for rowSoup in filmRows:
+		theaterName = GetTheater(rowSoup)
+		showTimes = GetShowTimes(rowSoup)
+		theatersAndTimes.append((theaterName.strip(), showTimes.strip()))
+
+	CountEvent("theaters", len(theatersAndTimes))
 	return theatersAndTimes
 
 
@@ -183,66 +505,455 @@ def GetScheduleDates( soup ):
 	
 	h2 = soup.find_all("h2")
 	for h2obj in h2:
-		txt = h2obj.getText()
-		if txt.find("Filme im Originalton") > -1:
-			p = txt.split(":")[1]
-			pp = p.split()
-			startDate,endDate = pp[1],pp[4]
-			return startDate + "-" + endDate
+		scheduleDates = GetScheduleDatesFromText(h2obj.getText())
+		if scheduleDates is not None:
+			return scheduleDates
+	return None
+
+def GetScheduleDatesFromText( txt ):
+	"""Given the text of an <h2> heading from the artechock.de web page, returns
+	the start and end dates for the current schedule, or None if the heading
+	isn't the one with the schedule dates.
+	"""
+	if txt.find("Filme im Originalton") > -1:
+		p = txt.split(":")[1]
+		pp = p.split()
+		startDate,endDate = pp[1],pp[4]
+		return startDate + "-" + endDate
 	return None
 
 
 
 
+def GetCacheFilenames( url, cacheDir ):
+	"""Returns a tuple of (page filename, metadata filename) for the cached copy
+	of the web page at url.
+	"""
+	key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+	baseName = os.path.join(cacheDir, key)
+	return baseName + ".html", baseName + ".json"
+
+def ReadCachedPage( url, cacheDir ):
+	"""Returns a tuple of (page text, metadata dict) for the cached copy of the
+	web page at url, or (None, None) if there is no cached copy.
+	"""
+	pageFname, metaFname = GetCacheFilenames(url, cacheDir)
+	try:
+		with open(metaFname) as f:
+			metadata = json.load(f)
+		with open(pageFname, encoding="utf-8") as f:
+			pageText = f.read()
+	except (IOError, ValueError):
+		return None, None
+	return pageText, metadata
+
+def WriteFileAtomically( fname, text ):
+	"""Writes text to fname via a temporary file, so that readers never see
+	a partially written file.
+	"""
+	tempFname = "{0}.{1}.tmp".format(fname, os.getpid())
+	with open(tempFname, 'w', encoding="utf-8") as outf:
+		outf.write(text)
+	os.replace(tempFname, fname)
+
+def WriteCachedPage( url, cacheDir, pageText, metadata ):
+	"""Saves the text of the web page at url, plus its metadata (validators and
+	time of retrieval), in the cache.
+	"""
+	os.makedirs(cacheDir, exist_ok=True)
+	pageFname, metaFname = GetCacheFilenames(url, cacheDir)
+	if pageText is not None:
+		WriteFileAtomically(pageFname, pageText)
+	WriteFileAtomically(metaFname, json.dumps(metadata))
+
+
+# ROBUST FETCHING
+# Every request has connect/read timeouts; failed requests (connection errors,
+# timeouts, truncated bodies, 5xx responses) are retried with exponential
+# backoff plus jitter; a per-host circuit breaker stops sending requests to a
+# host which keeps failing; and FetchPageText falls back to the cached copy of
+# the page if it can't be retrieved. Latencies and errors are recorded in
+# fetchMetrics.
+
+fetchTimeout = DEFAULT_TIMEOUT   # default for HTTPGet (see --timeout)
+
+class CircuitOpenError(IOError):
+	"""Raised instead of sending a request to a host whose circuit breaker is open.
+	"""
+	pass
+
+
+class CircuitBreaker(object):
+	"""Circuit breaker for one host. It starts out "closed" (requests allowed);
+	after failureThreshold consecutive failures it is "open" (requests are
+	rejected) for resetTime seconds, then "half-open": one trial request is
+	allowed, and closes the breaker if it succeeds or re-opens it if it fails.
+	"""
+
+	def __init__( self, failureThreshold=BREAKER_FAILURE_THRESHOLD, resetTime=BREAKER_RESET_TIME ):
+		self.failureThreshold = failureThreshold
+		self.resetTime = resetTime
+		self.lock = threading.Lock()
+		self.failures = 0
+		self.openedAt = None
+		self.trialInProgress = False
+
+	def GetState( self ):
+		with self.lock:
+			if self.openedAt is None:
+				return "closed"
+			if time.monotonic() - self.openedAt < self.resetTime:
+				return "open"
+			return "half-open"
+
+	def Allow( self ):
+		"""Returns True if a request may be sent now.
+		"""
+		with self.lock:
+			if self.openedAt is None:
+				return True
+			if time.monotonic() - self.openedAt < self.resetTime or self.trialInProgress:
+				return False
+			self.trialInProgress = True
+			return True
+
+	def RecordSuccess( self ):
+		with self.lock:
+			self.failures = 0
+			self.openedAt = None
+			self.trialInProgress = False
+
+	def RecordFailure( self ):
+		with self.lock:
+			self.failures += 1
+			if self.trialInProgress or self.failures >= self.failureThreshold:
+				self.openedAt = time.monotonic()
+			self.trialInProgress = False
+
+
+circuitBreakers = {}   # host --> CircuitBreaker
+circuitBreakersLock = threading.Lock()
+
+def GetCircuitBreaker( url ):
+	"""Returns the CircuitBreaker for the host of url.
+	"""
+	host = urlsplit(url).netloc
+	with circuitBreakersLock:
+		breaker = circuitBreakers.get(host)
+		if breaker is None:
+			breaker = circuitBreakers[host] = CircuitBreaker()
+		return breaker
+
+def ResetCircuitBreakers( ):
+	with circuitBreakersLock:
+		circuitBreakers.clear()
+
+
+class FetchMetrics(object):
+	"""Thread-safe counters and latencies for HTTP requests (see HTTPGet).
+	"""
+
+	def __init__( self ):
+		self.lock = threading.Lock()
+		self.Reset()
+
+	def Reset( self ):
+		with self.lock:
+			self.requests = 0
+			self.errors = OrderedDict()   # kind ("timeout", "http503", etc.) --> count
+			self.retries = 0
+			self.rejected = 0   # requests not sent because a circuit breaker was open
+			self.staleFallbacks = 0   # cached pages used because the fetch failed
+			self.latencies = deque(maxlen=FETCH_METRICS_WINDOW)
+
+	def RecordRequest( self, latency, errorKind=None ):
+		with self.lock:
+			self.requests += 1
+			self.latencies.append(latency)
+			if errorKind is not None:
+				self.errors[errorKind] = self.errors.get(errorKind, 0) + 1
+
+	def RecordEvent( self, name ):
+		"""Increments one of the counters "retries", "rejected", or "staleFallbacks".
+		"""
+		with self.lock:
+			setattr(self, name, getattr(self, name) + 1)
+
+	def GetSummary( self ):
+		"""Returns the metrics as a dict (suitable for saving as JSON), with
+		latencies (mean, median, 95th percentile, maximum) in seconds.
+		"""
+		with self.lock:
+			latencies = sorted(self.latencies)
+			summary = OrderedDict([("requests", self.requests), ("errors", OrderedDict(self.errors)),
+									("retries", self.retries), ("rejected", self.rejected),
+									("staleFallbacks", self.staleFallbacks)])
+		if len(latencies) > 0:
+			n = len(latencies)
+			summary["latency"] = OrderedDict([("mean", sum(latencies)/n),
+											("p50", latencies[(n - 1)//2]),
+											("p95", latencies[min(n - 1, int(0.95*n))]),
+											("max", latencies[-1])])
+		return summary
+
+fetchMetrics = FetchMetrics()
+
+
+def GetFetchErrorKind( err ):
+	"""Returns a short description of the kind of a failed request's exception.
+	"""
+	import requests
+	if isinstance(err, requests.exceptions.Timeout):
+		return "timeout"
+	if isinstance(err, (requests.exceptions.ChunkedEncodingError,
+						requests.exceptions.ContentDecodingError)):
+		return "truncated"
+	if isinstance(err, requests.exceptions.ConnectionError):
+		return "connection"
+	return type(err).__name__
+
+def GetBackoffTime( backoff, attempt ):
+	"""Returns the time to wait before retry number attempt + 1: backoff doubled
+	for each previous attempt, capped at MAX_BACKOFF, and randomly reduced by up
+	to half (so that clients which failed together don't retry together).
+	"""
+	return min(MAX_BACKOFF, backoff * 2**attempt) * random.uniform(0.5, 1.0)
+
+
+def MakeSession( poolSize=DEFAULT_FETCH_WORKERS ):
+	"""Returns a requests.Session whose connection pool can hold poolSize
+	connections per host, for use by several threads at once.
+	"""
+	import requests
+	session = requests.Session()
+	adapter = requests.adapters.HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+	session.mount("http://", adapter)
+	session.mount("https://", adapter)
+	return session
+
+@ProfiledStage("fetch")
+def HTTPGet( url, headers=None, session=None, retries=0, backoff=DEFAULT_BACKOFF, timeout=None ):
+	"""Sends a GET request for url (using session, if specified) and returns the
+	response. timeout = (connect, read) timeouts in seconds (default =
+	fetchTimeout). Connection errors, timeouts, truncated responses, and
+	server errors (status 5xx) are retried up to retries times, waiting about
+	backoff seconds before the first retry and doubling the wait after each
+	one (see GetBackoffTime).
+	
+	Raises CircuitOpenError if the host's circuit breaker (see CircuitBreaker)
+	is open, without sending a request.
+	"""
+	import requests
+	getter = requests.get if session is None else session.get
+	if timeout is None:
+		timeout = fetchTimeout
+	breaker = GetCircuitBreaker(url)
+	for attempt in range(retries + 1):
+		if not breaker.Allow():
+			fetchMetrics.RecordEvent("rejected")
+			raise CircuitOpenError("Circuit breaker open for {0} (too many failed requests)".format(
+									urlsplit(url).netloc))
+		CountEvent("requests")
+		t0 = time.perf_counter()
+		try:
+			res = getter(url, headers=headers, timeout=timeout)
+		except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+				requests.exceptions.ChunkedEncodingError,
+				requests.exceptions.ContentDecodingError) as err:
+			fetchMetrics.RecordRequest(time.perf_counter() - t0, GetFetchErrorKind(err))
+			breaker.RecordFailure()
+			if attempt == retries:
+				raise
+		except BaseException as err:
+			# anything else (too many redirects, invalid URL, cancellation, ...)
+			# isn't retried, but still counts as a failure -- in particular, it
+			# must end a half-open breaker's trial request
+			fetchMetrics.RecordRequest(time.perf_counter() - t0, GetFetchErrorKind(err))
+			breaker.RecordFailure()
+			raise
+		else:
+			if res.status_code < 500:
+				fetchMetrics.RecordRequest(time.perf_counter() - t0)
+				breaker.RecordSuccess()
+				return res
+			fetchMetrics.RecordRequest(time.perf_counter() - t0, "http%d" % res.status_code)
+			breaker.RecordFailure()
+			if attempt == retries:
+				return res
+		fetchMetrics.RecordEvent("retries")
+		time.sleep(GetBackoffTime(backoff, attempt))
+
+
+def FetchPageText( url=artechockURL, cacheDir=None, ttl=DEFAULT_CACHE_TTL, offline=False,
+					session=None, retries=DEFAULT_RETRIES ):
+	"""Retrieves the web page at url and returns its text.
+	
+	If cacheDir is specified, the page is stored in that directory along with
+	its ETag and Last-Modified validators. A cached copy less than ttl seconds
+	old is used without contacting the server; otherwise, a conditional request
+	is sent (If-None-Match/If-Modified-Since), and the cached copy is used if
+	the server says the page hasn't changed. If offline = True, the cached copy
+	is always used (IOError is raised if there isn't one). If the page can't be
+	retrieved (after retries; or the server's circuit breaker is open), the
+	cached copy is used regardless of its age, if there is one.
+	
+	session and retries are passed on to HTTPGet.
+	"""
+	if cacheDir is None:
+		res = HTTPGet(url, session=session, retries=retries)
+		res.raise_for_status()
+		return res.text
+
+	cachedText, metadata = ReadCachedPage(url, cacheDir)
+	if offline:
+		if cachedText is None:
+			raise IOError("No cached copy of {0} in {1}".format(url, cacheDir))
+		return cachedText
+	if cachedText is not None and time.time() - metadata["fetched"] < ttl:
+		return cachedText
+
+	headers = {}
+	if cachedText is not None:
+		if metadata.get("etag") is not None:
+			headers["If-None-Match"] = metadata["etag"]
+		if metadata.get("lastModified") is not None:
+			headers["If-Modified-Since"] = metadata["lastModified"]
+	import requests
+	try:
+		res = HTTPGet(url, headers, session, retries)
+		if res.status_code != 304 or cachedText is None:
+			res.raise_for_status()
+	except (requests.exceptions.RequestException, CircuitOpenError) as err:
+		if cachedText is None:
+			raise
+		# fall back to the (stale) cached copy; it isn't marked as checked, so
+		# the next call tries the server again
+		fetchMetrics.RecordEvent("staleFallbacks")
+		print("Unable to retrieve {0} ({1}); using cached copy from {2}.".format(url,
+				GetFetchErrorKind(err), time.strftime("%Y-%m-%d %H:%M", time.localtime(metadata["fetched"]))))
+		return cachedText
+	if res.status_code == 304:
+		# page hasn't changed; just record the time we checked
+		metadata["fetched"] = time.time()
+		WriteCachedPage(url, cacheDir, None, metadata)
+		return cachedText
+	pageText = res.text
+	metadata = {"url": url, "etag": res.headers.get("ETag"),
+				"lastModified": res.headers.get("Last-Modified"), "fetched": time.time()}
+	WriteCachedPage(url, cacheDir, pageText, metadata)
+	return pageText
+
+
 # KEEP
-def GetSoupObjectFromURL( url=artechockURL ):
+def GetSoupObjectFromURL( url=artechockURL, cacheDir=None, ttl=DEFAULT_CACHE_TTL,
+						offline=False ):
 	print("Fetching current web page from artechock.de ...")
-	# not much point in trying to handle the exception, since sometimes
-	# a whole bunch are generated
-	res = requests.get(url)
-	res.raise_for_status()
-	inputText = res.text
+	# (FetchPageText handles timeouts and retries, and falls back to the
+	# cached copy if the server can't be reached)
+	inputText = FetchPageText(url, cacheDir, ttl, offline)
 
-	return BeautifulSoup(inputText, parserName)
+	return MakeSoup(inputText)
+
+
+def GetTitleAndLanguage( startRow ):
+	"""Given a BeautifulSoup object for the "start" table row of a film,
+	returns a tuple of (filmTitle, langType), where filmTitle has " (3D)"
+	appended for 3D versions and langType is one of "OF", "OmU", "OmeU",
+	or "German".
+	"""
+	titleText = startRow.select("strong")[0].getText("\n", strip=True)
+	return GetTitleAndLanguageFromText(titleText)
+
+def GetTitleAndLanguageFromText( titleText ):
+	"""Same as GetTitleAndLanguage, but given the title text (the text fragments
+	of the <strong> element in the "start" row, one per line).
+	"""
+	filmTitle, langType, is3D = GetFilmInfoFromText(titleText)
+	if is3D:
+		filmTitle += " (3D)"
+	return filmTitle, langType
+
+def GetFilmInfoFromText( titleText ):
+	"""Given the title text of a film (see GetTitleAndLanguageFromText), returns
+	a tuple of (filmTitle, langType, is3D), where filmTitle is the plain title.
+	"""
+	filmTitle = GetTitle(titleText)
+	is3D = titleText.find("3D") > -1
+	if titleText.find("(OF)") > -1:
+		langType = "OF"
+	elif titleText.find("(OmU)") > -1:
+		langType = "OmU"
+	elif titleText.find("(OmeU)") > -1:
+		langType = "OmeU"
+	else:
+		langType = "German"
+	return filmTitle, langType, is3D
+
+
+@ProfiledStage("split")
+def GetFilmRows( soup ):
+	"""Given a BeautifulSoup object corresponding to the artechock.de web page,
+	walks the rows of the film-listings table once and returns a list of
+	film records, each one being the list of table rows for that film
+	(the "start" row followed by any "follow" rows). Other rows (e.g.,
+	advertising) are skipped.
+	"""
+	# extract the table with movie listings (should be only one of these):
+	listingsTable = soup.find_all("table", {"class": "linien prog film"})[0]
+	filmRecords = []
+	currentRows = None
+	for row in listingsTable.find_all("tr"):
+		rowClasses = row.get("class", [])
+		if "start" in rowClasses:
+			currentRows = [row]
+			filmRecords.append(currentRows)
+		elif "follow" in rowClasses and currentRows is not None:
+			currentRows.append(row)
+	return filmRecords
 
 
 # KEEP
-def GetFilmSoupDict( soup, getGermanFilms=False  ):
+def GetFilmSoupDict( soup, getGermanFilms=False, singlePass=True ):
 	"""
 	Given a BeautifulSoup object corresponding to the artechock.de web page,
 	this function returns a dictionary mapping film names to corresponding
 	BeautifulSoup objects (i.e., from the subset of the web page dealing with
 	an individual film).
+	
+	By default (singlePass=True), the table rows are walked once and the
+	dictionary values are lists of the film's table rows (see GetFilmRows);
+	singlePass=False uses the older approach of prettifying the table,
+	splitting the text into per-film chunks, and re-parsing each chunk.
+	Either kind of value can be passed to GetTheatersAndTimes.
 	"""
-	# extract the table with movie listings (should be only one of these):
-	listingsTable = soup.find_all("table", {"class": "linien prog film"})[0]
-	txtVersion = listingsTable.prettify()
-	# strip off the final "</table>":
-	txtVersion = txtVersion.replace("</table>", "")
-	# split it up into chunks starting with '<tr class="start"', then paste that
-	# text back onto the beginning of each chunk (skip first chunk, since it's just
-	# the start of the table)
-	pieces = txtVersion.split('<tr class="start"')
-	filmChunks = ['<tr class="start"' + p for p in pieces[1:]]
+	if singlePass:
+		filmChunks = GetFilmRows(soup)
+	elif isinstance(soup, SelectolaxSoup):
+		raise ValueError("singlePass=False requires a BeautifulSoup parser backend")
+	else:
+		from bs4 import BeautifulSoup
+		# extract the table with movie listings (should be only one of these):
+		listingsTable = soup.find_all("table", {"class": "linien prog film"})[0]
+		txtVersion = listingsTable.prettify()
+		# strip off the final "</table>":
+		txtVersion = txtVersion.replace("</table>", "")
+		# split it up into chunks starting with '<tr class="start"', then paste that
+		# text back onto the beginning of each chunk (skip first chunk, since it's just
+		# the start of the table)
+		pieces = txtVersion.split('<tr class="start"')
+		filmChunks = ['<tr class="start"' + p for p in pieces[1:]]
 
 	filmDict = OrderedDict()
 	filmTitles = []
 	for filmChunk in filmChunks:
-		newSoup = BeautifulSoup(filmChunk, parserName)
-		startBlob = newSoup.find_all("tr", {"class": "start"})[0]
-		titleText = startBlob.select("strong")[0].getText()
-		pp = titleText.splitlines()
-		filmTitle = GetTitle(titleText)
-		if titleText.find("3D") > -1:
-			filmTitle += " (3D)"
-		if titleText.find("(OF)") > -1:
-			langType = "OF"
-		elif titleText.find("(OmU)") > -1:
-			langType = "OmU"
-		elif titleText.find("(OmeU)") > -1:
-			langType = "OmeU"
+		if singlePass:
+			newSoup = filmChunk
+			startBlob = filmChunk[0]
 		else:
-			langType = "German"
+			# (bare table-row fragments are only handled reliably by html.parser)
+			newSoup = BeautifulSoup(filmChunk, "html.parser")
+			startBlob = newSoup.find_all("tr", {"class": "start"})[0]
+		filmTitle, langType = GetTitleAndLanguage(startBlob)
 		if getGermanFilms or (langType in ["OF", "OmU", "OmeU"]):
 			titleText = filmTitle + " [" + langType + "]"
 			filmTitles.append(titleText)
@@ -251,11 +962,305 @@ def GetFilmSoupDict( soup, getGermanFilms=False  ):
 	return filmDict, filmTitles
 
 
-# [ ] POSSIBLE NEW APPROACH:
+class NameRegistry(object):
+	"""Interning table for names (e.g., theaters): each distinct name is stored
+	once and gets a small integer ID, so the same name isn't allocated over and
+	over and names can be grouped by ID. Records keep the interned name itself,
+	so the registry can be bounded: once it holds maxSize names, it starts
+	over (which only costs some sharing, but invalidates earlier IDs), and a
+	long-running process doesn't keep every name it has ever seen. Safe to use
+	from several threads.
+	"""
+	__slots__ = ("names", "ids", "maxSize", "lock")
+
+	def __init__( self, maxSize=None ):
+		self.names = []
+		self.ids = {}
+		self.maxSize = maxSize
+		self.lock = threading.Lock()
+
+	def _GetID( self, name ):
+		# (call with self.lock held)
+		i = self.ids.get(name)
+		if i is None:
+			if self.maxSize is not None and len(self.names) >= self.maxSize:
+				self.names = []
+				self.ids = {}
+			i = self.ids[name] = len(self.names)
+			self.names.append(name)
+		return i
+
+	def GetID( self, name ):
+		"""Returns the ID for name, adding it to the registry if necessary.
+		"""
+		with self.lock:
+			return self._GetID(name)
+
+	def Intern( self, name ):
+		"""Returns the registry's copy of name (adding it if necessary).
+		"""
+		with self.lock:
+			i = self._GetID(name)   # (may replace self.names)
+			return self.names[i]
+
+	def GetName( self, i ):
+		return self.names[i]
+
+	def __len__( self ):
+		return len(self.names)
+
+# interned theater names and film titles, shared by all Film and Screening
+# records (which keep the names, not IDs, since the registries are bounded)
+NAME_REGISTRY_SIZE = 10000
+theaterRegistry = NameRegistry(NAME_REGISTRY_SIZE)
+titleRegistry = NameRegistry(NAME_REGISTRY_SIZE)
+
+
+class Screening(object):
+	"""A film's showtime at one theater: theater name (interned, see
+	theaterRegistry), weekday mask (bit d is set if the film is shown at that
+	time on day d, where 0 = Sunday, ..., 6 = Saturday), and showtime in
+	minutes after midnight.
+	"""
+	__slots__ = ("theater", "dayMask", "minutes")
+
+	def __init__( self, theater, dayMask, minutes ):
+		self.theater = theaterRegistry.Intern(theater)
+		self.dayMask = dayMask
+		self.minutes = minutes
+
+	def __eq__( self, other ):
+		if not isinstance(other, Screening):
+			return NotImplemented
+		return (self.theater, self.dayMask, self.minutes) == \
+				(other.theater, other.dayMask, other.minutes)
+
+	def __hash__( self ):
+		return hash((self.theater, self.dayMask, self.minutes))
+
+	def __repr__( self ):
+		return "Screening(%r, %#04x, %d)" % (self.theater, self.dayMask, self.minutes)
+
+	def __reduce__( self ):
+		# (so that unpickled names are interned, too)
+		return (Screening, (self.theater, self.dayMask, self.minutes))
+
+	def IsOnDay( self, day ):
+		return self.dayMask & (1 << GetDayIndex(day)) != 0
+
+
+class Film(object):
+	"""Plain-data record for one film: plain title, language type ("OF", "OmU",
+	"OmeU", or "German"), 3D flag, list of (theater, showtimes) tuples (with
+	showtimes translated to English, as used in the text output), and list of
+	Screening objects.
+	"""
+	__slots__ = ("title", "langType", "is3D", "theaterTimes", "screenings")
+
+	def __init__( self, title, langType, is3D, theaterTimes, screenings ):
+		self.title = titleRegistry.Intern(title)
+		self.langType = langType
+		self.is3D = is3D
+		self.theaterTimes = theaterTimes
+		self.screenings = screenings
+
+	def __reduce__( self ):
+		return (Film, (self.title, self.langType, self.is3D, self.theaterTimes, self.screenings))
+
+	def __repr__( self ):
+		return "Film(%r, %r, %r, ...)" % (self.title, self.langType, self.is3D)
+
+	def GetDisplayTitle( self ):
+		"""Returns the title as used by GetFilmSoupDict, e.g. "Title (3D) [OF]".
+		"""
+		if self.is3D:
+			return "%s (3D) [%s]" % (self.title, self.langType)
+		return "%s [%s]" % (self.title, self.langType)
+
+	def GetTimesList( self ):
+		"""Returns the list of theater+showtimes strings (TheaterTimes objects),
+		as used by MakeFilmTextDict.
+		"""
+		return [TheaterTimes(theater, times) for (theater, times) in self.theaterTimes]
+
+
+class TheaterTimes(str):
+	"""One "theater: showtimes" string of a film's times list (see
+	MakeFilmTextDict) which also keeps the theater and showtimes, so they
+	never have to be split apart again (theater names and showtime notes can
+	both contain ": "; see SplitTheaterTimes). Otherwise, it's a plain string.
+	"""
+	__slots__ = ("theater", "times")
+
+	def __new__( cls, theater, times ):
+		self = str.__new__(cls, "%s: %s" % (theater, times))
+		self.theater = theater
+		self.times = times
+		return self
+
+	def __reduce__( self ):
+		return (TheaterTimes, (self.theater, self.times))
+
+def TimesListToPairs( timesList ):
+	"""Returns a list of [theater, showtimes] lists for a film's times list,
+	for saving as JSON (see TimesListFromPairs).
+	"""
+	pairs = []
+	for line in timesList:
+		theater, times = SplitTheaterTimes(line)
+		pairs.append([theater, times.strip()])
+	return pairs
+
+def TimesListFromPairs( pairs ):
+	"""Returns a film's times list from the output of TimesListToPairs (plain
+	"theater: showtimes" strings, as saved by older versions, are kept as is).
+	"""
+	return [line if isinstance(line, str) else TheaterTimes(*line) for line in pairs]
+
+
+def MakeScreenings( theaterTimes ):
+	"""Given a list of (theater, showtimes) tuples, returns a list of Screening
+	objects (sorted by theater, in order of appearance, then by time).
+	"""
+	screenings = []
+	for theaterName, showtimes in theaterTimes:
+		dayMasks = {}
+		for d, times in enumerate(ParseShowtimes(showtimes)):
+			for t in times:
+				dayMasks[t] = dayMasks.get(t, 0) | (1 << d)
+		for t in sorted(dayMasks):
+			screenings.append(Screening(theaterName, dayMasks[t], t))
+	return screenings
+
+def MakeFilm( titleText, theatersAndTimes ):
+	"""Given a film's title text (see GetTitleAndLanguageFromText) and its list
+	of (theater, German showtimes) tuples (see GetTheatersAndTimes), returns
+	a Film object.
+	"""
+	filmTitle, langType, is3D = GetFilmInfoFromText(titleText)
+	theaterTimes = [(theaterRegistry.Intern(theaterTime[0]), TranslateTimesSimple(theaterTime))
+					for theaterTime in theatersAndTimes]
+	return Film(filmTitle, langType, is3D, theaterTimes, MakeScreenings(theaterTimes))
+
+
+def GetFilms( soup, getGermanFilms=False ):
+	"""
+	Given a BeautifulSoup object corresponding to the artechock.de web page,
+	returns a list of Film objects, one for each film (by default, only the
+	films labeled as "(OF)", "(OmU)", or "(OmeU)"). Unlike GetFilmSoupDict,
+	nothing refers back to the parsed web page, so it can be discarded.
+	"""
+	films = []
+	for filmRows in GetFilmRows(soup):
+		titleText = filmRows[0].select("strong")[0].getText("\n", strip=True)
+		filmTitle, langType, is3D = GetFilmInfoFromText(titleText)
+		if getGermanFilms or (langType in ["OF", "OmU", "OmeU"]):
+			films.append(MakeFilm(titleText, GetTheatersAndTimes(filmRows)))
+	CountEvent("films", len(films))
+	return films
+
+
+def FilmsToTextDict( films ):
+	"""Compatibility adapter: given a list of Film objects, returns (filmTitles,
+	filmTextDict), as produced by GetFilmSoupDict and MakeFilmTextDict.
+	"""
+	filmTitles = []
+	filmTextDict = {}
+	for film in films:
+		title = film.GetDisplayTitle()
+		filmTitles.append(title)
+		filmTextDict[title] = film.GetTimesList()
+	return filmTitles, filmTextDict
+
+findDisplayTitle = re.compile(r"^(?P<title>.*?)(?P<is3D> \(3D\))? \[(?P<langType>\w+)\]$")
+
+def FilmsFromTextDict( filmTitles, filmTextDict, knownTheaters=() ):
+	"""Compatibility adapter: given (filmTitles, filmTextDict), as produced by
+	GetFilmSoupDict and MakeFilmTextDict, returns a list of Film objects.
+	knownTheaters is only used for plain-string entries (see SplitTheaterTimes).
+	"""
+	films = []
+	for title in filmTitles:
+		m = findDisplayTitle.match(title)
+		theaterTimes = [SplitTheaterTimes(line, knownTheaters) for line in filmTextDict[title]]
+		theaterTimes = [(theater, times.strip()) for (theater, times) in theaterTimes]
+		films.append(Film(m.group("title"), m.group("langType"), m.group("is3D") is not None,
+							theaterTimes, MakeScreenings(theaterTimes)))
+	return films
+
+
+# VARIANT GROUPING
+# The web page lists each version of a film (2D/3D, original/subtitled) as a
+# separate film; these are folded into one FilmGroup per film, keyed by a
+# canonical form of the title.
+
+findAlternateTitle = re.compile(r"\s*\([^()]*\)$")
+findDashes = re.compile("[\u2010-\u2015]")
+
+def GetCanonicalTitle( title ):
+	"""Returns the key used to decide whether two films are versions of the same
+	film: the title without the (German) alternate title in parentheses, with
+	Unicode, case, dashes, and whitespace normalized.
+	"""
+	title = unicodedata.normalize("NFKC", title).replace("\xad", "")
+	plainTitle = findAlternateTitle.sub("", title)
+	if len(plainTitle) > 0:
+		title = plainTitle
+	return " ".join(findDashes.sub("-", title).casefold().split())
+
+def GetVariantLabel( film ):
+	"""Returns the label for one version of a film, e.g. "(3D) [OF]".
+	"""
+	if film.is3D:
+		return "(3D) [%s]" % film.langType
+	return "[%s]" % film.langType
+
+
+class FilmGroup(object):
+	"""All versions of one film: title (from the first version listed) and list
+	of Film objects (variants), in the order they appear in the web page.
+	"""
+	__slots__ = ("title", "variants")
+
+	def __init__( self, title, variants ):
+		self.title = title
+		self.variants = variants
+
+	def GetTimesList( self ):
+		"""Returns a list of "theater (3D) [OF]: showtimes" strings, covering all
+		the variants.
+		"""
+		return [TheaterTimes("%s %s" % (theater, GetVariantLabel(film)), times)
+				for film in self.variants for (theater, times) in film.theaterTimes]
+
+	def __repr__( self ):
+		return "FilmGroup(%r, [%s])" % (self.title,
+									", ".join(GetVariantLabel(film) for film in self.variants))
+
+
+def GroupFilmVariants( films ):
+	"""Given a list of Film objects, returns a list of FilmGroup objects (in
+	order of each film's first appearance), with all versions of the same film
+	(see GetCanonicalTitle) in one group.
+	"""
+	groups = []
+	groupIndex = {}   # canonical title --> FilmGroup
+	for film in films:
+		key = GetCanonicalTitle(film.title)
+		group = groupIndex.get(key)
+		if group is None:
+			group = groupIndex[key] = FilmGroup(film.title, [])
+			groups.append(group)
+		group.variants.append(film)
+	return groups
+
+
+# [X] POSSIBLE NEW APPROACH:
 # Filter filmTextDict once for each day --> 7 reduced filmTextDict instances, each
 # one containing only those theater+showtimes which apply to the day in question.
 # Then, for output, select the reduced dict for the requested day; only print the
 # entries with non-null showtimes.
+# [Now implemented as MakeDayIndex + GetListingsForDay]
 
 def RemoveDaysFromShowtime( showtimeString ):
 	"""
@@ -287,9 +1292,208 @@ daily except W 16:10, 22:15; Sun also 11:00
 daily except W 19:10; Sat/Sun also 15:30; Tu also 13:00
 """
 
-findParenthesizedText = re.compile("\((?P<text>\D+\s+\S+)\)")
+# SHOWTIME GRAMMAR
+# Showtime strings (German, or translated by TranslateTimesSimple) are tokenized
+# with a single compiled regex and parsed once into a "schedule": a tuple of 7
+# tuples of showtimes (in minutes after midnight, sorted), one per weekday,
+# starting with Sunday. Per-day questions are then just lookups.
+#
+# Grammar (blocks are separated by ";"):
+#    block = ["tgl."] ["außer" days] [days] ["auch"] time ["(" paren ")"] {"," time ["(" paren ")"]}
+#    days = day {("/" | "-") day}
+#    paren = "außer" days  --> preceding time is not shown on those days
+#          | days ["auch"] time {"," time}  --> alternate (or additional) times on those days
+#          | anything else  --> annotation, ignored
+# Blocks without "tgl." or any days apply to every day.
+
+DAY_NAMES = ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]
+DAY_INDEX = {"So.": 0, "Mo.": 1, "Di.": 2, "Mi.": 3, "Do.": 4, "Fr.": 5, "Sa.": 6,
+				"Sun": 0, "M": 1, "Tu": 2, "W": 3, "Th": 4, "F": 5, "Sat": 6,
+				"SU": 0, "MO": 1, "TU": 2, "WE": 3, "TH": 4, "FR": 5, "SA": 6}
+ALL_DAYS = frozenset(range(7))
+
+showtimeTokens = re.compile(r"""
+	(?P<time>\d{1,2}:\d{2})
+	|(?P<daily>tgl\.|(?<!\w)daily(?!\w))
+	|(?P<except>(?<!\w)(?:außer|except)(?!\w))
+	|(?P<also>(?<!\w)(?:auch|also)(?!\w))
+	|(?P<day>(?<!\w)(?:So|Mo|Di|Mi|Do|Fr|Sa)\.|(?<![\w.])(?:Sun|Sat|Tu|Th|M|W|F|SU|MO|TU|WE|TH|FR|SA)(?!\w))
+	|(?P<punct>[();,/\-–])
+	|(?P<word>[^\s();,/\-–]+)
+	""", re.VERBOSE)
+
+
+def ShowtimeToMinutes( showtime ):
+	"""Converts a showtime string ("20:30") to minutes after midnight (1230).
+	"""
+	hours, minutes = showtime.split(":")
+	return 60*int(hours) + int(minutes)
+
+def MinutesToShowtime( minutes ):
+	"""Converts minutes after midnight (1230) to a showtime string ("20:30").
+	"""
+	return "%d:%02d" % divmod(minutes, 60)
+
+def GetDayIndex( day ):
+	"""Returns the index (0 = Sunday, ..., 6 = Saturday) for a German ("So."),
+	English ("Sun", "M", "Tu", "W", "Th", "F" or "Fr.", "Sat"), or two-letter
+	("SU", "MO", ...) day name.
+	"""
+	return DAY_INDEX[day]
+
+
+def TokenizeShowtimes( showtimeString ):
+	"""Splits a showtime string into a list of (kind, value) tokens, where kind
+	is one of "time", "daily", "except", "also", "day", "punct", or "word".
+	"""
+	return [(m.lastgroup, m.group()) for m in showtimeTokens.finditer(showtimeString)]
+
+def ReadDays( tokens, i ):
+	"""Reads a day specification (e.g., "Sa./So.", "Fr.-So.", "Sat/Tu") from
+	tokens, starting at index i. Returns a tuple of (set of day indices, index
+	of the first token after the day specification).
+	"""
+	days = set()
+	previousDay = None
+	rangeStart = None
+	while i < len(tokens):
+		kind, value = tokens[i]
+		if kind == "day":
+			thisDay = DAY_INDEX[value]
+			if rangeStart is not None:
+				# day range (e.g., "Fr.-So."), wrapping around the end of the week
+				d = rangeStart
+				while d != thisDay:
+					days.add(d)
+					d = (d + 1) % 7
+				rangeStart = None
+			days.add(thisDay)
+			previousDay = thisDay
+			i += 1
+		elif value in ["/", "-", "–"] and previousDay is not None and i + 1 < len(tokens) \
+				and tokens[i + 1][0] == "day":
+			if value != "/":
+				rangeStart = previousDay
+			i += 1
+		else:
+			break
+	return days, i
+
+def SplitShowtimeBlocks( tokens ):
+	"""Splits a list of showtime tokens into blocks (lists of tokens) separated
+	by ";" (ignoring any ";" within parentheses).
+	"""
+	blocks = [[]]
+	depth = 0
+	for token in tokens:
+		if token[1] == "(":
+			depth += 1
+		elif token[1] == ")":
+			depth = max(depth - 1, 0)
+		elif token[1] == ";" and depth == 0:
+			blocks.append([])
+			continue
+		blocks[-1].append(token)
+	return [block for block in blocks if len(block) > 0]
+
+def ParseShowtimeBlock( tokens, dayTimes ):
+	"""Parses a single block of showtime tokens (text between ";"), adding the
+	resulting showtimes to dayTimes (a list of 7 sets of minutes).
+	"""
+	isDaily = False
+	exceptDays = set()
+	blockDays = set()
+	times = []   # list of [minutes, set of days when this time is *not* shown]
+	alternates = []   # list of (days, list of minutes, additional?)
+	i = 0
+	while i < len(tokens):
+		kind, value = tokens[i]
+		if kind == "daily":
+			isDaily = True
+			i += 1
+		elif kind == "except":
+			days, i = ReadDays(tokens, i + 1)
+			exceptDays |= days
+		elif kind == "day":
+			days, i = ReadDays(tokens, i)
+			blockDays |= days
+		elif kind == "time":
+			times.append([ShowtimeToMinutes(value), set()])
+			i += 1
+		elif value == "(":
+			# find the matching ")" (an unclosed "(" just runs to the end)
+			depth = 0
+			j = i
+			while j < len(tokens):
+				if tokens[j][1] == "(":
+					depth += 1
+				elif tokens[j][1] == ")":
+					depth -= 1
+					if depth == 0:
+						break
+				j += 1
+			parenTokens = tokens[i + 1:j]
+			i = j + 1
+			parenKinds = [t[0] for t in parenTokens]
+			parenTimes = [ShowtimeToMinutes(t[1]) for t in parenTokens if t[0] == "time"]
+			if len(parenKinds) > 0 and parenKinds[0] == "except":
+				days, k = ReadDays(parenTokens, 1)
+				if len(times) > 0:
+					times[-1][1] |= days
+				else:
+					exceptDays |= days
+			elif len(parenKinds) > 0 and parenKinds[0] == "day" and len(parenTimes) > 0:
+				days, k = ReadDays(parenTokens, 0)
+				alternates.append((days, parenTimes, "also" in parenKinds))
+			# anything else in parentheses is just an annotation
+		else:
+			i += 1
+
+	if len(blockDays) > 0 and not isDaily:
+		days = blockDays - exceptDays
+	else:
+		days = ALL_DAYS - exceptDays
+	for d in days:
+		validTimes = [t for (t, notShown) in times if d not in notShown]
+		for altDays, altTimes, additional in alternates:
+			if d in altDays:
+				validTimes = validTimes + altTimes if additional else altTimes
+		dayTimes[d].update(validTimes)
+	for altDays, altTimes, additional in alternates:
+		for d in altDays - days:
+			dayTimes[d].update(altTimes)
+
+
+@functools.lru_cache(maxsize=4096)
+@ProfiledStage("schedule")
+def ParseShowtimes( showtimeString ):
+	"""Parses a German or English showtime string, returning a schedule: a tuple
+	of 7 tuples of showtimes in minutes (sorted), starting with Sunday. E.g.,
+		ParseShowtimes("tgl. außer Mi. 17:20; So. auch 12:10; Mi. 17:00")
+			--> ((730, 1040), (1040,), (1040,), (1020,), (1040,), (1040,), (1040,))
+	
+	Results are cached, so repeated calls with the same string are just lookups.
+	"""
+	dayTimes = [set() for d in range(7)]
+	blocks = SplitShowtimeBlocks(TokenizeShowtimes(showtimeString))
+	CountEvent("showtimeCacheMisses")
+	for block in blocks:
+		ParseShowtimeBlock(block, dayTimes)
+	return tuple(tuple(sorted(times)) for times in dayTimes)
+
+
+def GetShowtimesForDay( showtimeString, day ):
+	"""Given a German or English showtime string and a day name (e.g., "Sun"),
+	returns the showtimes for that day as a string (e.g., "15:30, 19:10"),
+	or None if there are no showtimes on that day.
+	"""
+	times = ParseShowtimes(showtimeString)[GetDayIndex(day)]
+	if len(times) == 0:
+		return None
+	return ", ".join(MinutesToShowtime(t) for t in times)
+
+
 findParenthesizedExceptDay = re.compile("\(except\s+(?P<days>\S+)\)")
-findAlsoText = re.compile("(?P<days>\D+) also (?P<time>\S+)")
 
 def IsValidDay( showTime, day ):
 	"""Given a showTime string possibly containing "(except <days>)", returns
@@ -307,94 +1511,56 @@ def IsValidDay( showTime, day ):
 			return True
 
 	
-# [ ] Currently being tested
 def ExtractDailyTimes( showtimeBlock, day ):
 	"""Code designed to process the different forms of "daily xxx" showtimes.
 	Given an input "daily xxx" segment of text and a specified day, this
-	function returns the corresponding string of showtimes for that day.
+	function returns the corresponding string of showtimes for that day
+	(or None if there are no showtimes on that day).
 		Examples:
 			ExtractDailyTimes("daily 16:40, 19:50, 22:50", "<anyday>") --> "16:40, 19:50, 22:50"
 			ExtractDailyTimes("daily 19:00 (Sun 19:30)", "Sun") --> "19:30"
 	"""
-	s = showtimeBlock.lstrip("daily ")
-	# TODO: look for "also" text, save if matches day
-	if s.find("except") < 0:
-		# no "except" text, so things are simpler
-		m = findParenthesizedText.search(s)
-		if m is None:
-			validTimeString = s.split("(")[0].strip()
-		else:
-			# possible alternate time for this day?
-			altTimeText = m.group("text")
-			if altTimeText.find(day) > -1:
-				pp = altTimeText.split()
-				validTimeString = altTimeText.lstrip(pp[0]).strip()
-			else:
-				validTimeString = s.split("(")[0].strip()
-	else:
-		# process "except"
-		pp = s.split()
-		m = findParenthesizedExceptDay.search(s)
-		if m is None:
-			# assume that pattern is "daily except ..."
-			invalidDays = pp[1]
-			if invalidDays.find(day) > -1:
-				validTimeString = None
-			else:
-				validTimeString = s.lstrip(pp[0] + " " + pp[1])
-		else:
-			# OK we have a list of times with "(except <days>)", so at least *some* of the
-			# times are valid for this day
-			validTimes = [ time.split("(")[0].strip() for time in s.split(",") if IsValidDay(time, day) ]
-			if len(validTimes) == 1:
-				validTimeString = validTimes[0]
-			else:
-				validTimeString = ", ".join(validTimes)
-
-	return validTimeString
+	return GetShowtimesForDay(showtimeBlock, day)
 			
 		
 
+def SplitTheaterTimes( theaterTimesString, knownTheaters=() ):
+	"""Splits a "theater: times" string (as produced by MakeFilmTextDict) into
+	a tuple of (theater, times). TheaterTimes objects already know where the
+	theater name ends. Since both theater names and showtime notes can contain
+	": ", plain strings are split after a theater name in knownTheaters (a
+	set or dict), if there is one; otherwise at the first ": " (or ":").
+	"""
+	if isinstance(theaterTimesString, TheaterTimes):
+		return theaterTimesString.theater, " " + theaterTimesString.times
+	i = theaterTimesString.find(": ")
+	if i < 0:
+		i = theaterTimesString.find(":")
+		if i < 0:
+			return theaterTimesString, ""
+	elif len(knownTheaters) > 0:
+		j = i
+		while j >= 0 and theaterTimesString[:j] not in knownTheaters:
+			j = theaterTimesString.find(": ", j + 2)
+		if j >= 0:
+			i = j
+	return theaterTimesString[:i], theaterTimesString[i + 1:]
+
+
 def GetTimesForOneDay( timesList, day ):
 	"""
-	IN PROGRESS!  [currently can't handle really complicated film times]
 	Returns a list of "theater: times" strings for the film specified by the input
 	list of theaters and showtimes, *if* the times include the specified day.
 	
 	Sample input: ['Mathäser: Sun 11:00 (mit Pause)', 'Cinemaxx: Th 19:30; Sun 16:00']
 	Sample output (for case of day = "Sun"): ["Mathäser: 11:00", "Cinemaxx: 16:00"]
 	"""
-	nTheaters = len(timesList)
 	timesForThisDay = []
-	for i in range(nTheaters):
-		theaterTimesString = timesList[i]
-		theaterName = theaterTimesString.split(":")[0]
-		# extract just the actual showtimes (chop off the theater name)
-		timesString = theaterTimesString.split(theaterName + ":")[1]
-		times = timesString.split(";")
-		for showtimeBlock in times:
-			# iterate over "blocks" (text separated by ";")
-			if showtimeBlock.find("daily") > -1:
-				validTimesForThisDay = ExtractDailyTimes(showtimeBlock, day)
-				if validTimesForThisDay is not None:
-					timesForThisDay.append(theaterName + ": " + validTimesForThisDay)
-			else:
-				showtimeBlockTrimmed = showtimeBlock.split("(")[0]
-				if showtimeBlockTrimmed.find(day) > -1:
-					validTimesForThisDay = RemoveDaysFromShowtime(showtimeBlockTrimmed)
-					timesForThisDay.append(theaterName + ": " + validTimesForThisDay)
-		
-# 		timesString = timesString.split("(")[0]
-# 		if timesString.find("daily") > 0:
-# 			timesString = timesString.lstrip("daily ")
-# 			timesForThisDay.append(theaterName + ": " + timesString.strip())
-# 		else:
-# 			times = timesString.split(";")
-# 			for showtimeOneDay in times:
-# 				if showtimeOneDay.find(day) > -1:
-# 					showtimeOneDay = RemoveDaysFromShowtime(showtimeOneDay)
-# 					timesForThisDay.append(theaterName + ": " + showtimeOneDay)
-			
+	for theaterTimesString in timesList:
+		theaterName, timesString = SplitTheaterTimes(theaterTimesString)
+		validTimesForThisDay = GetShowtimesForDay(timesString, day)
+		if validTimesForThisDay is not None:
+			timesForThisDay.append(TheaterTimes(theaterName, validTimesForThisDay))
 	return timesForThisDay
 	
 				
@@ -416,14 +1582,1239 @@ def MakeFilmTextDict( filmSoupDict, titles ):
 		timesList = []
 		for i in range(len(theaterTimeList)):
 			theaterTime = theaterTimeList[i]
-			line = "%s: %s" % (theaterTime[0], TranslateTimesSimple(theaterTime))
-			timesList.append(line)
+			timesList.append(TheaterTimes(theaterTime[0], TranslateTimesSimple(theaterTime)))
 		newDict[title] = timesList
+	CountEvent("films", len(titles))
 	return newDict
 	
 	
+def MakeDayIndex( filmTextDict, titles ):
+	"""
+	Given a dict mapping film titles to lists of theater+showtimes strings (i.e.,
+	output of MakeFilmTextDict) and a list of the film titles, this function
+	parses each theater's showtimes once and returns a 7-element list (one
+	entry per day, starting with Sunday) of OrderedDicts mapping film titles
+	to lists of (theater, showtimes) tuples for that day, where showtimes is
+	a tuple of times in minutes. Films and theaters with no showtimes on a
+	given day are left out. E.g.,
+	
+		dayIndex[0]['Bahubali: The Beginning [OmU]'] = [('Mathäser', (660,)),
+													('Cinemaxx', (960,))]
+	"""
+	dayIndex = [OrderedDict() for d in range(7)]
+	for title in titles:
+		for theaterTimesString in filmTextDict[title]:
+			theaterName, timesString = SplitTheaterTimes(theaterTimesString)
+			schedule = ParseShowtimes(timesString)
+			for d in range(7):
+				if len(schedule[d]) > 0:
+					dayIndex[d].setdefault(title, []).append((theaterName, schedule[d]))
+	return dayIndex
+
+
+def MakeDayIndexFromFilms( films ):
+	"""Same as MakeDayIndex, but built directly from a list of Film objects
+	(using their Screening records, so no showtime strings are split or
+	parsed).
+	"""
+	dayIndex = [OrderedDict() for d in range(7)]
+	for film in films:
+		title = film.GetDisplayTitle()
+		dayTimes = GetDayTimes(film)
+		for d in range(7):
+			if len(dayTimes[d]) > 0:
+				dayIndex[d][title] = [(theater, tuple(times))
+										for theater, times in dayTimes[d].items()]
+	return dayIndex
+
+def MakeDayIndexFromGroups( groups ):
+	"""Same as MakeDayIndexFromFilms, but for a list of FilmGroup objects (see
+	GroupFilmVariants): the index has one entry per film (group title), and
+	the tuples are (theater, showtimes, variant label), e.g.
+	
+		dayIndex[0]['The Jungle Book'] = [('Museum Lichtspiele', (965, 1235), '[OF]'),
+										('Cinema', (780,), '(3D) [OF]')]
+	"""
+	dayIndex = [OrderedDict() for d in range(7)]
+	for group in groups:
+		for film in group.variants:
+			label = GetVariantLabel(film)
+			dayTimes = GetDayTimes(film)
+			for d in range(7):
+				if len(dayTimes[d]) > 0:
+					dayIndex[d].setdefault(group.title, []).extend(
+							(theater, tuple(times), label)
+							for theater, times in dayTimes[d].items())
+	return dayIndex
+
+def GetDayTimes( film ):
+	"""Returns a 7-element list (one per day, starting with Sunday) of
+	OrderedDicts mapping theater names to lists of showtimes (in minutes) for
+	a Film object.
+	"""
+	dayTimes = [OrderedDict() for d in range(7)]
+	for screening in film.screenings:
+		mask = screening.dayMask
+		for d in range(7):
+			if mask & (1 << d):
+				dayTimes[d].setdefault(screening.theater, []).append(screening.minutes)
+	return dayTimes
+
+
+def GetListingsForDay( dayIndex, day, theater=None, after=None, before=None ):
+	"""
+	Given a day index (output of MakeDayIndex or MakeDayIndexFromGroups) and a
+	day name (e.g., "Sun"), returns an OrderedDict mapping film titles to
+	lists of (theater, showtimes[, variant label]) tuples for that day.
+	
+	The results can optionally be restricted to a single theater and/or to a
+	range of showtimes: after="20:00" keeps showtimes starting at 20:00 or
+	later, before="20:00" keeps showtimes starting before 20:00.
+	"""
+	listings = dayIndex[GetDayIndex(day)]
+	if theater is None and after is None and before is None:
+		return listings
+	minTime = 0 if after is None else ShowtimeToMinutes(after)
+	maxTime = 48*60 if before is None else ShowtimeToMinutes(before)
+	newListings = OrderedDict()
+	for title, theaterTimes in listings.items():
+		for entry in theaterTimes:
+			theaterName, times = entry[:2]
+			if theater is not None and theaterName != theater:
+				continue
+			validTimes = tuple(t for t in times if minTime <= t < maxTime)
+			if len(validTimes) > 0:
+				newListings.setdefault(title, []).append((theaterName, validTimes) + entry[2:])
+	return newListings
+
+
+def WriteDayListing( listings, outputFname ):
+	"""Saves the listings for one day (e.g., output of GetListingsForDay) in a
+	text file.
+	"""
+	with open(outputFname, 'w') as outf:
+		for title, theaterTimes in listings.items():
+			outf.write(title + ":\n")
+			for entry in theaterTimes:
+				timesString = ", ".join(MinutesToShowtime(t) for t in entry[1])
+				# (entry[2] = variant label, for merged versions of a film)
+				outf.write("\t%s: %s\n" % (" ".join((entry[0],) + entry[2:]), timesString))
+			outf.write("\n")
+
+
+def GetDayListingFilename( outputFname, day ):
+	"""Returns the filename for a single day's listing, by inserting the day name
+	before the extension of outputFname ("currentfilms.txt" --> "currentfilms_Sun.txt").
+	"""
+	base, dot, extension = outputFname.rpartition(".")
+	if dot == "":
+		return "{0}_{1}".format(outputFname, day)
+	return "{0}_{1}.{2}".format(base, day, extension)
+
+
+# VECTORIZED QUERIES
+# The schedule as parallel NumPy arrays, one entry per Screening (film, theater,
+# weekday mask, showtime), so that filtering and counting are array operations
+# instead of loops over showtime strings. Requires NumPy.
+
+class ScreeningArrays(object):
+	"""Parallel arrays describing all screenings in a schedule (one entry per
+	film + theater + showtime): filmIndex and theaterIndex (indexes into the
+	films and theaters lists), langIndex (index into langTypes), dayMask (bit
+	d set if shown on day d, 0 = Sunday), and minutes (showtime in minutes
+	after midnight). Use Query and CountScreenings to select screenings.
+	"""
+	__slots__ = ("films", "displayTitles", "theaters", "langTypes", "filmIndex", "theaterIndex",
+				"langIndex", "dayMask", "minutes")
+
+	def __init__( self, films ):
+		import numpy as np
+		self.films = films
+		self.displayTitles = [film.GetDisplayTitle() for film in films]
+		theaterIDs = NameRegistry()
+		langIDs = OrderedDict()
+		filmIndex = []
+		theaterIndex = []
+		dayMask = []
+		minutes = []
+		for i, film in enumerate(films):
+			for screening in film.screenings:
+				filmIndex.append(i)
+				theaterIndex.append(theaterIDs.GetID(screening.theater))
+				dayMask.append(screening.dayMask)
+				minutes.append(screening.minutes)
+		self.theaters = theaterIDs.names
+		filmLang = [langIDs.setdefault(film.langType, len(langIDs)) for film in films]
+		self.langTypes = list(langIDs)
+		self.filmIndex = np.array(filmIndex, dtype=np.int32)
+		self.theaterIndex = np.array(theaterIndex, dtype=np.int32)
+		self.langIndex = np.array(filmLang, dtype=np.int16)[self.filmIndex] if len(films) > 0 \
+							else np.zeros(0, dtype=np.int16)
+		self.dayMask = np.array(dayMask, dtype=np.uint8)
+		self.minutes = np.array(minutes, dtype=np.int16)
+
+	def GetDayBits( self, day ):
+		"""Returns the weekday bitmask for a day name or a list of day names
+		(None = all days).
+		"""
+		if day is None:
+			return 0x7f
+		if isinstance(day, str):
+			day = [day]
+		return functools.reduce(lambda bits, d: bits | (1 << GetDayIndex(d)), day, 0)
+
+	def Select( self, day=None, after=None, before=None, lang=None, theater=None ):
+		"""Returns a boolean array selecting the screenings which match all of the
+		specified conditions: day = day name or list of day names (any of them),
+		after = earliest showtime ("19:00"), before = showtimes must be earlier
+		than this, lang = language type or list of language types ("OF", etc.),
+		theater = theater name or list of theater names.
+		"""
+		import numpy as np
+		mask = (self.dayMask & self.GetDayBits(day)) != 0
+		if after is not None:
+			mask &= self.minutes >= ShowtimeToMinutes(after)
+		if before is not None:
+			mask &= self.minutes < ShowtimeToMinutes(before)
+		if lang is not None:
+			if isinstance(lang, str):
+				lang = [lang]
+			codes = [self.langTypes.index(l) for l in lang if l in self.langTypes]
+			mask &= np.isin(self.langIndex, codes)
+		if theater is not None:
+			if isinstance(theater, str):
+				theater = [theater]
+			codes = [self.theaters.index(t) for t in theater if t in self.theaters]
+			mask &= np.isin(self.theaterIndex, codes)
+		return mask
+
+	def Query( self, day=None, after=None, before=None, lang=None, theater=None ):
+		"""Returns a list of (film title, theater, day name, showtime) tuples for
+		the screenings matching the conditions (see Select), sorted by day (of
+		those requested, starting with Sunday), then by showtime. Film titles are
+		as in the text output (e.g., "Zootopia (Zoomania) [OF]").
+		"""
+		import numpy as np
+		mask = self.Select(day, after, before, lang, theater)
+		dayBits = self.GetDayBits(day)
+		titles = self.displayTitles
+		theaters = self.theaters
+		showtimes = {}
+		results = []
+		for d in range(7):
+			if not dayBits & (1 << d):
+				continue
+			rows = np.flatnonzero(mask & ((self.dayMask & (1 << d)) != 0))
+			rows = rows[np.argsort(self.minutes[rows], kind="stable")]
+			dayName = DAY_NAMES[d]
+			for f, t, m in zip(self.filmIndex[rows].tolist(), self.theaterIndex[rows].tolist(),
+								self.minutes[rows].tolist()):
+				showtime = showtimes.get(m)
+				if showtime is None:
+					showtime = showtimes[m] = MinutesToShowtime(m)
+				results.append((titles[f], theaters[t], dayName, showtime))
+		return results
+
+	def CountScreenings( self, mask=None ):
+		"""Returns an array of the numbers of screenings per theater and day (rows
+		in the order of the theaters list, columns = days starting with Sunday),
+		optionally only counting those selected by mask (see Select).
+		"""
+		import numpy as np
+		counts = np.zeros((len(self.theaters), 7), dtype=np.int32)
+		for d in range(7):
+			onDay = (self.dayMask & (1 << d)) != 0
+			if mask is not None:
+				onDay &= mask
+			counts[:, d] = np.bincount(self.theaterIndex[onDay], minlength=len(self.theaters))
+		return counts
+
+
+def MakeScreeningArrays( filmTitles, filmTextDict ):
+	"""Returns a ScreeningArrays object for parsed results (see ParseFilmListings).
+	"""
+	return ScreeningArrays(FilmsFromTextDict(filmTitles, filmTextDict))
+
+
+def GetParsedCacheFilename( inputText, getGermanFilms, cacheDir ):
+	"""Returns the filename for the cached parsed results of a web page,
+	based on a hash of the page text, getGermanFilms, PARSER_VERSION, and the
+	showtimes locale.
+	"""
+	h = hashlib.sha1(inputText.encode("utf-8"))
+	h.update("|german={0}|version={1}|locale={2}".format(getGermanFilms, PARSER_VERSION,
+														showtimeLocale).encode("utf-8"))
+	return os.path.join(cacheDir, "parsed", h.hexdigest() + ".json.z")
+
+def ReadParsedResults( cacheFname ):
+	"""Returns a tuple of (filmTitles, filmTextDict, scheduleDates) from a
+	cached-results file, or None if the file doesn't exist or is unusable.
+	(The times lists are stored as [theater, showtimes] pairs; see
+	TimesListToPairs.)
+	"""
+	try:
+		with open(cacheFname, 'rb') as f:
+			results = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+	except (IOError, ValueError, zlib.error):
+		return None
+	if results.get("version") != PARSER_VERSION:
+		return None
+	# mark as recently used, for PruneParsedCache
+	os.utime(cacheFname, None)
+	filmTextDict = {title: TimesListFromPairs(pairs) for (title, pairs) in results["films"].items()}
+	return results["titles"], filmTextDict, results["dates"]
+
+def WriteParsedResults( cacheFname, filmTitles, filmTextDict, scheduleDates,
+						maxCacheSize=DEFAULT_PARSED_CACHE_SIZE ):
+	"""Saves parsed results in a compressed JSON file, then prunes the cache
+	directory down to maxCacheSize bytes.
+	"""
+	cacheDir = os.path.dirname(cacheFname)
+	os.makedirs(cacheDir, exist_ok=True)
+	films = {title: TimesListToPairs(timesList) for (title, timesList) in filmTextDict.items()}
+	results = {"version": PARSER_VERSION, "titles": filmTitles, "films": films,
+				"dates": scheduleDates}
+	data = zlib.compress(json.dumps(results, separators=(",", ":")).encode("utf-8"))
+	tempFname = "{0}.{1}.tmp".format(cacheFname, os.getpid())
+	with open(tempFname, 'wb') as outf:
+		outf.write(data)
+	os.replace(tempFname, cacheFname)
+	PruneParsedCache(cacheDir, maxCacheSize)
+
+def PruneParsedCache( cacheDir, maxCacheSize ):
+	"""Deletes the least recently used cached-results files in cacheDir until
+	their total size is at most maxCacheSize bytes.
+	"""
+	entries = []
+	for fname in os.listdir(cacheDir):
+		if fname.endswith(".json.z"):
+			st = os.stat(os.path.join(cacheDir, fname))
+			entries.append((st.st_mtime, st.st_size, fname))
+	entries.sort()
+	totalSize = sum(e[1] for e in entries)
+	for mtime, size, fname in entries:
+		if totalSize <= maxCacheSize:
+			break
+		os.remove(os.path.join(cacheDir, fname))
+		totalSize -= size
+
+
+@ProfiledStage("split")
+def SplitFilmChunks( inputText ):
+	"""Splits the text of an artechock.de web page into the text before the
+	film-listings table and a list of per-film chunks of HTML (each starting
+	with '<tr class="start"'), without parsing it. Returns (None, None) if
+	the listings table can't be found.
+	"""
+	tableStart = inputText.find('<table class="linien prog film">')
+	if tableStart < 0:
+		return None, None
+	tableEnd = inputText.find('</table>', tableStart)
+	if tableEnd < 0:
+		tableEnd = len(inputText)
+	pieces = inputText[tableStart:tableEnd].split('<tr class="start"')
+	filmChunks = ['<tr class="start"' + p for p in pieces[1:]]
+	return inputText[:tableStart], filmChunks
+
+findHeadings = re.compile(r"<h2[\s>].*?</h2>", re.DOTALL | re.IGNORECASE)
+
+def GetScheduleDatesFromHeader( headerText ):
+	"""Same as GetScheduleDates, but for the text of the part of the web page
+	before the film-listings table (from SplitFilmChunks); only the <h2>
+	headings are parsed.
+	"""
+	return GetScheduleDates(MakeSoup("".join(findHeadings.findall(headerText))))
+
+def ParseFilmChunksWorker( filmChunks, getGermanFilms, parser, locale=DEFAULT_LOCALE ):
+	"""Parses a list of per-film chunks of HTML (from SplitFilmChunks) and
+	returns (filmTitles, filmTextDict) -- plain data, so it can be cheaply
+	sent back from a worker process.
+	"""
+	InitWorker(parser, locale)
+	soup = MakeSoup('<table class="linien prog film">' + "".join(filmChunks) + '</table>')
+	return FilmsToTextDict(GetFilms(soup, getGermanFilms))
+
+def ParseFilmListingsParallel( inputText, getGermanFilms=False, jobs=2 ):
+	"""Same as ParseFilmListings (without caching), except that the films are
+	split into batches which are parsed by a pool of jobs worker processes.
+	The results are identical to (and in the same order as) the serial version.
+	"""
+	headerText, filmChunks = SplitFilmChunks(inputText)
+	if filmChunks is None:
+		return ParseFilmListings(inputText, getGermanFilms)
+	# several batches per worker, to even out the load
+	nBatches = min(len(filmChunks), 4*jobs)
+	batchSize = -(-len(filmChunks) // max(nBatches, 1))
+	batches = [filmChunks[i:i + batchSize] for i in range(0, len(filmChunks), batchSize)]
+
+	import concurrent.futures
+	filmTitles = []
+	filmTextDict = {}
+	with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+		futures = [pool.submit(ParseFilmChunksWorker, batch, getGermanFilms, parserName,
+								showtimeLocale)
+					for batch in batches]
+		for future in futures:
+			titles, textDict = future.result()
+			filmTitles.extend(titles)
+			filmTextDict.update(textDict)
+	scheduleDates = GetScheduleDatesFromHeader(headerText)
+	return filmTitles, filmTextDict, scheduleDates
+
+
+def ParseFilms( inputText, getGermanFilms=False ):
+	"""Given the text of an artechock.de web page, returns a tuple of (list of
+	Film objects, scheduleDates), without building the text-dict form of the
+	listings (see ParseFilmListings).
+	"""
+	soup = MakeSoup(inputText)
+	return GetFilms(soup, getGermanFilms), GetScheduleDates(soup)
+
+
+def ParseFilmListings( inputText, getGermanFilms=False, cacheDir=None,
+						maxCacheSize=DEFAULT_PARSED_CACHE_SIZE, jobs=1 ):
+	"""
+	Given the text of an artechock.de web page, returns a tuple of (filmTitles,
+	filmTextDict, scheduleDates), where filmTitles and filmTextDict are as
+	produced by GetFilmSoupDict and MakeFilmTextDict and scheduleDates is the
+	output of GetScheduleDates.
+	
+	If cacheDir is specified, the results are cached (keyed by a hash of the
+	page text), so that an unchanged page doesn't have to be parsed again.
+	If jobs > 1, the parsing is done by that many worker processes (see
+	ParseFilmListingsParallel).
+	"""
+	CountEvent("pages")
+	if cacheDir is not None:
+		cacheFname = GetParsedCacheFilename(inputText, getGermanFilms, cacheDir)
+		results = ReadParsedResults(cacheFname)
+		if results is not None:
+			CountEvent("parsedCacheHits")
+			return results
+
+	if jobs > 1:
+		filmTitles, filmTextDict, scheduleDates = ParseFilmListingsParallel(inputText,
+															getGermanFilms, jobs)
+	else:
+		films, scheduleDates = ParseFilms(inputText, getGermanFilms)
+		filmTitles, filmTextDict = FilmsToTextDict(films)
+
+	if cacheDir is not None:
+		WriteParsedResults(cacheFname, filmTitles, filmTextDict, scheduleDates, maxCacheSize)
+	return filmTitles, filmTextDict, scheduleDates
+
+
+# INCREMENTAL UPDATES
+# The state saved between runs is a dict with the schedule dates and a list of
+# [fingerprint, display title, langType, list of [theater, showtimes] pairs]
+# entries, one per film (including German-language films), in page order;
+# the fingerprint is a hash of the film's table rows in the web page.
+
+def GetFilmFingerprint( filmChunk ):
+	"""Returns a fingerprint (hex digest) for a per-film chunk of HTML (from
+	SplitFilmChunks), ignoring leading and trailing whitespace.
+	"""
+	return hashlib.sha1(filmChunk.strip().encode("utf-8")).hexdigest()
+
+def ParseFilmListingsIncremental( inputText, previousState=None, getGermanFilms=False ):
+	"""Same as ParseFilmListings (without caching), except that films whose
+	table rows are unchanged since the run which produced previousState are
+	not parsed again. Returns a tuple of ((filmTitles, filmTextDict,
+	scheduleDates), new state).
+	"""
+	headerText, filmChunks = SplitFilmChunks(inputText)
+	if filmChunks is None:
+		raise ValueError("Film-listings table not found in web page")
+	previousFilms = {}
+	if previousState is not None and previousState.get("version") == PARSER_VERSION \
+			and previousState.get("locale", DEFAULT_LOCALE) == showtimeLocale:
+		previousFilms = {entry[0]: entry for entry in previousState["films"]}
+
+	fingerprints = [GetFilmFingerprint(filmChunk) for filmChunk in filmChunks]
+	newChunks = [filmChunk for (filmChunk, fp) in zip(filmChunks, fingerprints)
+					if fp not in previousFilms]
+	CountEvent("filmsReparsed", len(newChunks))
+	if len(newChunks) > 0:
+		soup = MakeSoup('<table class="linien prog film">' + "".join(newChunks) + '</table>')
+		# (one Film per chunk, since each chunk has one "start" row)
+		newFilms = iter(GetFilms(soup, getGermanFilms=True))
+	entries = []
+	for fp in fingerprints:
+		if fp in previousFilms:
+			entries.append(previousFilms[fp])
+		else:
+			film = next(newFilms)
+			entries.append([fp, film.GetDisplayTitle(), film.langType,
+							[list(theaterTime) for theaterTime in film.theaterTimes]])
+
+	filmTitles = []
+	filmTextDict = {}
+	for fp, title, langType, pairs in entries:
+		if getGermanFilms or (langType in ["OF", "OmU", "OmeU"]):
+			filmTitles.append(title)
+			filmTextDict[title] = TimesListFromPairs(pairs)
+	scheduleDates = GetScheduleDatesFromHeader(headerText)
+	state = {"version": PARSER_VERSION, "locale": showtimeLocale, "scheduleDates": scheduleDates,
+			"films": entries}
+	return (filmTitles, filmTextDict, scheduleDates), state
+
+def ReadFilmState( stateFname ):
+	"""Returns the state saved by WriteFilmState, or None if the file doesn't
+	exist or is unusable.
+	"""
+	try:
+		with open(stateFname, encoding="utf-8") as f:
+			return json.load(f)
+	except (IOError, ValueError):
+		return None
+
+def WriteFilmState( stateFname, state ):
+	WriteFileAtomically(stateFname, json.dumps(state, separators=(",", ":")))
+
+
+def GetScreeningStrings( showtimes ):
+	"""Returns the set of individual screenings ("Sun 20:00", etc.) for a
+	showtimes string.
+	"""
+	return set("%s %s" % (DAY_NAMES[d], MinutesToShowtime(t))
+				for d, times in enumerate(ParseShowtimes(showtimes)) for t in times)
+
+def SortScreenings( screenings ):
+	"""Sorts screening strings ("Sun 20:00", etc.) by day and time.
+	"""
+	return sorted(screenings, key=lambda s: (GetDayIndex(s.split()[0]),
+											ShowtimeToMinutes(s.split()[1])))
+
+def DiffTimesLists( oldTimesList, newTimesList ):
+	"""Given the old and new lists of theater+showtimes strings for a film,
+	returns an OrderedDict mapping theater names to {"added": [...], "removed":
+	[...]} lists of screenings ("Sun 20:00", etc.), for the theaters whose
+	screenings have changed.
+	"""
+	oldTimes = OrderedDict(SplitTheaterTimes(t) for t in oldTimesList)
+	newTimes = OrderedDict(SplitTheaterTimes(t) for t in newTimesList)
+	changes = OrderedDict()
+	for theater in list(oldTimes) + [t for t in newTimes if t not in oldTimes]:
+		oldScreenings = GetScreeningStrings(oldTimes.get(theater, ""))
+		newScreenings = GetScreeningStrings(newTimes.get(theater, ""))
+		if oldScreenings != newScreenings:
+			changes[theater] = {"added": SortScreenings(newScreenings - oldScreenings),
+								"removed": SortScreenings(oldScreenings - newScreenings)}
+	return changes
+
+def DiffFilmListings( oldResults, newResults ):
+	"""Given two sets of (filmTitles, filmTextDict, scheduleDates) results,
+	returns a dict describing the differences:
+		{"scheduleDates": new dates, "previousScheduleDates": old dates,
+		"added": {title: [theater+showtimes strings], ...},
+		"removed": {title: [theater+showtimes strings], ...},
+		"changed": {title: {theater: {"added": [...], "removed": [...]}, ...}, ...}}
+	where the "changed" entries list individual screenings ("Sun 20:00"). Films
+	whose showtimes text changed without any change in screenings are left out.
+	"""
+	oldTitles, oldTextDict, oldDates = oldResults
+	newTitles, newTextDict, newDates = newResults
+	diff = OrderedDict([("scheduleDates", newDates), ("previousScheduleDates", oldDates),
+						("added", OrderedDict()), ("removed", OrderedDict()),
+						("changed", OrderedDict())])
+	for title in newTitles:
+		if title not in oldTextDict:
+			diff["added"][title] = newTextDict[title]
+		elif newTextDict[title] != oldTextDict[title]:
+			changes = DiffTimesLists(oldTextDict[title], newTextDict[title])
+			if len(changes) > 0:
+				diff["changed"][title] = changes
+	for title in oldTitles:
+		if title not in newTextDict:
+			diff["removed"][title] = oldTextDict[title]
+	return diff
+
+def StateToResults( state, getGermanFilms=False ):
+	"""Returns (filmTitles, filmTextDict, scheduleDates) from a saved state.
+	"""
+	filmTitles = []
+	filmTextDict = {}
+	if state is not None:
+		for fp, title, langType, pairs in state["films"]:
+			if getGermanFilms or (langType in ["OF", "OmU", "OmeU"]):
+				filmTitles.append(title)
+				filmTextDict[title] = TimesListFromPairs(pairs)
+	return filmTitles, filmTextDict, None if state is None else state["scheduleDates"]
+
+
+class FilmListingsStreamParser(HTMLParser):
+	"""Incremental parser for the artechock.de web page: feed it the page text in
+	pieces (e.g., as it is downloaded), and complete film records accumulate
+	in the records attribute, as tuples of
+		(filmTitle, langType, [(theater1, showtimes1), (theater2, showtimes2), ...])
+	with the same contents as GetTitleAndLanguage and GetTheatersAndTimes give.
+	A film's record is complete when the next film's "start" row (or the end
+	of the listings table) is seen. The schedule dates are stored in the
+	scheduleDates attribute once the heading containing them has been seen.
+	
+	Only the current film's text is kept, so memory use doesn't grow with
+	the size of the page.
+	"""
+	def __init__( self ):
+		HTMLParser.__init__(self, convert_charrefs=True)
+		self.records = []
+		self.scheduleDates = None
+		self.tableDepth = 0   # nesting depth of <table> elements within listings table
+		self.texts = None   # text fragments of the element currently being extracted
+		self.target = None   # what the current text fragments are: "title", "theater", etc.
+		self.textBuffer = []
+		self.currentFilm = None
+		self.rowClasses = []
+		self.rowTheater = None
+		self.rowShowtimes = None
+		self.cellClass = None
+		self.h2Texts = None
+
+	def FlushText( self ):
+		# text between two tags = one text fragment (same as BeautifulSoup's strings)
+		if len(self.textBuffer) > 0:
+			text = "".join(self.textBuffer).strip()
+			self.textBuffer = []
+			if len(text) > 0:
+				if self.texts is not None:
+					self.texts.append(text)
+				if self.h2Texts is not None:
+					self.h2Texts.append(text)
+
+	def handle_data( self, data ):
+		if self.texts is not None or self.h2Texts is not None:
+			self.textBuffer.append(data)
+
+	def handle_starttag( self, tag, attrs ):
+		self.FlushText()
+		if tag == "h2" and self.scheduleDates is None:
+			self.h2Texts = []
+			return
+		if self.tableDepth == 0:
+			if tag == "table" and dict(attrs).get("class") == "linien prog film":
+				self.tableDepth = 1
+			return
+		if tag == "table":
+			self.tableDepth += 1
+		elif tag == "tr":
+			self.FinishRow()
+			self.rowClasses = (dict(attrs).get("class") or "").split()
+			if "start" in self.rowClasses:
+				self.FinishFilm()
+				self.currentFilm = [None, []]
+		elif tag == "td":
+			self.cellClass = dict(attrs).get("class") or ""
+			if self.rowShowtimes is None and "right" in self.cellClass.split():
+				self.StartText("showtimes")
+		elif tag == "strong" and "start" in self.rowClasses and self.currentFilm[0] is None:
+			self.StartText("title")
+		elif tag == "span" and self.cellClass == "mid b" and self.rowTheater is None:
+			if "link" in (dict(attrs).get("class") or "").split():
+				self.StartText("theater")
+
+	def handle_endtag( self, tag ):
+		self.FlushText()
+		if tag == "h2" and self.h2Texts is not None:
+			self.scheduleDates = GetScheduleDatesFromText("".join(self.h2Texts))
+			self.h2Texts = None
+			return
+		if self.tableDepth == 0:
+			return
+		if tag == "table":
+			self.tableDepth -= 1
+			if self.tableDepth == 0:
+				self.FinishRow()
+				self.FinishFilm()
+		elif tag == "tr":
+			self.FinishRow()
+		elif tag == "td":
+			if self.target == "showtimes":
+				self.EndText()
+			self.cellClass = None
+		elif tag == "strong" and self.target == "title":
+			self.EndText()
+		elif tag == "span" and self.target == "theater":
+			self.EndText()
+
+	def StartText( self, target ):
+		self.texts = []
+		self.target = target
+
+	def EndText( self ):
+		text = "\n".join(self.texts)
+		if self.target == "title":
+			self.currentFilm[0] = text
+		elif self.target == "theater":
+			self.rowTheater = text
+		elif self.target == "showtimes":
+			self.rowShowtimes = text.replace(u'\xa0', u' ')
+		self.texts = None
+		self.target = None
+
+	def FinishRow( self ):
+		if self.target is not None:
+			self.EndText()
+		if self.currentFilm is not None and self.rowTheater is not None \
+				and self.rowShowtimes is not None:
+			self.currentFilm[1].append((self.rowTheater.strip(), self.rowShowtimes.strip()))
+		self.rowClasses = []
+		self.rowTheater = None
+		self.rowShowtimes = None
+
+	def FinishFilm( self ):
+		if self.currentFilm is not None and self.currentFilm[0] is not None:
+			filmTitle, langType = GetTitleAndLanguageFromText(self.currentFilm[0])
+			self.records.append((filmTitle, langType, self.currentFilm[1]))
+		self.currentFilm = None
+
+
+def IterFilmRecords( textChunks, getGermanFilms=False, streamParser=None ):
+	"""Given an iterable of pieces of text of the artechock.de web page (e.g., from
+	IterPageChunks), yields film records (filmTitle, langType, theatersAndTimes)
+	as soon as each one is complete (see FilmListingsStreamParser). Only films
+	labeled as "(OF)", "(OmU)", or "(OmeU)" are included, unless getGermanFilms
+	= True. streamParser can be specified in order to access its scheduleDates
+	attribute.
+	"""
+	if streamParser is None:
+		streamParser = FilmListingsStreamParser()
+	def KeptRecords( ):
+		# (counted here, after the language filter, as in GetFilms)
+		for record in streamParser.records:
+			if getGermanFilms or record[1] != "German":
+				CountEvent("films")
+				CountEvent("theaters", len(record[2]))
+				yield record
+		streamParser.records = []
+
+	for textChunk in textChunks:
+		streamParser.feed(textChunk)
+		yield from KeptRecords()
+	streamParser.close()
+	streamParser.FinishRow()
+	streamParser.FinishFilm()
+	yield from KeptRecords()
+
+
+def IterPageChunks( url=artechockURL, chunkSize=16384 ):
+	"""Retrieves the web page at url, yielding its text in pieces as they are
+	downloaded.
+	"""
+	import requests
+	breaker = GetCircuitBreaker(url)
+	if not breaker.Allow():
+		fetchMetrics.RecordEvent("rejected")
+		raise CircuitOpenError("Circuit breaker open for {0} (too many failed requests)".format(
+								urlsplit(url).netloc))
+	t0 = time.perf_counter()
+	try:
+		res = requests.get(url, stream=True, timeout=fetchTimeout)
+	except BaseException as err:
+		fetchMetrics.RecordRequest(time.perf_counter() - t0, GetFetchErrorKind(err))
+		breaker.RecordFailure()
+		raise
+	# (latency = time to the response headers; as in HTTPGet, only server
+	# errors count as failures for the breaker)
+	if res.status_code >= 500:
+		fetchMetrics.RecordRequest(time.perf_counter() - t0, "http%d" % res.status_code)
+		breaker.RecordFailure()
+	else:
+		fetchMetrics.RecordRequest(time.perf_counter() - t0)
+		breaker.RecordSuccess()
+	if res.status_code >= 400:
+		res.close()
+		res.raise_for_status()
+	decoder = codecs.getincrementaldecoder(res.encoding or "utf-8")(errors="replace")
+	for data in res.iter_content(chunkSize):
+		yield decoder.decode(data)
+	yield decoder.decode(b"", final=True)
+	res.close()
+
+def IterFileChunks( fname, chunkSize=16384 ):
+	"""Yields the text of a saved web page in pieces of chunkSize characters.
+	"""
+	with open(fname) as f:
+		while True:
+			text = f.read(chunkSize)
+			if len(text) == 0:
+				break
+			yield text
+
+
+def StreamFilmListings( textChunks, outputFname, getGermanFilms=False ):
+	"""Streaming version of the parsing and output done by GetAndProcessFilmListings:
+	each film is written to the output file as soon as its table rows have been
+	parsed. Returns the name of the output file.
+	"""
+	streamParser = FilmListingsStreamParser()
+	outf = None
+	try:
+		for filmTitle, langType, theatersAndTimes in IterFilmRecords(textChunks,
+												getGermanFilms, streamParser):
+			if outf is None:
+				# the schedule dates are listed before the films
+				outputFname = GetOutputFilename(outputFname, streamParser.scheduleDates)
+				outf = open(outputFname, 'w')
+			timesList = ["%s: %s" % (theaterTime[0], TranslateTimesSimple(theaterTime))
+						for theaterTime in theatersAndTimes]
+			WriteFilmEntry(outf, filmTitle + " [" + langType + "]", timesList)
+	finally:
+		if outf is not None:
+			outf.close()
+	if outf is None:
+		# no films at all
+		outputFname = GetOutputFilename(outputFname, streamParser.scheduleDates)
+		open(outputFname, 'w').close()
+	return outputFname
+
+
+def ParseFilmListingsWorker( inputText, getGermanFilms, cacheDir, parser,
+							locale=DEFAULT_LOCALE ):
+	"""Calls ParseFilmListings after selecting the HTML parser backend and the
+	showtimes locale; for use in worker processes, which don't necessarily
+	inherit the current settings.
+	"""
+	InitWorker(parser, locale)
+	return ParseFilmListings(inputText, getGermanFilms, cacheDir)
+
+
+def MergeFilmListings( resultsList ):
+	"""Merges a list of (filmTitles, filmTextDict, scheduleDates) tuples (e.g.,
+	from different artechock.de pages) into a single such tuple. Titles are
+	kept in order of first appearance; theater+showtimes entries for a film
+	which appears on more than one page are combined, without duplicates.
+	The schedule dates are taken from the first page which has them.
+	"""
+	filmTitles = []
+	filmTextDict = {}
+	scheduleDates = None
+	for titles, textDict, dates in resultsList:
+		if scheduleDates is None:
+			scheduleDates = dates
+		for title in titles:
+			if title not in filmTextDict:
+				filmTitles.append(title)
+				filmTextDict[title] = list(textDict[title])
+			else:
+				timesList = filmTextDict[title]
+				timesList.extend(line for line in textDict[title] if line not in timesList)
+	return filmTitles, filmTextDict, scheduleDates
+
+
+def FetchAndParseTargets( urls, getGermanFilms=False, cacheDir=None, ttl=DEFAULT_CACHE_TTL,
+						offline=False, maxWorkers=DEFAULT_FETCH_WORKERS,
+						maxPerHost=DEFAULT_MAX_PER_HOST, retries=DEFAULT_RETRIES,
+						parseInProcesses=True ):
+	"""
+	Retrieves several artechock.de web pages concurrently (using a thread pool
+	sharing one connection-pooled session, with at most maxPerHost requests
+	to any one host at a time), parses each page as soon as it arrives (in a
+	process pool if parseInProcesses = True, otherwise in the fetching thread),
+	and returns the merged results (see MergeFilmListings), with the pages in
+	the same order as urls.
+	
+	cacheDir, ttl, offline, and retries are passed on to FetchPageText.
+	"""
+	import concurrent.futures
+	session = MakeSession(maxWorkers)
+	hostLimits = {}
+	for url in urls:
+		host = urlsplit(url).netloc
+		if host not in hostLimits:
+			hostLimits[host] = threading.Semaphore(maxPerHost)
+
+	if parseInProcesses:
+		parsePool = concurrent.futures.ProcessPoolExecutor()
+	else:
+		parsePool = None
+
+	def FetchAndParse( url ):
+		with hostLimits[urlsplit(url).netloc]:
+			inputText = FetchPageText(url, cacheDir, ttl, offline, session, retries)
+		if parsePool is None:
+			return ParseFilmListings(inputText, getGermanFilms, cacheDir)
+		return parsePool.submit(ParseFilmListingsWorker, inputText, getGermanFilms,
+								cacheDir, parserName, showtimeLocale).result()
+
+	try:
+		with concurrent.futures.ThreadPoolExecutor(maxWorkers) as fetchPool:
+			resultsList = list(fetchPool.map(FetchAndParse, urls))
+	finally:
+		session.close()
+		if parsePool is not None:
+			parsePool.shutdown()
+	return MergeFilmListings(resultsList)
+
+
+# ASYNC API
+# For embedding in asyncio applications: the blocking work is done off the
+# event loop (fetching in a worker thread, via FetchPageText, so the cache,
+# timeouts, retries, and circuit breaker all apply; parsing in an executor),
+# and results are returned as FilmListings objects instead of being written
+# to files. Identical concurrent calls share one fetch and parse.
+
+class FilmListings(object):
+	"""Parsed film schedule from one web page: url, list of Film objects,
+	scheduleDates, fingerprint (hash of the page text), and fetched (time.time()
+	when the page was retrieved).
+	"""
+	__slots__ = ("url", "films", "scheduleDates", "fingerprint", "fetched")
+
+	def __init__( self, url, films, scheduleDates, fingerprint, fetched ):
+		self.url = url
+		self.films = films
+		self.scheduleDates = scheduleDates
+		self.fingerprint = fingerprint
+		self.fetched = fetched
+
+	def GetTextDict( self ):
+		"""Returns (filmTitles, filmTextDict), as produced by ParseFilmListings.
+		"""
+		return FilmsToTextDict(self.films)
+
+	def GetGroups( self ):
+		"""Returns the films grouped by version (see GroupFilmVariants).
+		"""
+		return GroupFilmVariants(self.films)
+
+	def __repr__( self ):
+		return "FilmListings(%r, %d films, %r)" % (self.url, len(self.films), self.scheduleDates)
+
+
+def ParseFilmsWorker( inputText, getGermanFilms, parser, locale ):
+	"""Calls ParseFilms with the given parser backend and showtimes locale (for
+	use in executors, including process pools).
+	"""
+	InitWorker(parser, locale)
+	return ParseFilms(inputText, getGermanFilms)
+
+async def ParseFilmsAsync( inputText, getGermanFilms=False, executor=None ):
+	"""Same as ParseFilms, but runs the parsing in executor (default = the event
+	loop's default thread pool; a concurrent.futures.ProcessPoolExecutor keeps
+	the parsing from competing with the event loop for the GIL), e.g. for a page
+	retrieved with aiohttp.
+	"""
+	import asyncio
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(executor, ParseFilmsWorker, inputText, getGermanFilms,
+									parserName, showtimeLocale)
+
+inFlightFetches = {}   # (event loop, call arguments) --> asyncio.Future of FilmListings
+
+async def FetchAndParseAsync( url=artechockURL, getGermanFilms=False, cacheDir=None,
+								ttl=DEFAULT_CACHE_TTL, offline=False, executor=None ):
+	"""Retrieves and parses the web page at url without blocking the event loop
+	(see FetchPageText for cacheDir, ttl, and offline, and ParseFilmsAsync for
+	executor), and returns a FilmListings object.
+	
+	If an identical call (same url and settings) is already in progress, this
+	waits for its result instead of fetching and parsing the page again; so
+	any number of concurrent requests share one in-flight refresh. (Callers
+	shouldn't modify the shared result.)
+	"""
+	import asyncio
+	loop = asyncio.get_running_loop()
+	key = (loop, url, getGermanFilms, cacheDir, ttl, offline, parserName, showtimeLocale)
+	future = inFlightFetches.get(key)
+	if future is None:
+		future = inFlightFetches[key] = asyncio.ensure_future(
+				FetchAndParseUncoalesced(url, getGermanFilms, cacheDir, ttl, offline, executor))
+		future.add_done_callback(lambda f: inFlightFetches.pop(key, None))
+		CountEvent("asyncFetches")
+	else:
+		CountEvent("asyncFetchesCoalesced")
+	# (shielded, so that one caller being cancelled doesn't cancel the fetch
+	# for the others)
+	return await asyncio.shield(future)
+
+async def FetchAndParseUncoalesced( url, getGermanFilms, cacheDir, ttl, offline, executor ):
+	import asyncio
+	loop = asyncio.get_running_loop()
+	pageText = await loop.run_in_executor(None, FetchPageText, url, cacheDir, ttl, offline)
+	fetched = time.time()
+	films, scheduleDates = await ParseFilmsAsync(pageText, getGermanFilms, executor)
+	fingerprint = hashlib.sha1(pageText.encode("utf-8")).hexdigest()
+	return FilmListings(url, films, scheduleDates, fingerprint, fetched)
+
+
+# STRUCTURED EXPORT
+# One row per screening (i.e., per film, theater, day, and showtime):
+SCREENING_COLUMNS = ["week", "weekStart", "date", "film", "langType", "is3D", "theater",
+					"weekday", "minutes"]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS screenings (
+	week TEXT,         -- schedule dates, e.g. "28.04.2016-04.05.2016"
+	weekStart TEXT,    -- first day of schedule week, e.g. "2016-04-28"
+	date TEXT,         -- date of screening, e.g. "2016-05-01"
+	film TEXT,         -- plain title (without language type or "(3D)")
+	langType TEXT,     -- "OF", "OmU", "OmeU", or "German"
+	is3D INTEGER,
+	theater TEXT,
+	weekday INTEGER,   -- 0 = Sunday, ..., 6 = Saturday
+	minutes INTEGER    -- showtime in minutes after midnight
+);
+CREATE INDEX IF NOT EXISTS screeningsWeek ON screenings (weekStart);
+CREATE INDEX IF NOT EXISTS screeningsDate ON screenings (date, minutes);
+CREATE INDEX IF NOT EXISTS screeningsFilm ON screenings (film);
+CREATE INDEX IF NOT EXISTS screeningsTheater ON screenings (theater, date);
+"""
+
+def GetWeekDates( scheduleDates ):
+	"""Given schedule dates (e.g., "28.04.2016-04.05.2016", from GetScheduleDates),
+	returns a list of 7 ISO-format dates for the days of that schedule week,
+	indexed by weekday (0 = Sunday, ..., 6 = Saturday), or None if the schedule
+	dates are missing or can't be interpreted.
+	"""
+	try:
+		startDate = datetime.datetime.strptime(scheduleDates.split("-")[0], "%d.%m.%Y").date()
+	except (AttributeError, ValueError):
+		return None
+	startIndex = (startDate.weekday() + 1) % 7   # Python's weekday(): 0 = Monday
+	return [(startDate + datetime.timedelta((d - startIndex) % 7)).isoformat()
+			for d in range(7)]
+
+def GetScreeningRows( films, scheduleDates ):
+	"""Given a list of Film objects and the schedule dates, returns a list of
+	tuples, one per screening, with the fields in SCREENING_COLUMNS.
+	"""
+	weekDates = GetWeekDates(scheduleDates)
+	weekStart = None if weekDates is None else min(weekDates)
+	rows = []
+	for film in films:
+		for screening in film.screenings:
+			for d in range(7):
+				if screening.dayMask & (1 << d):
+					rows.append((scheduleDates, weekStart,
+								None if weekDates is None else weekDates[d], film.title,
+								film.langType, int(film.is3D), screening.theater, d,
+								screening.minutes))
+	return rows
+
+def ExportToSQLite( dbFname, filmTitles, filmTextDict, scheduleDates ):
+	"""Adds one row per screening (see SCREENING_COLUMNS) to the "screenings"
+	table in the SQLite database dbFname (created if necessary). Any rows
+	already there for the same schedule week are replaced, so the database can
+	accumulate the schedules of successive weeks. Returns the number of rows.
+	"""
+	return ExportFilmsToSQLite(dbFname, FilmsFromTextDict(filmTitles, filmTextDict), scheduleDates)
+
+def ExportFilmsToSQLite( dbFname, films, scheduleDates ):
+	"""Same as ExportToSQLite, for a list of Film objects.
+	"""
+	import sqlite3
+	rows = GetScreeningRows(films, scheduleDates)
+	db = sqlite3.connect(dbFname)
+	try:
+		db.executescript(SQLITE_SCHEMA)
+		with db:
+			db.execute("DELETE FROM screenings WHERE week IS ?", (scheduleDates,))
+			db.executemany("INSERT INTO screenings VALUES (%s)" % ",".join(["?"]*len(SCREENING_COLUMNS)),
+							rows)
+	finally:
+		db.close()
+	return len(rows)
+
+def ExportToParquet( outputDir, filmTitles, filmTextDict, scheduleDates ):
+	"""Saves one row per screening (see SCREENING_COLUMNS) as a Parquet file in
+	outputDir, named for the start of the schedule week; together, the files
+	form a dataset which can be read with pyarrow.dataset, DuckDB, pandas,
+	etc. Requires pyarrow. Returns the filename.
+	"""
+	return ExportFilmsToParquet(outputDir, FilmsFromTextDict(filmTitles, filmTextDict),
+								scheduleDates)
+
+def ExportFilmsToParquet( outputDir, films, scheduleDates ):
+	"""Same as ExportToParquet, for a list of Film objects.
+	"""
+	try:
+		import pyarrow, pyarrow.parquet
+	except ImportError:
+		raise ImportError("Parquet export requires pyarrow (\"pip install pyarrow\")")
+	rows = GetScreeningRows(films, scheduleDates)
+	columns = list(zip(*rows)) if len(rows) > 0 else [()]*len(SCREENING_COLUMNS)
+	types = [pyarrow.string()]*5 + [pyarrow.int8(), pyarrow.string(), pyarrow.int8(),
+			pyarrow.int16()]
+	table = pyarrow.table([pyarrow.array(column, type=t) for (column, t) in zip(columns, types)],
+							names=SCREENING_COLUMNS)
+	os.makedirs(outputDir, exist_ok=True)
+	weekStart = rows[0][1] if len(rows) > 0 else None
+	fname = os.path.join(outputDir, "screenings_{0}.parquet".format(weekStart or "unknown"))
+	pyarrow.parquet.write_table(table, fname)
+	return fname
+
+
+def GetOutputFilename( outputFname, scheduleDates ):
+	"""Returns outputFname, unless it is "DEFAULT", in which case the filename
+	is generated from the schedule dates ("currentfilms_<start_date>-<end_data>.txt").
+	"""
+	if outputFname != "DEFAULT":
+		return outputFname
+	if scheduleDates is None:
+		print("Unable to extract schedule dates from HTML!")
+		return "currentfilms.txt"
+	return "currentfilms_{0}.txt".format(scheduleDates)
+
+def WriteFilmEntry( outf, title, timesList ):
+	"""Writes the listing for one film (title and list of theater+showtimes
+	strings) to the open file outf.
+	"""
+	for i in range(len(timesList)):
+		if i == 0:
+			line = title + ":\n"
+		else:
+			line = ""
+		line += "\t%s" % timesList[i]
+		outf.write(line + "\n")
+	outf.write("\n")
+
+
+# BATCH PROCESSING
+# For backfilling from many saved web pages in one run: the pages are parsed
+# by a pool of worker processes, and their text listings are written by the
+# main process, in input order (several pages for the same week write the
+# same file, and the last one wins). A state file in the output directory
+# records which input files (by modification time and size) have already
+# been processed, and which input each output file came from.
+
+BATCH_STATE_FILENAME = ".munich_films_batch.json"
+
+def GetBatchInputFiles( pattern ):
+	"""Returns the sorted list of HTML files matching pattern, which is either
+	a directory (all .htm and .html files in it) or a glob pattern.
+	"""
+	import glob
+	if os.path.isdir(pattern):
+		fnames = [os.path.join(pattern, fname) for fname in os.listdir(pattern)
+					if fname.endswith((".htm", ".html"))]
+	else:
+		fnames = glob.glob(pattern)
+	return sorted(fname for fname in fnames if os.path.isfile(fname))
+
+def GetBatchInputKey( inputFname, getGermanFilms ):
+	"""Returns the value which identifies this version of an input file in the
+	batch state (if it matches, the file doesn't need processing again).
+	"""
+	st = os.stat(inputFname)
+	return [st.st_mtime_ns, st.st_size, getGermanFilms, PARSER_VERSION, showtimeLocale]
+
+def ProcessFileWorker( inputFname, outputDir, getGermanFilms, returnFilms ):
+	"""Parses one saved web page and formats its listing. Returns (output
+	filename in outputDir -- the default "currentfilms_<dates>.txt" --, text of
+	the listing, number of films, scheduleDates, list of Film objects or None).
+	"""
+	with open(inputFname) as f:
+		films, scheduleDates = ParseFilms(f.read(), getGermanFilms)
+	if scheduleDates is None:
+		outputFname = os.path.splitext(os.path.basename(inputFname))[0] + ".txt"
+	else:
+		outputFname = GetOutputFilename("DEFAULT", scheduleDates)
+	outf = io.StringIO()
+	for film in films:
+		WriteFilmEntry(outf, film.GetDisplayTitle(), film.GetTimesList())
+	return (os.path.join(outputDir, outputFname), outf.getvalue(), len(films), scheduleDates,
+			films if returnFilms else None)
+
+def ProcessFilmListingsBatch( inputFnames, outputDir=".", getGermanFilms=False, jobs=None,
+								force=False, sqliteFname=None, parquetDir=None ):
+	"""Processes a list of saved artechock.de web pages, saving a text listing
+	for each in outputDir (see ProcessFileWorker; if several pages are for the
+	same week, the last one's listing is kept), using a pool of jobs worker
+	processes (default = number of CPUs; jobs = 1 processes the files in this
+	process). Files already processed (with the same settings) since they
+	were last modified are skipped, unless force = True. If sqliteFname and/or
+	parquetDir are specified, the screenings are also added to a combined
+	SQLite database or Parquet dataset (see ExportFilmsToSQLite and
+	ExportFilmsToParquet).
+
+	Returns a dict with the numbers of pages processed and skipped, films,
+	errors (list of (input filename, error message) tuples), elapsed time,
+	and throughput (pages/s, films/s).
+	"""
+	t0 = time.perf_counter()
+	os.makedirs(outputDir, exist_ok=True)
+	stateFname = os.path.join(outputDir, BATCH_STATE_FILENAME)
+	try:
+		with open(stateFname, encoding="utf-8") as f:
+			state = json.load(f)
+	except (IOError, ValueError):
+		state = {}
+	# input file --> [key, output file]; output file --> input file it came from
+	inputState = state.setdefault("inputs", {})
+	outputState = state.setdefault("outputs", {})
+	inputOrder = {os.path.abspath(inputFname): i for (i, inputFname) in enumerate(inputFnames)}
+
+	todo = []
+	nSkipped = 0
+	for inputFname in inputFnames:
+		key = GetBatchInputKey(inputFname, getGermanFilms)
+		entry = inputState.get(os.path.abspath(inputFname))
+		if not force and entry is not None and entry[0] == key and os.path.exists(entry[1]):
+			nSkipped += 1
+		else:
+			todo.append((inputFname, key))
+
+	returnFilms = (sqliteFname is not None or parquetDir is not None)
+	stats = {"pages": 0, "skipped": nSkipped, "films": 0, "errors": []}
+
+	def HandleResult( inputFname, key, result ):
+		outputFname, text, nFilms, scheduleDates, films = result
+		inputFname = os.path.abspath(inputFname)
+		# don't replace the listing from a later page for the same week which
+		# wasn't processed again this time
+		owner = outputState.get(os.path.abspath(outputFname))
+		if owner is None or inputOrder.get(owner, -1) <= inputOrder[inputFname] \
+				or not os.path.exists(outputFname):
+			WriteFileAtomically(outputFname, text)
+			outputState[os.path.abspath(outputFname)] = inputFname
+		stats["pages"] += 1
+		stats["films"] += nFilms
+		if films is not None:
+			if sqliteFname is not None:
+				ExportFilmsToSQLite(sqliteFname, films, scheduleDates)
+			if parquetDir is not None and GetWeekDates(scheduleDates) is not None:
+				ExportFilmsToParquet(parquetDir, films, scheduleDates)
+		inputState[inputFname] = [key, outputFname]
+
+	if jobs is None:
+		jobs = os.cpu_count() or 1
+	if jobs <= 1 or len(todo) <= 1:
+		for inputFname, key in todo:
+			try:
+				result = ProcessFileWorker(inputFname, outputDir, getGermanFilms, returnFilms)
+			except Exception as err:
+				stats["errors"].append((inputFname, "{0}: {1}".format(type(err).__name__, err)))
+				continue
+			HandleResult(inputFname, key, result)
+	else:
+		import concurrent.futures
+		with concurrent.futures.ProcessPoolExecutor(min(jobs, len(todo)), initializer=InitWorker,
+													initargs=(parserName, showtimeLocale)) as pool:
+			futures = [pool.submit(ProcessFileWorker, inputFname, outputDir, getGermanFilms,
+									returnFilms) for (inputFname, key) in todo]
+			# (results are handled in input order, so that later pages for the
+			# same week consistently win)
+			for (inputFname, key), future in zip(todo, futures):
+				try:
+					result = future.result()
+				except Exception as err:
+					stats["errors"].append((inputFname, "{0}: {1}".format(type(err).__name__, err)))
+					continue
+				HandleResult(inputFname, key, result)
+
+	WriteFileAtomically(stateFname, json.dumps(state, indent=0))
+	elapsed = time.perf_counter() - t0
+	stats["seconds"] = elapsed
+	stats["pagesPerSecond"] = stats["pages"]/elapsed if elapsed > 0 else 0.0
+	stats["filmsPerSecond"] = stats["films"]/elapsed if elapsed > 0 else 0.0
+	return stats
+
+
 # KEEP
-def GetAndProcessFilmListings( input, outputFname, getGermanFilms=False ):
+def GetAndProcessFilmListings( input, outputFname, getGermanFilms=False, days=None,
+								cacheDir=None, cacheTTL=DEFAULT_CACHE_TTL, offline=False,
+								targets=None, jobs=1, stream=False, diffState=None, diffOutput=None,
+								sqliteFname=None, parquetDir=None, mergeVariants=False ):
 	"""
 	Reads HTML produced by artechock.de and saves cleaned-up text file listing
 	just those movies labeled as "(OF)", "(OmU)", or "(OmeU)".
@@ -433,36 +2824,111 @@ def GetAndProcessFilmListings( input, outputFname, getGermanFilms=False ):
 		
 		outputFname = filename to save results in; use 'DEFAULT' to specify
 			the format "currentfiles_<start_date>-<end_data>.txt"
+		
+		days = optional list of day names (e.g., ["Sat", "Sun"]); if specified,
+			a separate listing is saved for each day instead (with the day name
+			added to the filename: "currentfilms_<start_date>-<end_data>_Sat.txt")
+		
+		cacheDir, cacheTTL, offline = on-disk cache settings for retrieving
+			the web page (see FetchPageText) and for the parsed results (see
+			ParseFilmListings)
+		
+		targets = optional list of artechock.de URLs to retrieve (concurrently)
+			and merge, instead of the default page (input must be "url")
+		
+		jobs = number of worker processes to use for parsing the web page
+		
+		stream = True to parse the web page as it is downloaded (or read) and
+			write each film as soon as it has been parsed (see StreamFilmListings);
+			days, targets, jobs, and the cache settings are ignored
+		
+		diffState = optional filename for the per-film state saved between runs;
+			if specified, only films which have changed since the previous run
+			are parsed (see ParseFilmListingsIncremental), and a JSON summary of
+			the changes (see DiffFilmListings) is saved in diffOutput (or printed,
+			if diffOutput is None); targets and jobs are ignored
+		
+		sqliteFname, parquetDir = optional SQLite database and/or directory of
+			Parquet files to add one row per screening to (see ExportToSQLite
+			and ExportToParquet), in addition to the text listing
+		
+		mergeVariants = True to list all versions of a film (2D/3D, different
+			language types) under one title (see GroupFilmVariants), with the
+			version noted after each theater name
 	"""
 	
-	if input == "url":
-		soup = GetSoupObjectFromURL(artechockURL)
+	if stream:
+		if input == "url":
+			print("Fetching current web page from artechock.de ...")
+			textChunks = IterPageChunks(artechockURL)
+		else:
+			textChunks = IterFileChunks(input)
+		outputFname = StreamFilmListings(textChunks, outputFname, getGermanFilms)
+		print("Saved current film schedule in \"{0}\".".format(outputFname))
+		return
+	
+	films = None
+	if targets is not None and diffState is None:
+		print("Fetching {0} web pages from artechock.de ...".format(len(targets)))
+		filmTitles, filmTextDict, scheduleDates = FetchAndParseTargets(targets,
+										getGermanFilms, cacheDir, cacheTTL, offline)
 	else:
-		with open(input) as f:
-			inputText = f.read()
-			soup = BeautifulSoup(inputText, parserName)
-
-	filmSoupDict, filmTitles = GetFilmSoupDict(soup, getGermanFilms)
-	filmTextDict = MakeFilmTextDict(filmSoupDict, filmTitles)
+		if input == "url":
+			print("Fetching current web page from artechock.de ...")
+			inputText = FetchPageText(artechockURL, cacheDir, cacheTTL, offline)
+		else:
+			with open(input) as f:
+				inputText = f.read()
+		if diffState is not None:
+			previousState = ReadFilmState(diffState)
+			results, state = ParseFilmListingsIncremental(inputText, previousState, getGermanFilms)
+			diff = DiffFilmListings(StateToResults(previousState, getGermanFilms), results)
+			WriteFilmState(diffState, state)
+			diffText = json.dumps(diff, ensure_ascii=False, separators=(",", ":"))
+			if diffOutput is None:
+				print(diffText)
+			else:
+				with open(diffOutput, 'w', encoding="utf-8") as outf:
+					outf.write(diffText + "\n")
+				print("Saved changes ({0} added, {1} removed, {2} changed) in \"{3}\".".format(
+						len(diff["added"]), len(diff["removed"]), len(diff["changed"]), diffOutput))
+			filmTitles, filmTextDict, scheduleDates = results
+		elif cacheDir is None and jobs == 1:
+			# work with the Film records directly (no text dict to build and re-split)
+			films, scheduleDates = ParseFilms(inputText, getGermanFilms)
+		else:
+			filmTitles, filmTextDict, scheduleDates = ParseFilmListings(inputText, getGermanFilms,
+																		cacheDir, jobs=jobs)
+	if films is None:
+		films = FilmsFromTextDict(filmTitles, filmTextDict)
 	
-	if outputFname == "DEFAULT":
-		scheduleDates = GetScheduleDates(soup)
-		if scheduleDates is None:
-			print("Unable to extract schedule dates from HTML!")
-			outputFname = "currentfilms.txt"
+	if sqliteFname is not None:
+		nRows = ExportFilmsToSQLite(sqliteFname, films, scheduleDates)
+		print("Saved {0} screenings in \"{1}\".".format(nRows, sqliteFname))
+	if parquetDir is not None:
+		parquetFname = ExportFilmsToParquet(parquetDir, films, scheduleDates)
+		print("Saved screenings in \"{0}\".".format(parquetFname))
+	
+	outputFname = GetOutputFilename(outputFname, scheduleDates)
+	groups = GroupFilmVariants(films) if mergeVariants else None
+	if days is not None:
+		if mergeVariants:
+			dayIndex = MakeDayIndexFromGroups(groups)
 		else:
-			outputFname = "currentfilms_{0}.txt".format(scheduleDates)
-	with open(outputFname, 'w') as outf:
-		for title in filmTitles:
-			timesList = filmTextDict[title]
-			for i in range(len(timesList)):
-				if i == 0:
-					line = title + ":\n"
-				else:
-					line = ""
-				line += "\t%s" % timesList[i]
-				outf.write(line + "\n")
-			outf.write("\n")
+			dayIndex = MakeDayIndexFromFilms(films)
+		for day in days:
+			dayFname = GetDayListingFilename(outputFname, day)
+			with ProfileStage("write"):
+				WriteDayListing(GetListingsForDay(dayIndex, day), dayFname)
+			print("Saved film schedule for {0} in \"{1}\".".format(day, dayFname))
+		return
+	with ProfileStage("write"), open(outputFname, 'w') as outf:
+		if mergeVariants:
+			for group in groups:
+				WriteFilmEntry(outf, group.title, group.GetTimesList())
+		else:
+			for film in films:
+				WriteFilmEntry(outf, film.GetDisplayTitle(), film.GetTimesList())
 	print("Saved current film schedule in \"{0}\".".format(outputFname))
 
 
@@ -478,11 +2944,68 @@ def main(argv=None):
 					  default=None, help="read local HTML file instead of web retrieval [for testing purposes]")
 	parser.add_option("--german-films", action="store_true", dest="germanFilms",
 					  default=False, help="extract German-language films, too")
+	parser.add_option("--merge-variants", action="store_true", dest="mergeVariants",
+					  default=False, help="list all versions of a film (2D/3D, OF/OmU/etc.) under one title")
+	parser.add_option("--day", type="choice", dest="day", default=None,
+					  choices=["all"] + DAY_NAMES,
+					  help="save listing for a single day (" + ", ".join(DAY_NAMES) + "), or one listing for each day (\"all\")")
+	parser.add_option("--cache", action="store_true", dest="useCache", default=False,
+					  help="keep a cached copy of the web page in " + DEFAULT_CACHE_DIR)
+	parser.add_option("--cache-dir", type="str", dest="cacheDir", default=None,
+					  help="keep a cached copy of the web page in this directory")
+	parser.add_option("--cache-ttl", type="float", dest="cacheTTL", default=DEFAULT_CACHE_TTL,
+					  help="re-use cached web page without checking for updates if it is less than this many seconds old [default = %default]")
+	parser.add_option("--timeout", type="float", dest="timeout", default=DEFAULT_TIMEOUT[1],
+					  help="seconds to wait for the web server to respond (or send more data) before retrying [default = %default]")
+	parser.add_option("--offline", action="store_true", dest="offline", default=False,
+					  help="use cached copy of web page instead of retrieving it")
+	parser.add_option("--target", type="str", action="append", dest="targets", default=None,
+					  help="artechock.de page to retrieve: " + ", ".join(ARTECHOCK_TARGETS) + ", or a URL (can be used more than once; pages are retrieved concurrently and merged)")
+	parser.add_option("--jobs", type="int", dest="jobs", default=None,
+					  help="number of worker processes for parsing the web page [default = 1; with --batch, number of CPUs]")
+	parser.add_option("--batch", type="str", dest="batch", default=None,
+					  help="process all saved web pages in this directory (or matching this glob pattern), saving a listing for each in --output-dir")
+	parser.add_option("--output-dir", type="str", dest="outputDir", default=".",
+					  help="with --batch: directory for the listings [default = current directory]")
+	parser.add_option("--force", action="store_true", dest="force", default=False,
+					  help="with --batch: re-process pages even if they haven't changed since the last batch run")
+	parser.add_option("--stream", action="store_true", dest="stream", default=False,
+					  help="parse web page while it is downloaded, writing each film as soon as it is parsed")
+	parser.add_option("--diff-state", type="str", dest="diffState", default=None,
+					  help="file for per-film state between runs: only re-parse changed films, and report changes (see --diff-output)")
+	parser.add_option("--diff-output", type="str", dest="diffOutput", default=None,
+					  help="save JSON summary of changes since previous --diff-state run in this file [default = print it]")
+	parser.add_option("--sqlite", type="str", dest="sqliteFname", default=None,
+					  help="also add one row per screening to this SQLite database (replacing any rows for the same week)")
+	parser.add_option("--parquet", type="str", dest="parquetDir", default=None,
+					  help="also save one row per screening as a Parquet file in this directory (requires pyarrow)")
+	parser.add_option("--profile", action="store_true", dest="profile", default=False,
+					  help="print timing breakdown by stage, and counts of films, theaters, etc.")
+	parser.add_option("--profile-json", type="str", dest="profileJSON", default=None,
+					  help="save --profile timings and counters in this JSON file")
+	parser.add_option("--cprofile", type="str", dest="cprofileOutput", default=None,
+					  help="save cProfile statistics in this file (implies --profile)")
+	parser.add_option("--trace", type="str", dest="traceOutput", default=None,
+					  help="save Chrome-trace JSON of the stage timings in this file (implies --profile)")
+	parser.add_option("--parser", type="choice", dest="parserName", default="auto",
+					  choices=["auto"] + PARSER_PREFERENCE,
+					  help="HTML parser to use: auto, " + ", ".join(PARSER_PREFERENCE) + " [default = fastest installed]")
+	parser.add_option("--locale", type="choice", dest="locale", default=DEFAULT_LOCALE,
+					  choices=list(LOCALES),
+					  help="language for showtimes: en (English), de (German, as on the web page), or iso (two-letter weekday codes) [default = %default]")
 	
 	(options, args) = parser.parse_args(argv)
 	# args[0] = name program was called with
 	# args[1] = first actual argument, etc.
 	
+	try:
+		SetParser(options.parserName)
+	except ValueError as e:
+		parser.error(str(e))
+	SetLocale(options.locale)
+	global fetchTimeout
+	fetchTimeout = (min(DEFAULT_TIMEOUT[0], options.timeout), options.timeout)
+
 	if options.outputFilename is None:
 		outputFname = "DEFAULT"
 	else:
@@ -492,7 +3015,82 @@ def main(argv=None):
 	else:
 		input = options.inputFilename
 	
-	GetAndProcessFilmListings(input, outputFname, getGermanFilms=options.germanFilms)
+	if options.day is None:
+		days = None
+	elif options.day == "all":
+		days = DAY_NAMES
+	else:
+		days = [options.day]
+	
+	cacheDir = options.cacheDir
+	if cacheDir is None and (options.useCache or options.offline):
+		cacheDir = DEFAULT_CACHE_DIR
+	
+	if options.stream and (options.targets is not None or days is not None):
+		parser.error("--stream cannot be used with --target or --day")
+	if options.diffState is not None and (options.stream or options.targets is not None):
+		parser.error("--diff-state cannot be used with --stream or --target")
+	if options.stream and (options.sqliteFname is not None or options.parquetDir is not None):
+		parser.error("--stream cannot be used with --sqlite or --parquet")
+	if options.mergeVariants and (options.stream or options.batch is not None):
+		parser.error("--merge-variants cannot be used with --stream or --batch")
+	if options.parquetDir is not None and importlib.util.find_spec("pyarrow") is None:
+		parser.error("--parquet requires pyarrow (\"pip install pyarrow\")")
+	if options.batch is not None and (options.stream or options.targets is not None
+			or options.inputFilename is not None or options.diffState is not None
+			or options.outputFilename is not None or days is not None):
+		parser.error("--batch cannot be used with --input, -o, --target, --day, --stream, or --diff-state")
+	if options.targets is None:
+		targets = None
+	else:
+		if options.inputFilename is not None:
+			parser.error("--target and --input cannot be used together")
+		targets = [ARTECHOCK_TARGETS.get(target, target) for target in options.targets]
+	
+	profile = (options.profile or options.profileJSON is not None
+				or options.cprofileOutput is not None or options.traceOutput is not None)
+	if profile:
+		EnableProfiling(trace=(options.traceOutput is not None))
+	if options.cprofileOutput is not None:
+		import cProfile
+		profiler = cProfile.Profile()
+		profiler.enable()
+	t0 = time.perf_counter()
+	
+	if options.batch is not None:
+		inputFnames = GetBatchInputFiles(options.batch)
+		print("Processing {0} saved web pages ...".format(len(inputFnames)))
+		stats = ProcessFilmListingsBatch(inputFnames, options.outputDir, options.germanFilms,
+										options.jobs, options.force, options.sqliteFname,
+										options.parquetDir)
+		for inputFname, message in stats["errors"]:
+			print("Error processing \"{0}\": {1}".format(inputFname, message))
+		print("Processed {0} pages ({1} films) in {2:.2f} s: {3:.1f} pages/s, {4:.1f} films/s; "
+				"skipped {5} unchanged pages.".format(stats["pages"], stats["films"],
+				stats["seconds"], stats["pagesPerSecond"], stats["filmsPerSecond"],
+				stats["skipped"]))
+	else:
+		GetAndProcessFilmListings(input, outputFname, getGermanFilms=options.germanFilms,
+									days=days, cacheDir=cacheDir, cacheTTL=options.cacheTTL,
+									offline=options.offline, targets=targets,
+									jobs=options.jobs or 1, stream=options.stream,
+									diffState=options.diffState, diffOutput=options.diffOutput,
+									sqliteFname=options.sqliteFname, parquetDir=options.parquetDir,
+									mergeVariants=options.mergeVariants)
+	
+	if profile:
+		totalTime = time.perf_counter() - t0
+		if options.cprofileOutput is not None:
+			profiler.disable()
+			profiler.dump_stats(options.cprofileOutput)
+			print("Saved cProfile statistics in \"{0}\".".format(options.cprofileOutput))
+		print(GetProfileReport(totalTime))
+		if options.profileJSON is not None:
+			with open(options.profileJSON, 'w') as outf:
+				json.dump(GetProfileData(totalTime), outf, indent=1)
+		if options.traceOutput is not None:
+			WriteChromeTrace(options.traceOutput)
+			print("Saved Chrome trace in \"{0}\".".format(options.traceOutput))
 
 
 if __name__ == '__main__':
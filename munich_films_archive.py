@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Historical archive of weekly film schedules from munich_films.py.
+#
+# An archive is a directory containing:
+#    strings.txt              interned strings (film titles, theater names, and
+#                             language types), one per line; a string's ID is its
+#                             line number. Only ever appended to.
+#    index.json               list of archived weeks: [weekStart, scheduleDates,
+#                             partition filename, number of records], by date
+#    week_<weekStart>.bin     one partition per schedule week: a header (MAGIC +
+#                             number of records) followed by fixed-size records,
+#                             one per film + theater + showtime (see RECORD_FORMAT)
+#
+# Partitions are read via mmap, so queries only touch the weeks they need and
+# never load the whole archive.
+#
+# Examples:
+#    python3 munich_films_archive.py --archive=archive --import currentfilms_??.??.????-??.??.????.txt saved/*.html
+#    python3 munich_films_archive.py --archive=archive --film="Zootopia (Zoomania)" --theater=Atelier
+#    python3 munich_films_archive.py --archive=archive --list
+
+"""Week-partitioned archive of Munich film schedules"""
+
+from __future__ import print_function
+
+import sys, os, optparse, struct, mmap, json, re
+from collections import OrderedDict
+
+import munich_films
+
+
+MAGIC = b"MFA2"
+HEADER_FORMAT = "<4sI"   # magic, number of records
+# film ID, theater ID, language-type ID, flags (bit 0 = 3D), weekday mask
+# (bit d = day d, where 0 = Sunday), showtime in minutes after midnight
+RECORD_FORMAT = "<IIIBBH"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+# record formats of older partitions that can still be read ("MFA1" stored the
+# language-type ID in 16 bits, which overflows once the string table is large)
+RECORD_FORMATS = {MAGIC: RECORD_FORMAT, b"MFA1": "<IIHBBH"}
+FLAG_3D = 1
+
+findListingDates = re.compile(r"(\d\d\.\d\d\.\d{4}-\d\d\.\d\d\.\d{4})")
+
+
+class ScheduleArchive(object):
+	"""Week-partitioned store of film schedules in the directory archiveDir
+	(created if necessary).
+	"""
+
+	def __init__( self, archiveDir ):
+		self.archiveDir = archiveDir
+		os.makedirs(archiveDir, exist_ok=True)
+		self.stringsFname = os.path.join(archiveDir, "strings.txt")
+		self.indexFname = os.path.join(archiveDir, "index.json")
+		self.strings = []
+		if os.path.exists(self.stringsFname):
+			with open(self.stringsFname, encoding="utf-8") as f:
+				self.strings = f.read().split("\n")[:-1]
+		self.stringIDs = {s: i for (i, s) in enumerate(self.strings)}
+		self.weeks = OrderedDict()   # weekStart --> [scheduleDates, filename, nRecords]
+		if os.path.exists(self.indexFname):
+			with open(self.indexFname, encoding="utf-8") as f:
+				for weekStart, scheduleDates, fname, nRecords in json.load(f):
+					self.weeks[weekStart] = [scheduleDates, fname, nRecords]
+		self.maps = {}   # weekStart --> (mmap of partition, record format)
+
+	def Close( self ):
+		for m, recordFormat in self.maps.values():
+			CloseMap(m)
+		self.maps.clear()
+
+	def __enter__( self ):
+		return self
+
+	def __exit__( self, excType, excValue, tb ):
+		self.Close()
+
+	def InternStrings( self, newStrings ):
+		"""Returns a list of the IDs of the strings in newStrings, adding any new
+		ones to the string table.
+		"""
+		# check everything before touching the string table, so that a bad
+		# string doesn't leave IDs in memory that never reach strings.txt
+		for s in newStrings:
+			if s not in self.stringIDs and "\n" in s:
+				raise ValueError("Archived strings can't contain newlines: {0!r}".format(s))
+		added = OrderedDict()   # new string --> ID
+		ids = []
+		nStrings = len(self.strings)
+		for s in newStrings:
+			i = self.stringIDs.get(s)
+			if i is None:
+				i = added.get(s)
+				if i is None:
+					i = added[s] = nStrings + len(added)
+			ids.append(i)
+		if len(added) > 0:
+			with open(self.stringsFname, 'a', encoding="utf-8") as outf:
+				outf.write("".join(s + "\n" for s in added))
+			self.strings.extend(added)
+			self.stringIDs.update(added)
+		return ids
+
+	def AddWeek( self, filmTitles, filmTextDict, scheduleDates ):
+		"""Archives one week's schedule (as returned by ParseFilmListings),
+		replacing any previously archived schedule for the same week. Returns the
+		start date of the week.
+		"""
+		weekDates = munich_films.GetWeekDates(scheduleDates)
+		if weekDates is None:
+			raise ValueError("Can't archive schedule without valid dates ({0!r})".format(scheduleDates))
+		weekStart = min(weekDates)
+		# (theater names already in the archive help to split plain-text
+		# listings whose theater names contain ": ")
+		films = munich_films.FilmsFromTextDict(filmTitles, filmTextDict, self.stringIDs)
+		strings = []
+		for film in films:
+			strings.append(film.title)
+			strings.append(film.langType)
+			strings.extend(screening.theater for screening in film.screenings)
+		ids = iter(self.InternStrings(strings))
+		data = bytearray()
+		nRecords = 0
+		for film in films:
+			filmID = next(ids)
+			langID = next(ids)
+			flags = FLAG_3D if film.is3D else 0
+			for screening in film.screenings:
+				data += struct.pack(RECORD_FORMAT, filmID, next(ids), langID, flags,
+									screening.dayMask, screening.minutes)
+				nRecords += 1
+
+		fname = "week_{0}.bin".format(weekStart)
+		if weekStart in self.maps:
+			CloseMap(self.maps.pop(weekStart)[0])
+		tempFname = os.path.join(self.archiveDir, fname + ".tmp")
+		with open(tempFname, 'wb') as outf:
+			outf.write(struct.pack(HEADER_FORMAT, MAGIC, nRecords))
+			outf.write(data)
+		os.replace(tempFname, os.path.join(self.archiveDir, fname))
+		self.weeks[weekStart] = [scheduleDates, fname, nRecords]
+		self.weeks = OrderedDict(sorted(self.weeks.items()))
+		munich_films.WriteFileAtomically(self.indexFname,
+				json.dumps([[w] + entry for (w, entry) in self.weeks.items()]))
+		return weekStart
+
+	def GetWeeks( self ):
+		"""Returns a list of (weekStart, scheduleDates) tuples for the archived weeks.
+		"""
+		return [(weekStart, entry[0]) for (weekStart, entry) in self.weeks.items()]
+
+	def GetPartition( self, weekStart ):
+		"""Returns (memoryview of the records, record format) for the week
+		starting on weekStart.
+		"""
+		entry = self.maps.get(weekStart)
+		if entry is None:
+			fname = os.path.join(self.archiveDir, self.weeks[weekStart][1])
+			with open(fname, 'rb') as f:
+				m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+			magic, nRecords = struct.unpack_from(HEADER_FORMAT, m)
+			recordFormat = RECORD_FORMATS.get(magic)
+			if recordFormat is None or len(m) != HEADER_SIZE + nRecords*struct.calcsize(recordFormat):
+				m.close()
+				raise ValueError("Corrupted archive partition: {0}".format(fname))
+			entry = self.maps[weekStart] = (m, recordFormat)
+		m, recordFormat = entry
+		return memoryview(m)[HEADER_SIZE:], recordFormat
+
+	def IterRecords( self, weekStart ):
+		"""Yields (filmID, theaterID, langID, flags, dayMask, minutes) tuples for
+		the week starting on weekStart.
+		"""
+		records, recordFormat = self.GetPartition(weekStart)
+		return struct.iter_unpack(recordFormat, records)
+
+	def IterScreenings( self, firstWeek=None, lastWeek=None ):
+		"""Yields (weekStart, film title, langType, is3D, theater, dayMask, minutes)
+		tuples for the archived weeks (optionally only those with weekStart
+		between firstWeek and lastWeek, inclusive).
+		"""
+		strings = self.strings
+		for weekStart in self.weeks:
+			if (firstWeek is not None and weekStart < firstWeek) or \
+					(lastWeek is not None and weekStart > lastWeek):
+				continue
+			for filmID, theaterID, langID, flags, dayMask, minutes in self.IterRecords(weekStart):
+				yield (weekStart, strings[filmID], strings[langID], bool(flags & FLAG_3D),
+						strings[theaterID], dayMask, minutes)
+
+	def GetWeeksShown( self, film, theater=None ):
+		"""Returns a list of the start dates of the weeks in which the film (plain
+		title, without language type) was shown (optionally, only counting
+		screenings at theater).
+		"""
+		filmID = self.stringIDs.get(film)
+		theaterID = None if theater is None else self.stringIDs.get(theater)
+		if filmID is None or (theater is not None and theaterID is None):
+			return []
+		weeks = []
+		for weekStart in self.weeks:
+			for record in self.IterRecords(weekStart):
+				if record[0] == filmID and (theaterID is None or record[1] == theaterID):
+					weeks.append(weekStart)
+					break
+		return weeks
+
+	def GetTheaterWeeks( self, film ):
+		"""Returns an OrderedDict mapping theater names to the numbers of weeks in
+		which the film (plain title) was shown there.
+		"""
+		filmID = self.stringIDs.get(film)
+		counts = OrderedDict()
+		if filmID is None:
+			return counts
+		for weekStart in self.weeks:
+			theaterIDs = set(record[1] for record in self.IterRecords(weekStart)
+							if record[0] == filmID)
+			for theaterID in sorted(theaterIDs):
+				theater = self.strings[theaterID]
+				counts[theater] = counts.get(theater, 0) + 1
+		return counts
+
+
+def CloseMap( m ):
+	"""Closes the mmap m, unless memoryviews of it (from GetPartition or a live
+	IterRecords iterator) are still in use; it's then left for the garbage
+	collector to close once they're gone.
+	"""
+	try:
+		m.close()
+	except BufferError:
+		pass
+
+
+def ReadFilmListingFile( fname ):
+	"""Reads a text listing saved by munich_films.py (see WriteFilmEntry) and
+	returns (filmTitles, filmTextDict, scheduleDates), with the schedule dates
+	taken from the filename ("currentfilms_<start_date>-<end_date>.txt"), or
+	None if it doesn't contain them. Raises ValueError for listings which
+	don't have the whole week's schedule per film: single-day listings (from
+	--day, "currentfilms_<dates>_Sun.txt") and merged-variant listings (from
+	--merge-variants, with titles lacking the "[OF]" etc. language type).
+	"""
+	m = findListingDates.search(os.path.basename(fname))
+	if m is not None and os.path.basename(fname)[m.end():].startswith("_"):
+		raise ValueError("Single-day listings can't be archived")
+	filmTitles = []
+	filmTextDict = {}
+	title = None
+	with open(fname, encoding="utf-8") as f:
+		for line in f:
+			line = line.rstrip("\n")
+			if line.startswith("\t"):
+				filmTextDict[title].append(line[1:])
+			elif line.endswith(":"):
+				title = line[:-1]
+				if munich_films.findDisplayTitle.match(title) is None:
+					raise ValueError("Film title without language type (merged-variant listing?): "
+									"{0!r}".format(title))
+				filmTitles.append(title)
+				filmTextDict[title] = []
+	return filmTitles, filmTextDict, None if m is None else m.group(1)
+
+def ImportFile( archive, fname, getGermanFilms=True ):
+	"""Adds the schedule in a text listing saved by munich_films.py or a saved
+	artechock.de web page (files ending in .htm or .html) to archive. Returns
+	the start date of the week.
+	"""
+	if fname.endswith((".htm", ".html")):
+		with open(fname) as f:
+			results = munich_films.ParseFilmListings(f.read(), getGermanFilms)
+	else:
+		results = ReadFilmListingFile(fname)
+	return archive.AddWeek(*results)
+
+
+
+def main(argv=None):
+
+	usageString = "%prog --archive=DIR [options] [files to import ...]\n"
+	parser = optparse.OptionParser(usage=usageString, version="%prog ")
+
+	parser.add_option("--archive", type="str", dest="archiveDir", default=None,
+					  help="archive directory (required)")
+	parser.add_option("--import", action="store_true", dest="doImport", default=False,
+					  help="import text listings (currentfilms_<dates>.txt) and/or saved web pages (.html) given as arguments")
+	parser.add_option("--list", action="store_true", dest="listWeeks", default=False,
+					  help="list archived weeks")
+	parser.add_option("--film", type="str", dest="film", default=None,
+					  help="show the weeks in which this film was shown")
+	parser.add_option("--theater", type="str", dest="theater", default=None,
+					  help="with --film: only count screenings at this theater")
+
+	(options, args) = parser.parse_args(argv)
+	# args[0] = name program was called with
+	if options.archiveDir is None:
+		parser.error("--archive is required")
+
+	with ScheduleArchive(options.archiveDir) as archive:
+		if options.doImport:
+			for fname in args[1:]:
+				try:
+					weekStart = ImportFile(archive, fname)
+				except (ValueError, OSError) as e:
+					print("Skipping \"{0}\": {1}".format(fname, e))
+					continue
+				print("Imported \"{0}\" (week of {1}).".format(fname, weekStart))
+		if options.listWeeks:
+			for weekStart, scheduleDates in archive.GetWeeks():
+				print("{0}\t{1}".format(weekStart, scheduleDates))
+		if options.film is not None:
+			if options.theater is None:
+				for theater, nWeeks in archive.GetTheaterWeeks(options.film).items():
+					print("{0}: {1} week(s)".format(theater, nWeeks))
+			weeks = archive.GetWeeksShown(options.film, options.theater)
+			print("{0} week(s): {1}".format(len(weeks), ", ".join(weeks)))
+
+
+if __name__ == '__main__':
+
+	main(sys.argv)
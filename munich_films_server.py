@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Resident server mode for munich_films.py: keeps the latest parsed film schedule
+# in memory, re-checks the artechock.de page in the background, and serves the
+# listings as JSON over HTTP (with keep-alive), using asyncio.
+#
+# Endpoints:
+#    /films                      all films, with theaters and showtimes
+#    /films?day=Sun              films showing on one day (day names as in
+#                                munich_films.DAY_NAMES; optionally also
+#                                &after=20:00, &before=20:00, &theater=NAME)
+#    /theaters                   list of theater names
+#    /theaters/<name>            films (with showtimes) at one theater
+#    /status                     schedule dates, time of last check, etc.
+#
+# Example:
+#    python3 munich_films_server.py --port=8080 --refresh=900
+
+"""HTTP/JSON server for the Munich film listings"""
+
+from __future__ import print_function
+
+import sys, optparse, asyncio, json, time, hashlib
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import munich_films
+
+
+DEFAULT_PORT = 8080
+DEFAULT_REFRESH_INTERVAL = 15*60   # seconds between checks of the web page
+MAX_HEADER_BYTES = 16384
+MAX_CACHED_RESPONSES = 256   # per Schedule
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+				503: "Service Unavailable"}
+
+
+class Schedule(object):
+	"""Immutable snapshot of one version of the film schedule, with indexes for
+	the server's queries. A new Schedule is built for each new version of the
+	web page and swapped in as a whole, so requests always see a consistent
+	schedule.
+	"""
+	__slots__ = ("filmTitles", "filmTextDict", "scheduleDates", "fingerprint", "loaded",
+				"dayIndex", "theaterIndex", "responseCache")
+
+	def __init__( self, filmTitles, filmTextDict, scheduleDates, fingerprint ):
+		self.filmTitles = filmTitles
+		self.filmTextDict = filmTextDict
+		self.scheduleDates = scheduleDates
+		self.fingerprint = fingerprint
+		self.loaded = time.time()
+		self.dayIndex = munich_films.MakeDayIndex(filmTextDict, filmTitles)
+		# theater name --> OrderedDict of film title --> showtimes string
+		self.theaterIndex = OrderedDict()
+		for title in filmTitles:
+			for theaterTimesString in filmTextDict[title]:
+				theaterName, timesString = munich_films.SplitTheaterTimes(theaterTimesString)
+				self.theaterIndex.setdefault(theaterName, OrderedDict())[title] = timesString.strip()
+		# request target --> encoded JSON response (repeated queries are
+		# answered from here)
+		self.responseCache = {}
+
+
+def FilmsJSON( schedule ):
+	films = []
+	for title in schedule.filmTitles:
+		theaters = []
+		for theaterTimesString in schedule.filmTextDict[title]:
+			theaterName, timesString = munich_films.SplitTheaterTimes(theaterTimesString)
+			theaters.append({"theater": theaterName, "showtimes": timesString.strip()})
+		films.append({"title": title, "theaters": theaters})
+	return {"scheduleDates": schedule.scheduleDates, "films": films}
+
+def DayListingsJSON( schedule, day, theater=None, after=None, before=None ):
+	listings = munich_films.GetListingsForDay(schedule.dayIndex, day, theater, after, before)
+	films = []
+	for title, theaterTimes in listings.items():
+		theaters = [{"theater": theaterName,
+					"times": [munich_films.MinutesToShowtime(t) for t in times]}
+					for theaterName, times in theaterTimes]
+		films.append({"title": title, "theaters": theaters})
+	return {"scheduleDates": schedule.scheduleDates, "day": day, "films": films}
+
+def TheaterJSON( schedule, theaterName ):
+	films = [{"title": title, "showtimes": timesString}
+			for title, timesString in schedule.theaterIndex[theaterName].items()]
+	return {"scheduleDates": schedule.scheduleDates, "theater": theaterName, "films": films}
+
+
+class ScheduleServer(object):
+	"""Keeps the current Schedule for the web page at url and answers HTTP
+	requests for it.
+
+	cacheDir is used by munich_films.FetchPageText, so that each background
+	check is a conditional request (the page is only downloaded and re-parsed
+	when the server reports that it has changed).
+	"""
+
+	def __init__( self, url=munich_films.artechockURL, getGermanFilms=False,
+					cacheDir=munich_films.DEFAULT_CACHE_DIR,
+					refreshInterval=DEFAULT_REFRESH_INTERVAL ):
+		self.url = url
+		self.getGermanFilms = getGermanFilms
+		self.cacheDir = cacheDir
+		self.refreshInterval = refreshInterval
+		self.schedule = None
+		self.lastCheck = None
+		self.lastError = None
+		self.nUpdates = 0
+
+	def Refresh( self ):
+		"""Checks the web page and, if it has changed, parses it and swaps in the
+		new Schedule. Returns True if the schedule was updated. (This blocks, so
+		the server runs it in a worker thread.)
+		"""
+		pageText = munich_films.FetchPageText(self.url, self.cacheDir, ttl=0)
+		self.lastCheck = time.time()
+		fingerprint = hashlib.sha1(pageText.encode("utf-8")).hexdigest()
+		if self.schedule is not None and fingerprint == self.schedule.fingerprint:
+			return False
+		filmTitles, filmTextDict, scheduleDates = munich_films.ParseFilmListings(pageText,
+															self.getGermanFilms, self.cacheDir)
+		# replacing the reference is atomic; requests in progress keep using
+		# the old Schedule
+		self.schedule = Schedule(filmTitles, filmTextDict, scheduleDates, fingerprint)
+		self.nUpdates += 1
+		return True
+
+	async def RefreshLoop( self ):
+		"""Calls Refresh (in a worker thread) every refreshInterval seconds.
+		"""
+		loop = asyncio.get_running_loop()
+		while True:
+			await asyncio.sleep(self.refreshInterval)
+			try:
+				await loop.run_in_executor(None, self.Refresh)
+				self.lastError = None
+			except Exception as err:
+				# keep serving the previous schedule
+				self.lastError = "{0}: {1}".format(type(err).__name__, err)
+
+	def HandleRequest( self, method, target ):
+		"""Returns a tuple of (status code, JSON-encoded body) for an HTTP request.
+		"""
+		if method not in ("GET", "HEAD"):
+			return 405, self.Encode({"error": "only GET is supported"})
+		schedule = self.schedule
+		urlParts = urlsplit(target)
+		path = urlParts.path.rstrip("/") or "/"
+		if path == "/status":
+			return 200, self.Encode(self.GetStatus())
+		if schedule is None:
+			return 503, self.Encode({"error": "schedule not loaded yet"})
+		cached = schedule.responseCache.get(target)
+		if cached is not None:
+			return 200, cached
+
+		query = parse_qs(urlParts.query)
+		if path == "/films":
+			if "day" not in query:
+				result = FilmsJSON(schedule)
+			else:
+				args = {}
+				for name in ["theater", "after", "before"]:
+					if name in query:
+						args[name] = query[name][0]
+				try:
+					result = DayListingsJSON(schedule, query["day"][0], **args)
+				except (ValueError, KeyError, IndexError):
+					return 400, self.Encode({"error": "bad day or time in query"})
+		elif path == "/theaters":
+			result = {"scheduleDates": schedule.scheduleDates,
+						"theaters": list(schedule.theaterIndex.keys())}
+		elif path.startswith("/theaters/"):
+			theaterName = unquote(path[len("/theaters/"):])
+			if theaterName not in schedule.theaterIndex:
+				return 404, self.Encode({"error": "unknown theater"})
+			result = TheaterJSON(schedule, theaterName)
+		else:
+			return 404, self.Encode({"error": "unknown path"})
+		body = self.Encode(result)
+		if len(schedule.responseCache) < MAX_CACHED_RESPONSES:
+			schedule.responseCache[target] = body
+		return 200, body
+
+	def GetStatus( self ):
+		schedule = self.schedule
+		return {"url": self.url,
+				"scheduleDates": None if schedule is None else schedule.scheduleDates,
+				"films": 0 if schedule is None else len(schedule.filmTitles),
+				"loaded": None if schedule is None else schedule.loaded,
+				"lastCheck": self.lastCheck, "lastError": self.lastError,
+				"updates": self.nUpdates, "fetch": munich_films.fetchMetrics.GetSummary()}
+
+	def Encode( self, result ):
+		return json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+	def WriteResponse( self, writer, method, status, body, keepAlive ):
+		responseHeaders = ["HTTP/1.1 %d %s" % (status, STATUS_TEXT[status]),
+						"Content-Type: application/json; charset=utf-8",
+						"Content-Length: %d" % len(body),
+						"Connection: %s" % ("keep-alive" if keepAlive else "close")]
+		writer.write(("\r\n".join(responseHeaders) + "\r\n\r\n").encode("latin-1"))
+		if method != "HEAD":
+			writer.write(body)
+
+	async def HandleConnection( self, reader, writer ):
+		"""Reads HTTP/1.x requests from one client connection and answers them,
+		keeping the connection open unless the client asks otherwise.
+		"""
+		try:
+			while True:
+				try:
+					header = await reader.readuntil(b"\r\n\r\n")
+				except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+					break
+				lines = header.decode("latin-1").split("\r\n")
+				try:
+					method, target, version = lines[0].split()
+				except ValueError:
+					break
+				headers = {}
+				for line in lines[1:]:
+					if ":" in line:
+						name, value = line.split(":", 1)
+						headers[name.strip().lower()] = value.strip()
+				# (request bodies aren't used, but must be skipped for keep-alive)
+				try:
+					contentLength = int(headers.get("content-length", 0))
+				except ValueError:
+					contentLength = -1
+				if contentLength < 0:
+					self.WriteResponse(writer, method, 400,
+									self.Encode({"error": "bad Content-Length header"}), False)
+					await writer.drain()
+					break
+				if contentLength > 0:
+					try:
+						await reader.readexactly(contentLength)
+					except asyncio.IncompleteReadError:
+						# (client closed the connection in the middle of the body)
+						break
+				connection = headers.get("connection", "").lower()
+				keepAlive = (connection != "close") if version == "HTTP/1.1" else (connection == "keep-alive")
+
+				status, body = self.HandleRequest(method, target)
+				self.WriteResponse(writer, method, status, body, keepAlive)
+				await writer.drain()
+				if not keepAlive:
+					break
+		except ConnectionError:
+			pass
+		finally:
+			writer.close()
+
+	async def Serve( self, host="127.0.0.1", port=DEFAULT_PORT, started=None ):
+		"""Loads the schedule, then serves requests (and refreshes the schedule in
+		the background) until cancelled. If started is a threading.Event or
+		similar, it's set (with self.port = the actual port) once the server is
+		accepting connections.
+		"""
+		loop = asyncio.get_running_loop()
+		try:
+			await loop.run_in_executor(None, self.Refresh)
+		except Exception as err:
+			# serve 503s until a later refresh succeeds
+			self.lastError = "{0}: {1}".format(type(err).__name__, err)
+		server = await asyncio.start_server(self.HandleConnection, host, port,
+											limit=MAX_HEADER_BYTES)
+		self.port = server.sockets[0].getsockname()[1]
+		refreshTask = asyncio.ensure_future(self.RefreshLoop())
+		if started is not None:
+			started.set()
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			refreshTask.cancel()
+
+
+
+def main(argv=None):
+
+	usageString = "%prog [options]\n"
+	parser = optparse.OptionParser(usage=usageString, version="%prog ")
+
+	parser.add_option("--host", type="str", dest="host", default="127.0.0.1",
+					  help="address to listen on [default = %default]")
+	parser.add_option("--port", type="int", dest="port", default=DEFAULT_PORT,
+					  help="port to listen on [default = %default]")
+	parser.add_option("--url", type="str", dest="url", default=munich_films.artechockURL,
+					  help="web page with the film listings [default = %default]")
+	parser.add_option("--refresh", type="float", dest="refreshInterval",
+					  default=DEFAULT_REFRESH_INTERVAL,
+					  help="seconds between checks of the web page [default = %default]")
+	parser.add_option("--german-films", action="store_true", dest="germanFilms", default=False,
+					  help="include German-language films")
+	parser.add_option("--cache-dir", type="str", dest="cacheDir",
+					  default=munich_films.DEFAULT_CACHE_DIR,
+					  help="directory for cached copies of the web page [default = %default]")
+	parser.add_option("--parser", type="choice", dest="parserName", default="auto",
+					  choices=["auto"] + munich_films.PARSER_PREFERENCE,
+					  help="HTML parser to use [default = fastest installed]")
+
+	(options, args) = parser.parse_args(argv)
+	try:
+		munich_films.SetParser(options.parserName)
+	except ValueError as err:
+		parser.error(str(err))
+
+	server = ScheduleServer(options.url, options.germanFilms, options.cacheDir,
+							options.refreshInterval)
+	print("Serving film listings on http://{0}:{1}/films ...".format(options.host, options.port))
+	try:
+		asyncio.run(server.Serve(options.host, options.port))
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == '__main__':
+
+	main(sys.argv)
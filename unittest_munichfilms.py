@@ -4,11 +4,16 @@
 
 """Unit test for munich_films.py"""
 
-import os, time
+import os, time, shutil, tempfile, threading, pickle, json, asyncio, sqlite3, struct, socket
+import importlib.util, io, contextlib
+import http.client
 import unittest
-import requests
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 from bs4 import BeautifulSoup
 import munich_films   # module to be tested
+import benchmark_munichfilms   # for synthetic test pages
+import munich_films_server
+import munich_films_archive
 
 # prepare input and reference data
 testTextVersion = "artechok_originalton.html"
@@ -44,6 +49,32 @@ dailyText12 = "daily except Sat/Sun 15:15; Sat/Sun 13:00"
 correctDaily12 = ["13:00"] + ["15:15"]*5 + ["13:00"]
 
 
+# examples of (German) theater time listings, from the header of munich_films.py
+germanShowtimes = [
+	('tgl. 17:15', [["17:15"]]*7),
+	('tgl. 20:50 (Mi. 21:15)', [["20:50"]]*3 + [["21:15"]] + [["20:50"]]*3),
+	('tgl. 15:00, 17:45, 20:30 (außer Mo.)',
+		[["15:00", "17:45", "20:30"], ["15:00", "17:45"]] + [["15:00", "17:45", "20:30"]]*5),
+	('tgl. außer Di. 22:55\n    \n     (\n     \n      artechock-Kritik\n     \n     )',
+		[["22:55"]]*2 + [[]] + [["22:55"]]*4),
+	('tgl. außer Mi. 17:20; So. auch 12:10; Mi. 17:00',
+		[["12:10", "17:20"], ["17:20"], ["17:20"], ["17:00"], ["17:20"], ["17:20"], ["17:20"]]),
+	('tgl. 16:20, 20:50 (außer Mo./Mi.); Fr./Sa. auch 23:00\n  ...',
+		[["16:20", "20:50"], ["16:20"], ["16:20", "20:50"], ["16:20"], ["16:20", "20:50"],
+		["16:20", "20:50", "23:00"], ["16:20", "20:50", "23:00"]]),
+	('tgl. 19:00 (So. 19:30)', [["19:30"]] + [["19:00"]]*6),
+	('Mo. 20:00', [[], ["20:00"], [], [], [], [], []]),
+	('Sa./So. 20:00', [["20:00"], [], [], [], [], [], ["20:00"]]),
+	('Fr.-So. 14:30', [["14:30"], [], [], [], [], ["14:30"], ["14:30"]]),
+	('Fr./Mo./Mi. 21:00\n  ...', [[], ["21:00"], [], ["21:00"], [], ["21:00"], []]),
+	('So. 11:00', [["11:00"], [], [], [], [], [], []]),
+	('So. 11:00 (mit Pause)', [["11:00"], [], [], [], [], [], []]),
+	('Do. 19:30; So. 16:00', [["16:00"], [], [], [], ["19:30"], [], []]),
+	('So. 21:00; Mi. 18:30 (+Vorfilm »Drei Minuten in einem Film von Ozu«)',
+		[["21:00"], [], [], ["18:30"], [], [], []])
+]
+
+
 # possible output from munich_films.munich_films.MakeFilmTextDict
 title1 = 'Le amiche (Die Freundinnen) [OmeU]'
 timesList1 = ['Werkstattkino: M 20:00']
@@ -81,10 +112,10 @@ dayAndTimes10 = [["Museum Lichtspiele: 16:40, 19:50, 22:50"],
 	["Cinema: 12:35","Museum Lichtspiele: 16:40, 19:50, 22:50"]]
 
 title11 = 'Captain America: Civil War (The First Avenger: Civil War) (3D) [OF]'
-timesList11 = ['Cinema: Th/Sun 15:30, 18:45; Fr. 16:15, 19:30, 22:45; Sat 9:45, 15:45, 21:45; Sun also 22:00; M 18:30, 21:45; Tu 16:00, 19:00, 22:15; W 19:15, 22:30',
+timesList11 = ['Cinema: Th/Sun 15:30, 18:45; F 16:15, 19:30, 22:45; Sat 9:45, 15:45, 21:45; Sun also 22:00; M 18:30, 21:45; Tu 16:00, 19:00, 22:15; W 19:15, 22:30',
  'Gloria: Sun 21:00',
- 'Mathäser: Th/Sun/Tu/W 20:00; Fr./Sat 23:00; W also 22:45']
-dayAndTimes11 = [["Cinema: 15:30, 22:00", "Gloria: 21:00", "Mathäser: 20:00"], 
+ 'Mathäser: Th/Sun/Tu/W 20:00; F/Sat 23:00; W also 22:45']
+dayAndTimes11 = [["Cinema: 15:30, 18:45, 22:00", "Gloria: 21:00", "Mathäser: 20:00"], 
 	["Cinema: 18:30, 21:45"], ["Cinema: 16:00, 19:00, 22:15", "Mathäser: 20:00"], 
 	["Cinema: 19:15, 22:30", "Mathäser: 20:00, 22:45"], 
 	["Cinema: 15:30, 18:45", "Mathäser: 20:00"], 
@@ -93,6 +124,122 @@ dayAndTimes11 = [["Cinema: 15:30, 22:00", "Gloria: 21:00", "Mathäser: 20:00"],
 
 
 
+# local stand-in for the artechock.de web server: serves the saved web page,
+# with an ETag and Last-Modified header, and honors conditional requests
+STAND_IN_ETAG = '"artechock-test-1"'
+STAND_IN_LAST_MODIFIED = "Thu, 28 Apr 2016 06:00:00 GMT"
+
+class StandInHandler(BaseHTTPRequestHandler):
+	pageText = ""
+	requestLog = []   # list of (path, response status code)
+
+	def do_GET(self):
+		if self.headers.get("If-None-Match") == STAND_IN_ETAG:
+			self.requestLog.append((self.path, 304))
+			self.send_response(304)
+			self.end_headers()
+			return
+		body = self.pageText.encode("utf-8")
+		self.requestLog.append((self.path, 200))
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.send_header("ETag", STAND_IN_ETAG)
+		self.send_header("Last-Modified", STAND_IN_LAST_MODIFIED)
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+# multi-page stand-in: any path serves the saved web page (after a short delay,
+# to let concurrent requests overlap), except that paths starting with
+# "/flaky" fail with 503 on the first request
+class MultiPageHandler(BaseHTTPRequestHandler):
+	pageText = ""
+	lock = threading.Lock()
+	inFlight = 0
+	maxInFlight = 0
+	requestLog = []
+
+	def do_GET(self):
+		cls = MultiPageHandler
+		with cls.lock:
+			cls.inFlight += 1
+			cls.maxInFlight = max(cls.maxInFlight, cls.inFlight)
+			firstTime = self.path not in [path for (path, status) in cls.requestLog]
+			status = 503 if (self.path.startswith("/flaky") and firstTime) else 200
+			cls.requestLog.append((self.path, status))
+		time.sleep(0.05)
+		with cls.lock:
+			cls.inFlight -= 1
+		if status != 200:
+			self.send_error(status)
+			return
+		body = self.pageText.encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+# fault-injecting stand-in: "/slow..." paths respond after a delay, "/error..."
+# paths always fail with 503, "/truncated..." paths close the connection halfway
+# through the body, "/flapping..." paths fail with 503 while failuresLeft > 0;
+# other paths serve the saved web page (unless failAll = True)
+class FaultyHandler(BaseHTTPRequestHandler):
+	pageText = ""
+	delay = 1.0
+	failuresLeft = 0
+	failAll = False
+	requestLog = []
+
+	def do_GET(self):
+		cls = FaultyHandler
+		cls.requestLog.append(self.path)
+		body = self.pageText.encode("utf-8")
+		try:
+			if self.path.startswith("/slow"):
+				time.sleep(cls.delay)
+			if cls.failAll or self.path.startswith("/error") or \
+					(self.path.startswith("/flapping") and cls.failuresLeft > 0):
+				cls.failuresLeft -= 1
+				self.send_error(503)
+				return
+			if self.path.startswith("/missing"):
+				self.send_error(404)
+				return
+			self.send_response(200)
+			self.send_header("Content-Type", "text/html; charset=utf-8")
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			if self.path.startswith("/truncated"):
+				self.wfile.write(body[:len(body)//2])
+				self.wfile.flush()
+				self.close_connection = True
+				return
+			self.wfile.write(body)
+		except (BrokenPipeError, ConnectionResetError):
+			# client gave up (timeout)
+			pass
+
+	def log_message(self, format, *args):
+		pass
+
+def StartStandInServer( handlerClass, serverClass=HTTPServer ):
+	"""Starts a local HTTP server in a background thread; returns the server
+	and its base URL."""
+	server = serverClass(("127.0.0.1", 0), handlerClass)
+	thread = threading.Thread(target=server.serve_forever)
+	thread.daemon = True
+	thread.start()
+	return server, "http://127.0.0.1:%d" % server.server_address[1]
+
+
+
 # tests for a single function
 
 class munich_filmsCheck(unittest.TestCase):
@@ -186,63 +333,1187 @@ class munich_filmsCheck(unittest.TestCase):
 		self.assertEqual(correct, result)
 	
 	
+	def testExtractDailyTimes10(self):
+		input = dailyText10
+		correct = correctDaily10
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.ExtractDailyTimes(input, inputDay))
+		self.assertEqual(correct, result)
+
+	def testExtractDailyTimes11(self):
+		input = dailyText11
+		correct = correctDaily11
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.ExtractDailyTimes(input, inputDay))
+		self.assertEqual(correct, result)
+
+	def testExtractDailyTimes12(self):
+		input = dailyText12
+		correct = correctDaily12
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.ExtractDailyTimes(input, inputDay))
+		self.assertEqual(correct, result)
+	
+	def testParseShowtimes(self):
+		for input, correct in germanShowtimes:
+			correctMinutes = tuple(tuple(munich_films.ShowtimeToMinutes(t) for t in times)
+									for times in correct)
+			result = munich_films.ParseShowtimes(input)
+			self.assertEqual(correctMinutes, result, msg=input)
+		
+		self.assertEqual(1230, munich_films.ShowtimeToMinutes("20:30"))
+		self.assertEqual("9:45", munich_films.MinutesToShowtime(585))
+	
+	
+	def testDayIndex(self):
+		titles = [title1, title2, title3, title4, title5, title10, title11]
+		filmTextDict = {title1: timesList1, title2: timesList2, title3: timesList3,
+						title4: timesList4, title5: timesList5, title10: timesList10,
+						title11: timesList11}
+		allDayAndTimes = [dayAndTimes1, dayAndTimes2, dayAndTimes3, dayAndTimes4,
+						dayAndTimes5, dayAndTimes10, dayAndTimes11]
+		dayIndex = munich_films.MakeDayIndex(filmTextDict, titles)
+		for d, day in enumerate(["Sun", "M", "Tu", "W", "Th", "F", "Sat"]):
+			listings = munich_films.GetListingsForDay(dayIndex, day)
+			for title, dayAndTimes in zip(titles, allDayAndTimes):
+				correct = dayAndTimes[d]
+				result = ["%s: %s" % (theater, ", ".join(munich_films.MinutesToShowtime(t) for t in times))
+							for theater, times in listings.get(title, [])]
+				self.assertEqual(correct, result, msg="%s, %s" % (title, day))
+		
+		# "what's on at Cinemaxx on Sunday"
+		listings = munich_films.GetListingsForDay(dayIndex, "Sun", theater="Cinemaxx")
+		self.assertEqual([(title3, [("Cinemaxx", (960,))])], list(listings.items()))
+		# "what starts after 20:00 on Friday"
+		listings = munich_films.GetListingsForDay(dayIndex, "F", after="20:00")
+		correct = [(title5, [("Museum Lichtspiele", (1375,))]),
+					(title10, [("Museum Lichtspiele", (1370,))]),
+					(title11, [("Cinema", (1365,)), ("Mathäser", (1380,))])]
+		self.assertEqual(correct, list(listings.items()))
+		
+	def testGetDayListingFilename(self):
+		self.assertEqual("currentfilms_Sun.txt", munich_films.GetDayListingFilename("currentfilms.txt", "Sun"))
+		self.assertEqual("out_M", munich_films.GetDayListingFilename("out", "M"))
+	
+	
 	def testTranslateTimesSimple(self):
 		input = ('Werkstattkino', 'Sa. 18:00 (\n   \n    Nacht\xadschatten\n   \n   – Fetisch Film Festival)')
 		correct = "Sat 18:00"
 		result = munich_films.TranslateTimesSimple(input)
 		self.assertEqual(correct, result)
 		
-# 	def testGetTimesForOneDay(self):
-# 		# setup: create input and reference
-# 		input = timesList1
-# 		correct = dayAndTimes1
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
-# 		input = timesList2
-# 		correct = dayAndTimes2
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
-# 		input = timesList3
-# 		correct = dayAndTimes3
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
-# 		input = timesList4
-# 		correct = dayAndTimes4
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
-# 		input = timesList5
-# 		correct = dayAndTimes5
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
-# 		input = timesList10
-# 		correct = dayAndTimes10
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
-# 		input = timesList11
-# 		correct = dayAndTimes11
-# 		result = []
-# 		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
-# 			result.append(munich_films.GetTimesForOneDay(input, inputDay))
-# 		self.assertEqual(correct, result)
-# 
+	def testTranslateAllDays(self):
+		german = "Do./Fr. 20:00; Sa.-So. 14:30; Mo. auch 18:00; tgl. außer Di./Mi. 22:15"
+		correct = {"en": "Th/F 20:00; Sat-Sun 14:30; M also 18:00; daily except Tu/W 22:15",
+					"de": german,
+					"iso": "TH/FR 20:00; SA-SU 14:30; MO also 18:00; daily except TU/WE 22:15"}
+		self.assertEqual(["So.", "Mo.", "Di.", "Mi.", "Do.", "Fr.", "Sa."], munich_films.TAGEN)
+		try:
+			for locale, translation in correct.items():
+				self.assertEqual(locale, munich_films.SetLocale(locale))
+				self.assertEqual(translation, munich_films.TranslateTimesSimple(("Atelier", german)))
+				# each day translates to a day name that the showtime grammar reads
+				for d, tag in enumerate(munich_films.TAGEN):
+					dayName = munich_films.TranslateDays(tag, locale)
+					self.assertEqual(d, munich_films.GetDayIndex(dayName), msg=locale + " " + tag)
+				self.assertEqual(munich_films.ParseShowtimes(german), munich_films.ParseShowtimes(translation))
+		finally:
+			munich_films.SetLocale("en")
+		self.assertRaises(ValueError, munich_films.SetLocale, "fr")
+		
+	def testSinglePassFilmSoupDict(self):
+		with open(testTextVersion) as f:
+			soup = BeautifulSoup(f.read(), munich_films.parserName)
+		for getGermanFilms in [False, True]:
+			filmDict, titles = munich_films.GetFilmSoupDict(soup, getGermanFilms)
+			filmDictOld, titlesOld = munich_films.GetFilmSoupDict(soup, getGermanFilms,
+																singlePass=False)
+			self.assertEqual(titlesOld, titles)
+			correct = munich_films.MakeFilmTextDict(filmDictOld, titlesOld)
+			result = munich_films.MakeFilmTextDict(filmDict, titles)
+			self.assertEqual(correct, result)
+		
+	def testParallelParsing(self):
+		with open(testTextVersion) as f:
+			inputText = f.read()
+		for getGermanFilms in [False, True]:
+			correct = munich_films.ParseFilmListings(inputText, getGermanFilms)
+			result = munich_films.ParseFilmListings(inputText, getGermanFilms, jobs=3)
+			self.assertEqual(correct, result)
+		headerText, filmChunks = munich_films.SplitFilmChunks(inputText)
+		self.assertEqual(100, len(filmChunks))
+		self.assertEqual((None, None), munich_films.SplitFilmChunks("<html></html>"))
+		
+	def testStreamParser(self):
+		with open(testTextVersion) as f:
+			inputText = f.read()
+		soup = munich_films.MakeSoup(inputText)
+		correct = []
+		for filmRows in munich_films.GetFilmRows(soup):
+			filmTitle, langType = munich_films.GetTitleAndLanguage(filmRows[0])
+			correct.append((filmTitle, langType, munich_films.GetTheatersAndTimes(filmRows)))
+		for chunkSize in [7, 1000, len(inputText)]:
+			chunks = [inputText[i:i + chunkSize] for i in range(0, len(inputText), chunkSize)]
+			streamParser = munich_films.FilmListingsStreamParser()
+			result = list(munich_films.IterFilmRecords(chunks, True, streamParser))
+			self.assertEqual(correct, result)
+			self.assertEqual("28.04.2016-04.05.2016", streamParser.scheduleDates)
+		
+		result = list(munich_films.IterFilmRecords([inputText]))
+		self.assertEqual([r for r in correct if r[1] != "German"], result)
+
+	def testStreamOutput(self):
+		chunks = munich_films.IterFileChunks(testTextVersion, chunkSize=500)
+		munich_films.StreamFilmListings(chunks, TEMP_OUTPUT)
+		with open(REFERENCE_OUTPUT) as f:
+			correct = f.read()
+		with open(TEMP_OUTPUT) as f:
+			result = f.read()
+		os.remove(TEMP_OUTPUT)
+		self.assertEqual(correct, result)
+		
+	def testFilmRecords(self):
+		with open(testTextVersion) as f:
+			soup = munich_films.MakeSoup(f.read())
+		for getGermanFilms in [False, True]:
+			filmDict, titles = munich_films.GetFilmSoupDict(soup, getGermanFilms)
+			correct = (titles, munich_films.MakeFilmTextDict(filmDict, titles))
+			films = munich_films.GetFilms(soup, getGermanFilms)
+			self.assertEqual(correct, munich_films.FilmsToTextDict(films))
+		
+		film = [f for f in films if f.title == "Captain America: Civil War (The First Avenger: Civil War)"
+				and f.is3D][0]
+		self.assertEqual("OF", film.langType)
+		self.assertEqual(title11, film.GetDisplayTitle())
+		# 'Mathäser: Th/Sun/Tu/W 20:00; F/Sat 23:00; W also 22:45'
+		correct = [munich_films.Screening("Mathäser", 0b0011101, 1200),
+					munich_films.Screening("Mathäser", 0b0001000, 1365),
+					munich_films.Screening("Mathäser", 0b1100000, 1380)]
+		self.assertEqual(correct, [x for x in film.screenings if x.theater == "Mathäser"])
+		self.assertTrue(correct[2].IsOnDay("Sat"))
+		self.assertFalse(correct[2].IsOnDay("Sun"))
+		# screenings are hashable, and don't equal other kinds of objects
+		self.assertEqual(len(set(correct)), len(set(correct + [munich_films.Screening(
+							correct[0].theater, correct[0].dayMask, correct[0].minutes)])))
+		self.assertNotEqual(correct[0], (correct[0].theater, correct[0].dayMask, correct[0].minutes))
+		self.assertNotEqual(correct[0], None)
+		
+		# round trip via text dict, and pickling (e.g., for worker processes)
+		filmTitles, filmTextDict = munich_films.FilmsToTextDict(films)
+		films2 = munich_films.FilmsFromTextDict(filmTitles, filmTextDict)
+		self.assertEqual((filmTitles, filmTextDict), munich_films.FilmsToTextDict(films2))
+		films3 = pickle.loads(pickle.dumps(films))
+		self.assertEqual((filmTitles, filmTextDict), munich_films.FilmsToTextDict(films3))
+		self.assertEqual(film.screenings, [f for f in films3 if f.title == film.title
+											and f.is3D][0].screenings)
+		
+	def testInterning(self):
+		with open(testTextVersion) as f:
+			inputText = f.read()
+		films, scheduleDates = munich_films.ParseFilms(inputText, True)
+		# all references to a theater name share one string object
+		names = [theater for film in films for (theater, times) in film.theaterTimes]
+		names += [s.theater for film in films for s in film.screenings]
+		self.assertTrue(all(name is munich_films.theaterRegistry.Intern(name) for name in names))
+		# the registries are bounded
+		registry = munich_films.NameRegistry(maxSize=2)
+		self.assertEqual([0, 1, 0, 0], [registry.GetID(name) for name in ["a", "b", "a", "c"]])
+		self.assertEqual(["c"], registry.names)
+		# ... and give the right name back while other threads fill them up
+		registry = munich_films.NameRegistry(maxSize=50)
+		mismatches = []
+		def Worker(n):
+			for i in range(2000):
+				name = "T%d_%d" % (n, i % 97)
+				interned = registry.Intern(name)
+				if interned != name:
+					mismatches.append((name, interned))
+		threads = [threading.Thread(target=Worker, args=(n,)) for n in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual([], mismatches)
+
+		filmTitles, filmTextDict = munich_films.FilmsToTextDict(films)
+		self.assertEqual(munich_films.MakeDayIndex(filmTextDict, filmTitles),
+						munich_films.MakeDayIndexFromFilms(films))
+
+		# theater names and showtime notes containing ": "
+		self.assertEqual(("Filmmuseum München", " Tu 21:00 (Einführung: N.N.)"),
+				munich_films.SplitTheaterTimes("Filmmuseum München: Tu 21:00 (Einführung: N.N.)"))
+		theaterTimes = [("Kino: Saal 2", "Sun 20:00")]
+		film = munich_films.Film("Test", "OF", False, theaterTimes, munich_films.MakeScreenings(theaterTimes))
+		films2 = munich_films.FilmsFromTextDict(*munich_films.FilmsToTextDict([film]))
+		self.assertEqual(theaterTimes, films2[0].theaterTimes)
+		self.assertEqual("Kino: Saal 2", films2[0].screenings[0].theater)
+		# ... the split doesn't depend on which theaters this process has seen
+		self.assertEqual(("Kino", " Saal 2: Sun 20:00"),
+						munich_films.SplitTheaterTimes("Kino: Saal 2: Sun 20:00"))
+		self.assertEqual(("Kino: Saal 2", " Sun 20:00"),
+						munich_films.SplitTheaterTimes("Kino: Saal 2: Sun 20:00", {"Kino: Saal 2"}))
+		# ... and (theater, showtimes) survive JSON, pickling, and the parsed cache
+		timesList = munich_films.FilmsToTextDict([film])[1]["Test [OF]"]
+		pairs = json.loads(json.dumps(munich_films.TimesListToPairs(timesList)))
+		for timesList2 in [munich_films.TimesListFromPairs(pairs), pickle.loads(pickle.dumps(timesList))]:
+			self.assertEqual(timesList, timesList2)
+			self.assertEqual(("Kino: Saal 2", " Sun 20:00"), munich_films.SplitTheaterTimes(timesList2[0]))
+		cacheDir = tempfile.mkdtemp()
+		try:
+			cacheFname = os.path.join(cacheDir, "test.json.z")
+			munich_films.WriteParsedResults(cacheFname, *munich_films.FilmsToTextDict([film]), None)
+			films3 = munich_films.FilmsFromTextDict(*munich_films.ReadParsedResults(cacheFname)[:2])
+			self.assertEqual(theaterTimes, films3[0].theaterTimes)
+		finally:
+			shutil.rmtree(cacheDir)
+		
+	def testVariantGrouping(self):
+		self.assertEqual("zootopia", munich_films.GetCanonicalTitle("Zootopia (Zoomania)"))
+		self.assertEqual(munich_films.GetCanonicalTitle("Power to Change – Die  Energierebellion"),
+						munich_films.GetCanonicalTitle("Power to change - Die Energierebellion"))
+		with open(testTextVersion) as f:
+			films, scheduleDates = munich_films.ParseFilms(f.read())
+		groups = munich_films.GroupFilmVariants(films)
+		self.assertEqual(len(films) - 5, len(groups))
+		self.assertEqual(len(films), sum(len(group.variants) for group in groups))
+		group = [g for g in groups if g.title == "The Jungle Book"][0]
+		self.assertEqual(["[OF]", "(3D) [OF]", "[OmU]"],
+						[munich_films.GetVariantLabel(film) for film in group.variants])
+		self.assertIn("Cinema (3D) [OF]: F 14:00; Sun 13:00; W 16:55", group.GetTimesList())
+		
+		dayIndex = munich_films.MakeDayIndexFromGroups(groups)
+		correct = [("Museum Lichtspiele", (965, 1235), "[OF]"), ("Cinema", (780,), "(3D) [OF]"),
+					("Mathäser", (1200,), "(3D) [OF]"), ("Kinos Münchner Freiheit", (1305,), "[OmU]")]
+		self.assertEqual(correct, munich_films.GetListingsForDay(dayIndex, "Sun")["The Jungle Book"])
+		listings = munich_films.GetListingsForDay(dayIndex, "Sun", theater="Cinema", after="13:00")
+		self.assertEqual([("Cinema", (780,), "(3D) [OF]")], listings["The Jungle Book"])
+		
+	def testParserBackends(self):
+		with open(REFERENCE_OUTPUT) as f:
+			correct = f.read()
+		originalParser = munich_films.parserName
+		try:
+			for name in munich_films.GetAvailableParsers():
+				munich_films.SetParser(name)
+				munich_films.GetAndProcessFilmListings(testTextVersion, TEMP_OUTPUT)
+				with open(TEMP_OUTPUT) as f:
+					result = f.read()
+				self.assertEqual(correct, result, msg="parser = " + name)
+		finally:
+			munich_films.SetParser(originalParser)
+		if os.path.exists(TEMP_OUTPUT):
+			os.remove(TEMP_OUTPUT)
+		
+	def testSetParser(self):
+		self.assertEqual("html.parser", munich_films.SetParser("html.parser"))
+		self.assertRaises(ValueError, munich_films.SetParser, "no-such-parser")
+		
+	def testGetTimesForOneDay(self):
+		# setup: create input and reference
+		input = timesList1
+		correct = dayAndTimes1
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+		input = timesList2
+		correct = dayAndTimes2
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+		input = timesList3
+		correct = dayAndTimes3
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+		input = timesList4
+		correct = dayAndTimes4
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+		input = timesList5
+		correct = dayAndTimes5
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+		input = timesList10
+		correct = dayAndTimes10
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+		input = timesList11
+		correct = dayAndTimes11
+		result = []
+		for inputDay in ["Sun", "M", "Tu", "W", "Th", "F", "Sat"]:
+			result.append(munich_films.GetTimesForOneDay(input, inputDay))
+		self.assertEqual(correct, result)
+
+
+
+class FetchCacheCheck(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		with open(testTextVersion) as f:
+			StandInHandler.pageText = f.read()
+		cls.server, cls.baseURL = StartStandInServer(StandInHandler)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+
+	def setUp(self):
+		del StandInHandler.requestLog[:]
+		self.cacheDir = tempfile.mkdtemp()
+		self.url = self.baseURL + "/film/muenchen/oton.htm"
+
+	def tearDown(self):
+		shutil.rmtree(self.cacheDir)
+
+	def testNoCache(self):
+		result = munich_films.FetchPageText(self.url)
+		self.assertEqual(StandInHandler.pageText, result)
+		self.assertEqual([("/film/muenchen/oton.htm", 200)], StandInHandler.requestLog)
+
+	def testConditionalFetch(self):
+		result1 = munich_films.FetchPageText(self.url, self.cacheDir, ttl=0)
+		# second retrieval should be a conditional request answered with 304
+		result2 = munich_films.FetchPageText(self.url, self.cacheDir, ttl=0)
+		self.assertEqual(StandInHandler.pageText, result1)
+		self.assertEqual(StandInHandler.pageText, result2)
+		self.assertEqual([200, 304], [status for (path, status) in StandInHandler.requestLog])
+		pageText, metadata = munich_films.ReadCachedPage(self.url, self.cacheDir)
+		self.assertEqual(STAND_IN_ETAG, metadata["etag"])
+		self.assertEqual(STAND_IN_LAST_MODIFIED, metadata["lastModified"])
+
+	def testStreaming(self):
+		chunks = munich_films.IterPageChunks(self.url, chunkSize=1024)
+		records = list(munich_films.IterFilmRecords(chunks))
+		correctTitles = munich_films.ParseFilmListings(StandInHandler.pageText)[0]
+		self.assertEqual(correctTitles, ["%s [%s]" % (r[0], r[1]) for r in records])
+
+	def testTTL(self):
+		munich_films.FetchPageText(self.url, self.cacheDir, ttl=3600)
+		result = munich_films.FetchPageText(self.url, self.cacheDir, ttl=3600)
+		self.assertEqual(StandInHandler.pageText, result)
+		self.assertEqual(1, len(StandInHandler.requestLog))
+
+	def testOffline(self):
+		self.assertRaises(IOError, munich_films.FetchPageText, self.url, self.cacheDir,
+							offline=True)
+		munich_films.FetchPageText(self.url, self.cacheDir)
+		result = munich_films.FetchPageText(self.url, self.cacheDir, offline=True)
+		self.assertEqual(StandInHandler.pageText, result)
+		self.assertEqual(1, len(StandInHandler.requestLog))
+
+
+class MultiTargetCheck(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		with open(testTextVersion) as f:
+			MultiPageHandler.pageText = f.read()
+		cls.server, cls.baseURL = StartStandInServer(MultiPageHandler, ThreadingHTTPServer)
+		cls.correct = munich_films.ParseFilmListings(MultiPageHandler.pageText)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+
+	def setUp(self):
+		del MultiPageHandler.requestLog[:]
+		MultiPageHandler.maxInFlight = 0
+
+	def testConcurrentFetch(self):
+		urls = [self.baseURL + "/page%d.htm" % i for i in range(6)]
+		result = munich_films.FetchAndParseTargets(urls, maxPerHost=3)
+		# same page six times --> merged result is the same as for one page
+		self.assertEqual(self.correct, result)
+		self.assertEqual(6, len(MultiPageHandler.requestLog))
+		self.assertTrue(1 < MultiPageHandler.maxInFlight <= 3)
+
+	def testPerHostLimit(self):
+		urls = [self.baseURL + "/page%d.htm" % i for i in range(3)]
+		munich_films.FetchAndParseTargets(urls, maxPerHost=1, parseInProcesses=False)
+		self.assertEqual(1, MultiPageHandler.maxInFlight)
+
+	def testRetries(self):
+		urls = [self.baseURL + "/flaky.htm"]
+		result = munich_films.FetchAndParseTargets(urls, retries=1, parseInProcesses=False)
+		self.assertEqual(self.correct, result)
+		self.assertEqual([("/flaky.htm", 503), ("/flaky.htm", 200)], MultiPageHandler.requestLog)
+		del MultiPageHandler.requestLog[:]
+		import requests
+		self.assertRaises(requests.exceptions.HTTPError, munich_films.FetchAndParseTargets,
+							[self.baseURL + "/flaky2.htm"], retries=0, parseInProcesses=False)
+
+	def testMergeFilmListings(self):
+		results1 = (["A [OF]", "B [OmU]"], {"A [OF]": ["X: M 20:00"], "B [OmU]": ["Y: Sun 11:00"]},
+					None)
+		results2 = (["C [OF]", "A [OF]"], {"C [OF]": ["Z: W 18:00"],
+					"A [OF]": ["X: M 20:00", "Z: Tu 21:00"]}, "01.01.2016-07.01.2016")
+		correct = (["A [OF]", "B [OmU]", "C [OF]"], {"A [OF]": ["X: M 20:00", "Z: Tu 21:00"],
+					"B [OmU]": ["Y: Sun 11:00"], "C [OF]": ["Z: W 18:00"]}, "01.01.2016-07.01.2016")
+		self.assertEqual(correct, munich_films.MergeFilmListings([results1, results2]))
+
+
+class RobustFetchCheck(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		with open(testTextVersion) as f:
+			FaultyHandler.pageText = f.read()
+		cls.server, cls.baseURL = StartStandInServer(FaultyHandler, ThreadingHTTPServer)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+
+	def setUp(self):
+		del FaultyHandler.requestLog[:]
+		FaultyHandler.failuresLeft = 0
+		FaultyHandler.failAll = False
+		munich_films.ResetCircuitBreakers()
+		munich_films.fetchMetrics.Reset()
+		self.cacheDir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		munich_films.ResetCircuitBreakers()
+		shutil.rmtree(self.cacheDir)
+
+	def testTimeout(self):
+		import requests
+		t0 = time.perf_counter()
+		self.assertRaises(requests.exceptions.Timeout, munich_films.HTTPGet, self.baseURL + "/slow.htm",
+							retries=1, backoff=0.01, timeout=(1.0, 0.2))
+		self.assertLess(time.perf_counter() - t0, FaultyHandler.delay)
+		summary = munich_films.fetchMetrics.GetSummary()
+		self.assertEqual((2, {"timeout": 2}, 1), (summary["requests"], summary["errors"], summary["retries"]))
+		self.assertLess(summary["latency"]["max"], FaultyHandler.delay)
+
+	def testTruncatedBody(self):
+		import requests
+		self.assertRaises(requests.exceptions.ChunkedEncodingError, munich_films.HTTPGet,
+							self.baseURL + "/truncated.htm", retries=1, backoff=0.01)
+		self.assertEqual({"truncated": 2}, munich_films.fetchMetrics.GetSummary()["errors"])
+
+	def testServerErrors(self):
+		res = munich_films.HTTPGet(self.baseURL + "/error.htm", retries=2, backoff=0.01)
+		self.assertEqual(503, res.status_code)
+		self.assertEqual(3, len(FaultyHandler.requestLog))
+		# (3 more failures would open the circuit breaker)
+		munich_films.ResetCircuitBreakers()
+		FaultyHandler.failuresLeft = 2
+		res = munich_films.HTTPGet(self.baseURL + "/flapping.htm", retries=2, backoff=0.01)
+		self.assertEqual(FaultyHandler.pageText, res.text)
+		summary = munich_films.fetchMetrics.GetSummary()
+		self.assertEqual((6, {"http503": 5}, 4), (summary["requests"], summary["errors"], summary["retries"]))
+
+	def testBackoff(self):
+		for attempt in range(8):
+			maxTime = min(munich_films.MAX_BACKOFF, 0.5 * 2**attempt)
+			t = munich_films.GetBackoffTime(0.5, attempt)
+			self.assertTrue(0.5*maxTime <= t <= maxTime)
+
+	def testCircuitBreaker(self):
+		breaker = munich_films.CircuitBreaker(failureThreshold=2, resetTime=0.2)
+		munich_films.circuitBreakers[self.baseURL[len("http://"):]] = breaker
+		for i in range(2):
+			munich_films.HTTPGet(self.baseURL + "/error.htm")
+		self.assertEqual("open", breaker.GetState())
+		self.assertRaises(munich_films.CircuitOpenError, munich_films.HTTPGet, self.baseURL + "/page.htm")
+		self.assertEqual(2, len(FaultyHandler.requestLog))
+		self.assertEqual(1, munich_films.fetchMetrics.GetSummary()["rejected"])
+		# after resetTime, one trial request; a failure re-opens the breaker...
+		time.sleep(0.25)
+		self.assertEqual("half-open", breaker.GetState())
+		munich_films.HTTPGet(self.baseURL + "/error.htm")
+		self.assertEqual("open", breaker.GetState())
+		# ... and a success closes it
+		time.sleep(0.25)
+		self.assertEqual(200, munich_films.HTTPGet(self.baseURL + "/page.htm").status_code)
+		self.assertEqual("closed", breaker.GetState())
+
+	def testCircuitBreakerUnexpectedError(self):
+		import requests
+		class RedirectLoopSession(object):
+			def get(self, url, **kwargs):
+				raise requests.exceptions.TooManyRedirects("Exceeded 30 redirects.")
+		breaker = munich_films.CircuitBreaker(failureThreshold=1, resetTime=0.2)
+		munich_films.circuitBreakers[self.baseURL[len("http://"):]] = breaker
+		munich_films.HTTPGet(self.baseURL + "/error.htm")
+		time.sleep(0.25)
+		# a trial request failing with a non-retried exception re-opens the
+		# breaker, instead of leaving the trial "in progress" forever
+		self.assertRaises(requests.exceptions.TooManyRedirects, munich_films.HTTPGet,
+							self.baseURL + "/page.htm", session=RedirectLoopSession())
+		self.assertEqual("open", breaker.GetState())
+		time.sleep(0.25)
+		self.assertEqual(200, munich_films.HTTPGet(self.baseURL + "/page.htm").status_code)
+		self.assertEqual("closed", breaker.GetState())
+
+	def testStreamingClientErrors(self):
+		import requests
+		# as with HTTPGet, 4xx responses don't count against the breaker
+		breaker = munich_films.CircuitBreaker(failureThreshold=1)
+		munich_films.circuitBreakers[self.baseURL[len("http://"):]] = breaker
+		self.assertRaises(requests.exceptions.HTTPError, list,
+							munich_films.IterPageChunks(self.baseURL + "/missing.htm"))
+		self.assertEqual("closed", breaker.GetState())
+		self.assertRaises(requests.exceptions.HTTPError, list,
+							munich_films.IterPageChunks(self.baseURL + "/error.htm"))
+		self.assertEqual("open", breaker.GetState())
+
+	def testCachedFallback(self):
+		import requests
+		url = self.baseURL + "/film/muenchen/oton.htm"
+		self.assertEqual(FaultyHandler.pageText, munich_films.FetchPageText(url, self.cacheDir, ttl=0))
+		FaultyHandler.failAll = True
+		result = munich_films.FetchPageText(url, self.cacheDir, ttl=0, retries=0)
+		self.assertEqual(FaultyHandler.pageText, result)
+		self.assertEqual(1, munich_films.fetchMetrics.GetSummary()["staleFallbacks"])
+		# without a cached copy, the error is raised
+		self.assertRaises(requests.exceptions.HTTPError, munich_films.FetchPageText, url, retries=0)
+
+
+class AsyncAPICheck(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		with open(testTextVersion) as f:
+			FaultyHandler.pageText = f.read()
+		cls.server, cls.baseURL = StartStandInServer(FaultyHandler, ThreadingHTTPServer)
+		cls.correct = munich_films.ParseFilmListings(FaultyHandler.pageText)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+
+	def setUp(self):
+		del FaultyHandler.requestLog[:]
+		FaultyHandler.failAll = False
+		self.originalDelay = FaultyHandler.delay
+		FaultyHandler.delay = 0.3
+
+	def tearDown(self):
+		FaultyHandler.delay = self.originalDelay
+
+	def testCoalescing(self):
+		url = self.baseURL + "/slow.htm"
+		ticks = []
+
+		async def Ticker():
+			while True:
+				ticks.append(time.perf_counter())
+				await asyncio.sleep(0.01)
+
+		async def Main():
+			ticker = asyncio.ensure_future(Ticker())
+			results = await asyncio.gather(*[munich_films.FetchAndParseAsync(url) for i in range(5)])
+			ticker.cancel()
+			# a later call fetches again
+			later = await munich_films.FetchAndParseAsync(url)
+			return results, later
+
+		results, later = asyncio.run(Main())
+		self.assertEqual(["/slow.htm"]*2, FaultyHandler.requestLog)
+		self.assertTrue(all(result is results[0] for result in results))
+		self.assertIsNot(results[0], later)
+		filmTitles, filmTextDict, scheduleDates = self.correct
+		self.assertEqual((filmTitles, filmTextDict), results[0].GetTextDict())
+		self.assertEqual(scheduleDates, results[0].scheduleDates)
+		self.assertEqual(results[0].fingerprint, later.fingerprint)
+		# the event loop kept running during the fetch
+		self.assertGreater(len(ticks), 10)
+		self.assertEqual({}, munich_films.inFlightFetches)
+
+	def testProcessPoolParsing(self):
+		import concurrent.futures
+
+		async def Main( executor ):
+			return await munich_films.FetchAndParseAsync(self.baseURL + "/page.htm", executor=executor)
+
+		with concurrent.futures.ProcessPoolExecutor(1) as executor:
+			result = asyncio.run(Main(executor))
+		self.assertEqual(self.correct[:2], result.GetTextDict())
+		# Film/Screening records from the worker process
+		correctFilms = munich_films.FilmsFromTextDict(*self.correct[:2])
+		self.assertEqual([[s.theater for s in film.screenings] for film in correctFilms],
+						[[s.theater for s in film.screenings] for film in result.films])
+		self.assertEqual([film.screenings for film in correctFilms],
+						[film.screenings for film in result.films])
+		self.assertEqual(len(result.films) - 5, len(result.GetGroups()))
+
+	def testErrors(self):
+		import requests
+		FaultyHandler.failAll = True
+
+		async def Main():
+			return await asyncio.gather(*[munich_films.FetchAndParseAsync(self.baseURL + "/down.htm")
+										for i in range(3)], return_exceptions=True)
+
+		munich_films.ResetCircuitBreakers()
+		try:
+			results = asyncio.run(Main())
+		finally:
+			munich_films.ResetCircuitBreakers()
+		self.assertTrue(all(isinstance(result, requests.exceptions.HTTPError) for result in results))
+		self.assertEqual(munich_films.DEFAULT_RETRIES + 1, len(FaultyHandler.requestLog))
+
+
+class ParsedCacheCheck(unittest.TestCase):
+	def setUp(self):
+		self.cacheDir = tempfile.mkdtemp()
+		with open(testTextVersion) as f:
+			self.inputText = f.read()
+		self.originalVersion = munich_films.PARSER_VERSION
+
+	def tearDown(self):
+		munich_films.PARSER_VERSION = self.originalVersion
+		shutil.rmtree(self.cacheDir)
+
+	def testCacheHit(self):
+		correct = munich_films.ParseFilmListings(self.inputText)
+		result1 = munich_films.ParseFilmListings(self.inputText, cacheDir=self.cacheDir)
+		self.assertEqual(correct, result1)
+		# second call should come straight from the cache
+		originalMakeSoup = munich_films.MakeSoup
+		try:
+			munich_films.MakeSoup = None
+			result2 = munich_films.ParseFilmListings(self.inputText, cacheDir=self.cacheDir)
+		finally:
+			munich_films.MakeSoup = originalMakeSoup
+		self.assertEqual(correct, result2)
+		self.assertEqual("28.04.2016-04.05.2016", result2[2])
+
+	def testCacheKey(self):
+		fname1 = munich_films.GetParsedCacheFilename(self.inputText, False, self.cacheDir)
+		fname2 = munich_films.GetParsedCacheFilename(self.inputText, True, self.cacheDir)
+		fname3 = munich_films.GetParsedCacheFilename(self.inputText + " ", False, self.cacheDir)
+		self.assertEqual(3, len(set([fname1, fname2, fname3])))
+
+	def testParserVersion(self):
+		munich_films.ParseFilmListings(self.inputText, cacheDir=self.cacheDir)
+		fname = munich_films.GetParsedCacheFilename(self.inputText, False, self.cacheDir)
+		self.assertNotEqual(None, munich_films.ReadParsedResults(fname))
+		munich_films.PARSER_VERSION += 1
+		fname = munich_films.GetParsedCacheFilename(self.inputText, False, self.cacheDir)
+		self.assertEqual(None, munich_films.ReadParsedResults(fname))
+
+	def testEviction(self):
+		for i in range(4):
+			munich_films.ParseFilmListings(self.inputText + " " * i, cacheDir=self.cacheDir)
+		parsedDir = os.path.join(self.cacheDir, "parsed")
+		self.assertEqual(4, len(os.listdir(parsedDir)))
+		oneSize = os.path.getsize(os.path.join(parsedDir, os.listdir(parsedDir)[0]))
+		munich_films.PruneParsedCache(parsedDir, 2*oneSize)
+		self.assertEqual(2, len(os.listdir(parsedDir)))
+
+
+
+class ProfileCheck(unittest.TestCase):
+	def setUp(self):
+		with open(testTextVersion) as f:
+			self.inputText = f.read()
+		munich_films.ParseShowtimes.cache_clear()
+
+	def tearDown(self):
+		munich_films.EnableProfiling(False)
+
+	def testDisabled(self):
+		munich_films.EnableProfiling(False)
+		munich_films.ParseFilmListings(self.inputText)
+		self.assertEqual({}, munich_films.stageTimes)
+		self.assertEqual({}, munich_films.profileCounters)
+
+	def testStagesAndCounters(self):
+		munich_films.EnableProfiling(trace=True)
+		filmTitles, filmTextDict, scheduleDates = munich_films.ParseFilmListings(self.inputText)
+		for stage in ["parse", "split", "extract", "translate", "schedule"]:
+			self.assertIn(stage, munich_films.stageTimes)
+		self.assertEqual(1, munich_films.stageTimes["parse"][1])
+		self.assertEqual(len(filmTitles), munich_films.profileCounters["films"])
+		self.assertEqual(1, munich_films.profileCounters["pages"])
+		data = munich_films.GetProfileData(1.0)
+		self.assertEqual(len(filmTitles), data["counters"]["films"])
+		self.assertIn("films", munich_films.GetProfileReport(1.0))
+		events = munich_films.traceEvents
+		self.assertEqual(sum(n for t, n in munich_films.stageTimes.values()), len(events))
+		self.assertEqual("X", events[0]["ph"])
+
+	def testCountersMatchAcrossPaths(self):
+		# the streaming parser and the soup-based parser count the same films
+		# (after the language filter) and theater rows
+		munich_films.EnableProfiling()
+		munich_films.ParseFilmListings(self.inputText)
+		counters = dict(munich_films.profileCounters)
+		self.assertEqual(counters["showtimeCacheMisses"], munich_films.ParseShowtimes.cache_info().misses)
+		munich_films.EnableProfiling()
+		list(munich_films.IterFilmRecords(munich_films.IterFileChunks(testTextVersion)))
+		self.assertEqual((counters["films"], counters["theaters"]),
+						(munich_films.profileCounters["films"], munich_films.profileCounters["theaters"]))
+
+
+
+class ScalingCheck(unittest.TestCase):
+	def testSyntheticPage(self):
+		pageText = benchmark_munichfilms.GenerateListingsPage(200)
+		filmTitles, filmTextDict, scheduleDates = munich_films.ParseFilmListings(pageText, True)
+		self.assertEqual(200, len(filmTitles))
+		self.assertEqual(pageText.count('class="mid b"'),
+						sum(len(timesList) for timesList in filmTextDict.values()))
+		self.assertEqual("28.04.2016-04.05.2016", scheduleDates)
+		# same page from the same seed, and the non-German films only by default
+		self.assertEqual(pageText, benchmark_munichfilms.GenerateListingsPage(200))
+		ovTitles = munich_films.ParseFilmListings(pageText)[0]
+		self.assertTrue(0 < len(ovTitles) < 200)
+		self.assertTrue(all(title.endswith(("[OF]", "[OmU]", "[OmeU]")) for title in ovTitles))
+
+
+
+class StartupCheck(unittest.TestCase):
+	def testLazyImports(self):
+		# importing munich_films (e.g., just for the showtime-parsing functions)
+		# shouldn't load requests, BeautifulSoup, etc.
+		importTime, modules = benchmark_munichfilms.MeasureImportTime(nRepeats=1)
+		self.assertTrue(importTime > 0)
+		self.assertIn("hashlib", modules)
+		for name in benchmark_munichfilms.HEAVY_MODULES:
+			self.assertNotIn(name, modules)
+
+
+
+class ServerCheck(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		with open(testTextVersion) as f:
+			cls.pageText = f.read()
+		StandInHandler.pageText = cls.pageText
+		cls.standIn, cls.baseURL = StartStandInServer(StandInHandler)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.standIn.shutdown()
+		cls.standIn.server_close()
+
+	def setUp(self):
+		self.cacheDir = tempfile.mkdtemp()
+		self.scheduleServer = munich_films_server.ScheduleServer(self.baseURL + "/oton.htm",
+									cacheDir=self.cacheDir, refreshInterval=3600)
+		self.loop = asyncio.new_event_loop()
+		# (unhandled exceptions in connection handlers end up here)
+		self.loopErrors = []
+		self.loop.set_exception_handler(lambda loop, context: self.loopErrors.append(context))
+		started = threading.Event()
+		self.task = self.loop.create_task(self.scheduleServer.Serve(port=0, started=started))
+		self.thread = threading.Thread(target=self.RunServer)
+		self.thread.start()
+		started.wait(10)
+		self.conn = http.client.HTTPConnection("127.0.0.1", self.scheduleServer.port)
+
+	def tearDown(self):
+		self.conn.close()
+		self.loop.call_soon_threadsafe(self.task.cancel)
+		self.thread.join()
+		self.loop.close()
+		shutil.rmtree(self.cacheDir)
+
+	def RunServer(self):
+		try:
+			self.loop.run_until_complete(self.task)
+		except asyncio.CancelledError:
+			pass
+
+	def GetJSON(self, path):
+		self.conn.request("GET", path)
+		res = self.conn.getresponse()
+		return res.status, json.loads(res.read().decode("utf-8"))
+
+	def testQueries(self):
+		filmTitles, filmTextDict, scheduleDates = munich_films.ParseFilmListings(self.pageText)
+		# several requests over one keep-alive connection
+		status, result = self.GetJSON("/films")
+		self.assertEqual(200, status)
+		self.assertEqual(scheduleDates, result["scheduleDates"])
+		self.assertEqual(filmTitles, [film["title"] for film in result["films"]])
+		status, result = self.GetJSON("/films?day=Sun")
+		dayIndex = munich_films.MakeDayIndex(filmTextDict, filmTitles)
+		self.assertEqual(list(munich_films.GetListingsForDay(dayIndex, "Sun").keys()),
+						[film["title"] for film in result["films"]])
+		status, result = self.GetJSON("/theaters/Werkstattkino")
+		self.assertEqual(200, status)
+		self.assertIn({"title": "Le amiche (Die Freundinnen) [OmeU]", "showtimes": "M 20:00"},
+						result["films"])
+		status, result = self.GetJSON("/theaters/Mathäser".replace("ä", "%C3%A4"))
+		self.assertEqual(200, status)
+		self.assertEqual(404, self.GetJSON("/theaters/Nowhere")[0])
+		self.assertEqual(400, self.GetJSON("/films?day=Someday")[0])
+
+	def testRefresh(self):
+		self.assertFalse(self.scheduleServer.Refresh())
+		oldSchedule = self.scheduleServer.schedule
+		try:
+			StandInHandler.pageText = self.pageText.replace("Le amiche", "Le nemiche")
+			# (the stand-in server always sends the same ETag, so go around the cache)
+			shutil.rmtree(self.cacheDir)
+			self.assertTrue(self.scheduleServer.Refresh())
+		finally:
+			StandInHandler.pageText = self.pageText
+		status, result = self.GetJSON("/films")
+		titles = [film["title"] for film in result["films"]]
+		self.assertIn("Le nemiche (Die Freundinnen) [OmeU]", titles)
+		self.assertNotIn("Le amiche (Die Freundinnen) [OmeU]", titles)
+		self.assertIn("Le amiche (Die Freundinnen) [OmeU]", oldSchedule.filmTitles)
+		self.assertEqual(2, self.GetJSON("/status")[1]["updates"])
+
+	def SendRaw(self, request):
+		"""Sends raw request bytes on a new connection and returns everything
+		the server sends back before closing it."""
+		with socket.create_connection(("127.0.0.1", self.scheduleServer.port), timeout=5) as sock:
+			sock.sendall(request)
+			sock.shutdown(socket.SHUT_WR)
+			response = b""
+			while True:
+				data = sock.recv(65536)
+				if len(data) == 0:
+					return response
+				response += data
+
+	def testBadRequests(self):
+		response = self.SendRaw(b"GET /films HTTP/1.1\r\nContent-Length: abc\r\n\r\n")
+		self.assertTrue(response.startswith(b"HTTP/1.1 400 "))
+		self.assertIn(b"Connection: close", response)
+		response = self.SendRaw(b"GET /films HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+		self.assertTrue(response.startswith(b"HTTP/1.1 400 "))
+		# body shorter than Content-Length: the connection is just closed
+		self.assertEqual(b"", self.SendRaw(b"GET /films HTTP/1.1\r\nContent-Length: 100\r\n\r\nshort"))
+		self.assertEqual(200, self.GetJSON("/status")[0])
+		time.sleep(0.1)
+		self.assertEqual([], self.loopErrors)
+
+
+
+class IncrementalCheck(unittest.TestCase):
+	def setUp(self):
+		with open(testTextVersion) as f:
+			self.inputText = f.read()
+		# change one film's showtimes and remove another film
+		self.newText = self.inputText.replace("Mo.&nbsp;20:00 </td>", "Di.&nbsp;20:00 </td>", 1)
+		start = self.newText.rfind('<tr class="start"', 0, self.newText.find("Bahubali"))
+		end = self.newText.find('<tr class="start"', start + 1)
+		self.removedRows = self.newText[start:end]
+		self.newText = self.newText.replace(self.removedRows, "")
+
+	def tearDown(self):
+		munich_films.EnableProfiling(False)
+
+	def testIncrementalParse(self):
+		results1, state1 = munich_films.ParseFilmListingsIncremental(self.inputText)
+		self.assertEqual(munich_films.ParseFilmListings(self.inputText), results1)
+		self.assertEqual(100, len(state1["films"]))
+		munich_films.EnableProfiling()
+		results2, state2 = munich_films.ParseFilmListingsIncremental(self.newText, state1)
+		self.assertEqual(munich_films.ParseFilmListings(self.newText), results2)
+		self.assertEqual(1, munich_films.profileCounters["filmsReparsed"])
+		# state from a different parser version is ignored
+		state1["version"] = -1
+		results3, state3 = munich_films.ParseFilmListingsIncremental(self.newText, state1)
+		self.assertEqual(results2, results3)
+		self.assertEqual(100, munich_films.profileCounters["filmsReparsed"])
+
+	def testDiff(self):
+		results1, state1 = munich_films.ParseFilmListingsIncremental(self.inputText)
+		results2, state2 = munich_films.ParseFilmListingsIncremental(self.newText, state1)
+		diff = munich_films.DiffFilmListings(munich_films.StateToResults(state1), results2)
+		self.assertEqual({}, diff["added"])
+		self.assertEqual(["Bahubali: The Beginning [OmU]"], list(diff["removed"].keys()))
+		self.assertEqual({"Le amiche (Die Freundinnen) [OmeU]": {"Werkstattkino":
+							{"added": ["Tu 20:00"], "removed": ["M 20:00"]}}}, diff["changed"])
+		# first run: everything is new
+		diff = munich_films.DiffFilmListings(munich_films.StateToResults(None), results1)
+		self.assertEqual(results1[0], list(diff["added"].keys()))
+
+	def testDiffTimesLists(self):
+		changes = munich_films.DiffTimesLists(["A: daily 20:00", "B: Sun 11:00"],
+											["A: daily except M 20:00", "C: Sat 18:00"])
+		self.assertEqual({"A": {"added": [], "removed": ["M 20:00"]},
+						"B": {"added": [], "removed": ["Sun 11:00"]},
+						"C": {"added": ["Sat 18:00"], "removed": []}}, changes)
+		# rewording without changing the screenings
+		self.assertEqual({}, munich_films.DiffTimesLists(["A: Sat/Sun 20:00"], ["A: Sun/Sat 20:00"]))
+
+
+
+class ExportCheck(unittest.TestCase):
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+		with open(testTextVersion) as f:
+			self.results = munich_films.ParseFilmListings(f.read())
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir)
+
+	def testWeekDates(self):
+		weekDates = munich_films.GetWeekDates("28.04.2016-04.05.2016")
+		# Thursday to Wednesday
+		self.assertEqual("2016-05-01", weekDates[0])
+		self.assertEqual("2016-04-28", weekDates[4])
+		self.assertEqual("2016-05-04", weekDates[3])
+		self.assertEqual(None, munich_films.GetWeekDates(None))
+
+	def testSQLite(self):
+		filmTitles, filmTextDict, scheduleDates = self.results
+		dbFname = os.path.join(self.tempDir, "screenings.db")
+		nRows = munich_films.ExportToSQLite(dbFname, filmTitles, filmTextDict, scheduleDates)
+		# exporting the same week again replaces its rows; other weeks are kept
+		munich_films.ExportToSQLite(dbFname, filmTitles, filmTextDict, scheduleDates)
+		munich_films.ExportToSQLite(dbFname, filmTitles[:2], filmTextDict, "05.05.2016-11.05.2016")
+		db = sqlite3.connect(dbFname)
+		try:
+			self.assertEqual(nRows, db.execute("SELECT COUNT(*) FROM screenings WHERE "
+											"weekStart = '2016-04-28'").fetchone()[0])
+			rows = db.execute("SELECT film, langType, date, minutes FROM screenings WHERE "
+							"theater = 'Werkstattkino' AND weekday = 1").fetchall()
+			self.assertIn(("Le amiche (Die Freundinnen)", "OmeU", "2016-05-02", 20*60), rows)
+			self.assertEqual(2, db.execute("SELECT COUNT(DISTINCT film) FROM screenings WHERE "
+											"weekStart = '2016-05-05'").fetchone()[0])
+		finally:
+			db.close()
+		dayIndex = munich_films.MakeDayIndex(filmTextDict, filmTitles)
+		self.assertEqual(nRows, sum(len(times) for d in range(7)
+								for theaterTimes in dayIndex[d].values() for (theater, times) in theaterTimes))
+
+	@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow not installed")
+	def testParquet(self):
+		import pyarrow.parquet
+		filmTitles, filmTextDict, scheduleDates = self.results
+		fname = munich_films.ExportToParquet(self.tempDir, filmTitles, filmTextDict, scheduleDates)
+		table = pyarrow.parquet.read_table(fname)
+		self.assertEqual(munich_films.SCREENING_COLUMNS, table.column_names)
+		rows = munich_films.GetScreeningRows(munich_films.FilmsFromTextDict(filmTitles,
+												filmTextDict), scheduleDates)
+		self.assertEqual(len(rows), table.num_rows)
+
+
+
+class BatchCheck(unittest.TestCase):
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+		self.inputDir = os.path.join(self.tempDir, "saved")
+		os.mkdir(self.inputDir)
+		shutil.copy(testTextVersion, os.path.join(self.inputDir, "page1.html"))
+		page = benchmark_munichfilms.GenerateListingsPage(30).replace("28.04.2016", "05.05.2016")
+		page = page.replace("04.05.2016", "11.05.2016")
+		with open(os.path.join(self.inputDir, "page2.html"), 'w') as outf:
+			outf.write(page)
+		self.outputDir = os.path.join(self.tempDir, "listings")
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir)
+
+	def testBatch(self):
+		inputFnames = munich_films.GetBatchInputFiles(self.inputDir)
+		self.assertEqual(2, len(inputFnames))
+		self.assertEqual(inputFnames, munich_films.GetBatchInputFiles(os.path.join(self.inputDir, "*.html")))
+		dbFname = os.path.join(self.tempDir, "screenings.db")
+		stats = munich_films.ProcessFilmListingsBatch(inputFnames, self.outputDir, jobs=2,
+													sqliteFname=dbFname)
+		self.assertEqual((2, 0, []), (stats["pages"], stats["skipped"], stats["errors"]))
+		self.assertGreater(stats["filmsPerSecond"], 0)
+		with open(REFERENCE_OUTPUT) as f:
+			correct = f.read()
+		with open(os.path.join(self.outputDir, "currentfilms_28.04.2016-04.05.2016.txt")) as f:
+			self.assertEqual(correct, f.read())
+		self.assertTrue(os.path.exists(os.path.join(self.outputDir, "currentfilms_05.05.2016-11.05.2016.txt")))
+		db = sqlite3.connect(dbFname)
+		try:
+			self.assertEqual(2, db.execute("SELECT COUNT(DISTINCT weekStart) FROM screenings").fetchone()[0])
+		finally:
+			db.close()
+
+		# unchanged pages are skipped; modified ones (or all, with force) are processed again
+		stats = munich_films.ProcessFilmListingsBatch(inputFnames, self.outputDir, jobs=1)
+		self.assertEqual((0, 2), (stats["pages"], stats["skipped"]))
+		st = os.stat(inputFnames[1])
+		os.utime(inputFnames[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+		stats = munich_films.ProcessFilmListingsBatch(inputFnames, self.outputDir, jobs=1)
+		self.assertEqual((1, 1), (stats["pages"], stats["skipped"]))
+		stats = munich_films.ProcessFilmListingsBatch(inputFnames, self.outputDir, jobs=1, force=True)
+		self.assertEqual((2, 0), (stats["pages"], stats["skipped"]))
+
+	def testSameWeek(self):
+		# a later page for the same week replaces the earlier page's listing,
+		# even if only the earlier page is processed again
+		page = benchmark_munichfilms.GenerateListingsPage(5).replace("28.04.2016", "05.05.2016")
+		page = page.replace("04.05.2016", "11.05.2016")
+		with open(os.path.join(self.inputDir, "page3.html"), 'w') as outf:
+			outf.write(page)
+		inputFnames = munich_films.GetBatchInputFiles(self.inputDir)
+		outputFname = os.path.join(self.outputDir, "currentfilms_05.05.2016-11.05.2016.txt")
+		munich_films.ProcessFilmListingsBatch(inputFnames, self.outputDir, jobs=3)
+		correct = munich_films.ProcessFileWorker(inputFnames[2], self.outputDir, False, False)[1]
+		with open(outputFname) as f:
+			self.assertEqual(correct, f.read())
+		st = os.stat(inputFnames[1])
+		os.utime(inputFnames[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+		stats = munich_films.ProcessFilmListingsBatch(inputFnames, self.outputDir, jobs=1)
+		self.assertEqual((1, 2), (stats["pages"], stats["skipped"]))
+		with open(outputFname) as f:
+			self.assertEqual(correct, f.read())
+		with open(os.path.join(self.outputDir, munich_films.BATCH_STATE_FILENAME)) as f:
+			state = json.load(f)
+		self.assertEqual(os.path.abspath(inputFnames[2]), state["outputs"][os.path.abspath(outputFname)])
+
+
+class ArchiveCheck(unittest.TestCase):
+	def setUp(self):
+		self.archiveDir = tempfile.mkdtemp()
+		with open(testTextVersion) as f:
+			self.results = munich_films.ParseFilmListings(f.read(), True)
+
+	def tearDown(self):
+		shutil.rmtree(self.archiveDir)
+
+	def testReadFilmListingFile(self):
+		with open(testTextVersion) as f:
+			filmTitles, filmTextDict, scheduleDates = munich_films.ParseFilmListings(f.read())
+		self.assertEqual((filmTitles, filmTextDict, None),
+						munich_films_archive.ReadFilmListingFile(REFERENCE_OUTPUT))
+
+	def testArchive(self):
+		filmTitles, filmTextDict, scheduleDates = self.results
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			archive.AddWeek(filmTitles, filmTextDict, scheduleDates)
+			# later week with only some of the films; earlier week added afterwards
+			archive.AddWeek(filmTitles[:10], filmTextDict, "05.05.2016-11.05.2016")
+			archive.AddWeek(filmTitles[5:], filmTextDict, "21.04.2016-27.04.2016")
+			# replacing a week
+			archive.AddWeek(filmTitles, filmTextDict, scheduleDates)
+		# re-open the archive
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			self.assertEqual([("2016-04-21", "21.04.2016-27.04.2016"),
+							("2016-04-28", scheduleDates), ("2016-05-05", "05.05.2016-11.05.2016")],
+							archive.GetWeeks())
+			films = munich_films.FilmsFromTextDict(filmTitles, filmTextDict)
+			self.assertEqual(sum(len(film.screenings) for film in films),
+							len(list(archive.IterScreenings("2016-04-28", "2016-04-28"))))
+			film = films[0]
+			self.assertEqual(["2016-04-28", "2016-05-05"], archive.GetWeeksShown(film.title))
+			theater = film.screenings[0].theater
+			self.assertEqual(2, archive.GetTheaterWeeks(film.title)[theater])
+			self.assertEqual(["2016-04-28", "2016-05-05"],
+							archive.GetWeeksShown(film.title, theater))
+			self.assertEqual([], archive.GetWeeksShown(film.title, "Nowhere"))
+			screening = next(archive.IterScreenings("2016-04-28"))
+			self.assertEqual(("2016-04-28", film.title, film.langType, film.is3D, theater,
+							film.screenings[0].dayMask, film.screenings[0].minutes), screening)
+		# strings are only stored once
+		with open(os.path.join(self.archiveDir, "strings.txt"), encoding="utf-8") as f:
+			strings = f.read().split("\n")[:-1]
+		self.assertEqual(len(strings), len(set(strings)))
+
+	def testImportFile(self):
+		listingFname = os.path.join(self.archiveDir, "currentfilms_28.04.2016-04.05.2016.txt")
+		shutil.copy(REFERENCE_OUTPUT, listingFname)
+		with munich_films_archive.ScheduleArchive(os.path.join(self.archiveDir, "a")) as archive:
+			self.assertEqual("2016-04-28", munich_films_archive.ImportFile(archive, listingFname))
+			self.assertEqual("2016-04-28", munich_films_archive.ImportFile(archive, testTextVersion))
+			self.assertRaises(ValueError, munich_films_archive.ImportFile, archive, REFERENCE_OUTPUT)
+			self.assertEqual(1, len(archive.GetWeeks()))
+			# single-day and merged-variant listings don't have whole-week schedules
+			dayFname = os.path.join(self.archiveDir, "currentfilms_28.04.2016-04.05.2016_F.txt")
+			shutil.copy(REFERENCE_OUTPUT, dayFname)
+			self.assertRaises(ValueError, munich_films_archive.ImportFile, archive, dayFname)
+			mergedFname = os.path.join(self.archiveDir, "currentfilms_05.05.2016-11.05.2016.txt")
+			with open(mergedFname, 'w', encoding="utf-8") as outf:
+				munich_films.WriteFilmEntry(outf, "The Jungle Book", ["Cinema (3D) [OF]: Sun 13:00"])
+			self.assertRaises(ValueError, munich_films_archive.ImportFile, archive, mergedFname)
+			self.assertEqual(1, len(archive.GetWeeks()))
+		# the command line skips files which can't be imported
+		output = io.StringIO()
+		with contextlib.redirect_stdout(output):
+			munich_films_archive.main(["munich_films_archive.py", "--archive=" + self.archiveDir,
+									"--import", dayFname, os.path.join(self.archiveDir, "missing.txt")])
+		self.assertEqual(2, output.getvalue().count("Skipping"))
+
+	def testFailedIntern(self):
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			self.assertEqual([0], archive.InternStrings(["old"]))
+			self.assertRaises(ValueError, archive.InternStrings, ["new1", "bad\nstring"])
+			self.assertEqual([1, 1, 0], archive.InternStrings(["new2", "new2", "old"]))
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			self.assertEqual(["old", "new2"], archive.strings)
+
+	def testLargeStringTable(self):
+		# IDs of all fields (including language types) can exceed 16 bits
+		with open(os.path.join(self.archiveDir, "strings.txt"), 'w', encoding="utf-8") as outf:
+			outf.write("".join("s{0}\n".format(i) for i in range(70000)))
+		filmTitles, filmTextDict, scheduleDates = self.results
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			archive.AddWeek(filmTitles[:3], filmTextDict, scheduleDates)
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			film = munich_films.FilmsFromTextDict(filmTitles[:1], filmTextDict)[0]
+			screening = next(archive.IterScreenings())
+			self.assertEqual((film.title, film.langType, film.screenings[0].theater),
+							(screening[1], screening[2], screening[4]))
+			self.assertTrue(all(record[2] > 65535 for record in archive.IterRecords("2016-04-28")))
+
+	def testCloseWithLiveViews(self):
+		filmTitles, filmTextDict, scheduleDates = self.results
+		with munich_films_archive.ScheduleArchive(self.archiveDir) as archive:
+			archive.AddWeek(filmTitles, filmTextDict, scheduleDates)
+			records = archive.IterRecords("2016-04-28")
+			first = next(records)
+			view, recordFormat = archive.GetPartition("2016-04-28")
+			# replacing the week and closing the archive leave the views usable
+			archive.AddWeek(filmTitles[:1], filmTextDict, scheduleDates)
+		self.assertEqual(first, struct.unpack_from(recordFormat, view))
+		self.assertEqual(6, len(next(records)))
+		view.release()
+
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy not installed")
+class ScreeningArraysCheck(unittest.TestCase):
+	def setUp(self):
+		with open(testTextVersion) as f:
+			self.filmTitles, self.filmTextDict, dates = munich_films.ParseFilmListings(f.read(), True)
+		self.arrays = munich_films.MakeScreeningArrays(self.filmTitles, self.filmTextDict)
+
+	def testQuery(self):
+		correct = benchmark_munichfilms.StringTimeWindowQuery(self.filmTitles, self.filmTextDict,
+												["Sat", "Sun"], "19:00", "21:00")
+		self.assertEqual(correct, self.arrays.Query(["Sat", "Sun"], after="19:00", before="21:00"))
+		results = self.arrays.Query("M", theater="Werkstattkino", lang=["OmeU"])
+		self.assertIn(("Le amiche (Die Freundinnen) [OmeU]", "Werkstattkino", "M", "20:00"), results)
+		self.assertTrue(all(title.endswith("[OmeU]") for (title, theater, day, t) in results))
+		self.assertEqual([], self.arrays.Query(lang="XX"))
+
+	def testCountScreenings(self):
+		dayIndex = munich_films.MakeDayIndex(self.filmTextDict, self.filmTitles)
+		counts = self.arrays.CountScreenings()
+		for d in range(7):
+			listings = munich_films.GetListingsForDay(dayIndex, munich_films.DAY_NAMES[d],
+														theater="Atelier", after="18:00")
+			mask = self.arrays.Select(after="18:00")
+			self.assertEqual(sum(len(times) for theaterTimes in listings.values()
+								for (theater, times) in theaterTimes),
+							self.arrays.CountScreenings(mask)[self.arrays.theaters.index("Atelier"), d])
+		self.assertEqual(len(self.arrays.Query()), counts.sum())
 
 
 